@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 
     # DRF
     'rest_framework',
+    'rest_framework.authtoken',
 
     # Фильтры Джанго
     'django_filters',
@@ -55,6 +56,8 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    # Первым - чтобы замер включал время остальных middleware
+    'web.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,6 +65,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'web.middleware.ReplicaRoutingMiddleware',
+    'web.middleware.ProfilingMiddleware',
+    'web.middleware.QueryCaptureMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -95,6 +101,17 @@ DATABASES = {
     }
 }
 
+# Реплика для чтения аналитики (например, копия SQLite-файла, см. sync_replica)
+DATABASE_REPLICA_NAME = os.getenv('DATABASE_REPLICA_NAME')
+if DATABASE_REPLICA_NAME:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DATABASE_REPLICA_NAME,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['web.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -158,3 +175,59 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
 }
+
+# Режим производительности админки записей ДДС: оценочное количество записей,
+# ограниченные фильтры по справочникам и датам, поиск суммы по индексу
+CASHFLOW_ADMIN_PERFORMANCE_MODE = os.getenv('CASHFLOW_ADMIN_PERFORMANCE_MODE', 'False') == 'True'
+
+# Замер запросов (SQL, представление, рендеринг): заголовок Server-Timing
+# и метрики Prometheus на /metrics/. Доступ к метрикам - персоналу
+# или по заголовку Authorization: Bearer <CASHFLOW_METRICS_TOKEN>
+CASHFLOW_METRICS_ENABLED = os.getenv('CASHFLOW_METRICS_ENABLED', 'False') == 'True'
+CASHFLOW_METRICS_TOKEN = os.getenv('CASHFLOW_METRICS_TOKEN')
+
+# Профилирование запросов (cProfile) с сохранением в админке: по подписанному
+# токену сотрудника (X-Profile-Token / ?_profile=, токен - на странице профилей
+# в админке) и выборочно - доля запросов к представлениям из списка
+# (например, CashFlowRecordListView, CashFlowRecordViewSet.monthly_report)
+CASHFLOW_PROFILING_ENABLED = os.getenv('CASHFLOW_PROFILING_ENABLED', 'False') == 'True'
+CASHFLOW_PROFILING_SAMPLE_RATE = float(os.getenv('CASHFLOW_PROFILING_SAMPLE_RATE', '0'))
+CASHFLOW_PROFILING_VIEWS = [
+    name.strip() for name in os.getenv('CASHFLOW_PROFILING_VIEWS', '').split(',') if name.strip()
+]
+CASHFLOW_PROFILING_TOKEN_MAX_AGE = int(os.getenv('CASHFLOW_PROFILING_TOKEN_MAX_AGE', '3600'))
+CASHFLOW_PROFILING_MAX_PROFILES = int(os.getenv('CASHFLOW_PROFILING_MAX_PROFILES', '500'))
+
+# Подсчет количества записей для постраничных списков (HTML и API): класс
+# стратегии - точный (ExactCount), кэшированный по фильтрам до изменения
+# версии данных (CachedCount) или оценка по дневным агрегатам от THRESHOLD
+# записей с пометкой "~" (RollupEstimateCount)
+CASHFLOW_COUNT_STRATEGY = os.getenv('CASHFLOW_COUNT_STRATEGY', 'web.pagination.RollupEstimateCount')
+CASHFLOW_COUNT_ESTIMATE_THRESHOLD = int(os.getenv('CASHFLOW_COUNT_ESTIMATE_THRESHOLD', '10000'))
+CASHFLOW_COUNT_CACHE_TIMEOUT = int(os.getenv('CASHFLOW_COUNT_CACHE_TIMEOUT', '300'))
+
+# Выборочное снятие форм SQL-запросов для команды advise_indexes: доля
+# запросов к представлениям из списка (по умолчанию - API записей с аналитикой
+# и HTML-список); формы накапливаются в CapturedQuery
+CASHFLOW_QUERY_CAPTURE_ENABLED = os.getenv('CASHFLOW_QUERY_CAPTURE_ENABLED', 'False') == 'True'
+CASHFLOW_QUERY_CAPTURE_SAMPLE_RATE = float(os.getenv('CASHFLOW_QUERY_CAPTURE_SAMPLE_RATE', '0.1'))
+CASHFLOW_QUERY_CAPTURE_VIEWS = [
+    name.strip() for name in os.getenv(
+        'CASHFLOW_QUERY_CAPTURE_VIEWS', 'CashFlowRecordViewSet,CashFlowRecordListView'
+    ).split(',') if name.strip()
+]
+
+# Чтения аналитики, выгрузки и HTML-списка - на реплику (если она настроена).
+# После записи клиент STICKY_SECONDS секунд читает из основной базы;
+# реплика с отставанием больше MAX_LAG секунд не используется
+# (проверяется не чаще раза в CHECK_INTERVAL секунд)
+CASHFLOW_READ_REPLICA = 'replica' if DATABASE_REPLICA_NAME else None
+CASHFLOW_REPLICA_STICKY_SECONDS = int(os.getenv('CASHFLOW_REPLICA_STICKY_SECONDS', '10'))
+CASHFLOW_REPLICA_MAX_LAG = float(os.getenv('CASHFLOW_REPLICA_MAX_LAG', '30'))
+CASHFLOW_REPLICA_CHECK_INTERVAL = float(os.getenv('CASHFLOW_REPLICA_CHECK_INTERVAL', '5'))
+
+# Индекс справочников в памяти процесса (формы, баланс): версия справочников
+# сверяется не чаще раза в CHECK_INTERVAL секунд (0 - при каждом обращении);
+# проверка записей перед сохранением сверяет версию всегда; изменения в своем
+# процессе сбрасывают индекс сразу
+CASHFLOW_TAXONOMY_CHECK_INTERVAL = float(os.getenv('CASHFLOW_TAXONOMY_CHECK_INTERVAL', '1'))
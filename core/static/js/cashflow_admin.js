@@ -1,20 +1,20 @@
 (function($) {
     'use strict';
 
+    // Индекс справочников из снимка (см. js/taxonomy.js)
+    var taxonomy = null;
+
     // Функция для фильтрации категорий
     function filterCategories(transactionTypeId) {
         console.log('Filtering categories for transaction type:', transactionTypeId);
         var categorySelect = $('#id_category');
-        var allCategories = categorySelect.data('all-categories') || [];
         var currentCategoryId = categorySelect.val();
 
         categorySelect.empty();
         categorySelect.append($('<option>').text('---------').attr('value', ''));
 
         if (transactionTypeId) {
-            var filteredCategories = allCategories.filter(function(cat) {
-                return cat.transaction_type_id == transactionTypeId;
-            });
+            var filteredCategories = taxonomy.categoriesFor(transactionTypeId);
 
             console.log('Filtered categories:', filteredCategories);
 
@@ -44,16 +44,13 @@
     function filterSubcategories(categoryId) {
         console.log('Filtering subcategories for category:', categoryId);
         var subcategorySelect = $('#id_subcategory');
-        var allSubcategories = subcategorySelect.data('all-subcategories') || [];
         var currentSubcategoryId = subcategorySelect.val();
 
         subcategorySelect.empty();
         subcategorySelect.append($('<option>').text('---------').attr('value', ''));
 
         if (categoryId) {
-            var filteredSubcategories = allSubcategories.filter(function(sub) {
-                return sub.category_id == categoryId;
-            });
+            var filteredSubcategories = taxonomy.subcategoriesFor(categoryId);
 
             console.log('Filtered subcategories:', filteredSubcategories);
 
@@ -80,37 +77,32 @@
     $(document).ready(function() {
         console.log('CashFlow Admin JS loaded');
 
-        // Пробуем загрузить все категории и подкатегории через админку
-        $.ajax({
-            url: '/admin/cash_flow/cashflowrecord/ajax/load-all-categories/',
-            success: function(data) {
-                console.log('Loaded categories data from admin:', data);
-                $('#id_category').data('all-categories', data.categories);
-                $('#id_subcategory').data('all-subcategories', data.subcategories);
+        // Загружаем снимок справочников (кешируется в браузере, сверяется по версии)
+        CashFlowTaxonomy.load(CashFlowTaxonomy.url).then(function(index) {
+            console.log('Loaded taxonomy snapshot version:', index.version);
+            taxonomy = index;
 
-                // Инициализируем фильтрацию на основе текущих значений
-                var transactionTypeId = $('#id_transaction_type').val();
-                var categoryId = $('#id_category').val();
+            // Инициализируем фильтрацию на основе текущих значений
+            var transactionTypeId = $('#id_transaction_type').val();
+            var categoryId = $('#id_category').val();
 
-                console.log('Initial values - transactionType:', transactionTypeId, 'category:', categoryId);
+            console.log('Initial values - transactionType:', transactionTypeId, 'category:', categoryId);
 
-                // Если есть выбранный тип операции - фильтруем категории
-                if (transactionTypeId) {
-                    filterCategories(transactionTypeId);
-                }
-
-                // Если есть выбранная категория - фильтруем подкатегории
-                if (categoryId) {
-                    filterSubcategories(categoryId);
-                }
-            },
-            error: function(xhr, status, error) {
-                console.error('Error loading categories data from admin:', error);
-                console.log('Trying fallback to app URLs...');
+            // Если есть выбранный тип операции - фильтруем категории
+            if (transactionTypeId) {
+                filterCategories(transactionTypeId);
+            }
 
-                // Если админский endpoint не работает, используем endpoints приложения
-                initializeWithAppEndpoints();
+            // Если есть выбранная категория - фильтруем подкатегории
+            if (categoryId) {
+                filterSubcategories(categoryId);
             }
+        }).catch(function(error) {
+            console.error('Error loading taxonomy snapshot:', error);
+            console.log('Trying fallback to app URLs...');
+
+            // Если снимок недоступен, используем endpoints приложения
+            initializeWithAppEndpoints();
         });
 
         // Обработчик изменения типа операции
@@ -118,9 +110,8 @@
             var transactionTypeId = $(this).val();
             console.log('Transaction type changed to:', transactionTypeId);
 
-            // Проверяем, загружены ли все данные
-            var allCategories = $('#id_category').data('all-categories');
-            if (allCategories && allCategories.length > 0) {
+            // Проверяем, загружен ли снимок справочников
+            if (taxonomy) {
                 // Используем локальную фильтрацию
                 filterCategories(transactionTypeId);
             } else {
@@ -134,9 +125,8 @@
             var categoryId = $(this).val();
             console.log('Category changed to:', categoryId);
 
-            // Проверяем, загружены ли все данные
-            var allSubcategories = $('#id_subcategory').data('all-subcategories');
-            if (allSubcategories && allSubcategories.length > 0) {
+            // Проверяем, загружен ли снимок справочников
+            if (taxonomy) {
                 // Используем локальную фильтрацию
                 filterSubcategories(categoryId);
             } else {
@@ -23,30 +23,55 @@ $(document).ready(function() {
     // НЕ выполняем загрузку категорий при первоначальной загрузке страницы
     // Вместо этого просто инициализируем обработчики событий
 
+    // Снимок справочников: после загрузки категории фильтруются локально, без запросов
+    var taxonomy = null;
+    if (window.CashFlowTaxonomy) {
+        CashFlowTaxonomy.load(CashFlowTaxonomy.url).then(function(index) {
+            taxonomy = index;
+        }).catch(function(error) {
+            console.error(error);
+        });
+    }
+
+    // Заполнение выпадающего списка с сохранением текущего значения
+    function fillSelect(select, items) {
+        var currentId = select.val();
+
+        select.empty();
+        select.append('<option value="">---------</option>');
+
+        $.each(items, function(index, item) {
+            var option = $('<option>').attr('value', item.id).text(item.name);
+            if (item.id == currentId) {
+                option.prop('selected', true);
+            }
+            select.append(option);
+        });
+
+        return select.val();
+    }
+
     // Простая функция для загрузки категорий
     function loadCategories(transactionTypeId) {
         if (transactionTypeId) {
-            $.get('/ajax/load-categories/', {transaction_type_id: transactionTypeId}, function(data) {
-                var categorySelect = $('#id_category');
-                var currentCategoryId = categorySelect.val(); // Сохраняем текущее значение
-
-                categorySelect.empty();
-                categorySelect.append('<option value="">---------</option>');
+            if (taxonomy) {
+                onCategoriesLoaded(taxonomy.categoriesFor(transactionTypeId));
+            } else {
+                $.get('/ajax/load-categories/', {transaction_type_id: transactionTypeId}, onCategoriesLoaded);
+            }
+        } else {
+            $('#id_category').empty().append('<option value="">---------</option>');
+            $('#id_subcategory').empty().append('<option value="">---------</option>');
+        }
+    }
 
-                $.each(data, function(index, category) {
-                    var selected = (category.id == currentCategoryId) ? 'selected' : '';
-                    categorySelect.append('<option value="' + category.id + '" ' + selected + '>' + category.name + '</option>');
-                });
+    function onCategoriesLoaded(data) {
+        var currentCategoryId = fillSelect($('#id_category'), data);
 
-                // Если категория была выбрана, загружаем подкатегории
-                if (currentCategoryId) {
-                    loadSubcategories(currentCategoryId);
-                } else {
-                    $('#id_subcategory').empty().append('<option value="">---------</option>');
-                }
-            });
+        // Если категория была выбрана, загружаем подкатегории
+        if (currentCategoryId) {
+            loadSubcategories(currentCategoryId);
         } else {
-            $('#id_category').empty().append('<option value="">---------</option>');
             $('#id_subcategory').empty().append('<option value="">---------</option>');
         }
     }
@@ -54,18 +79,13 @@ $(document).ready(function() {
     // Простая функция для загрузки подкатегорий
     function loadSubcategories(categoryId) {
         if (categoryId) {
-            $.get('/ajax/load-subcategories/', {category_id: categoryId}, function(data) {
-                var subcategorySelect = $('#id_subcategory');
-                var currentSubcategoryId = subcategorySelect.val(); // Сохраняем текущее значение
-
-                subcategorySelect.empty();
-                subcategorySelect.append('<option value="">---------</option>');
-
-                $.each(data, function(index, subcategory) {
-                    var selected = (subcategory.id == currentSubcategoryId) ? 'selected' : '';
-                    subcategorySelect.append('<option value="' + subcategory.id + '" ' + selected + '>' + subcategory.name + '</option>');
+            if (taxonomy) {
+                fillSelect($('#id_subcategory'), taxonomy.subcategoriesFor(categoryId));
+            } else {
+                $.get('/ajax/load-subcategories/', {category_id: categoryId}, function(data) {
+                    fillSelect($('#id_subcategory'), data);
                 });
-            });
+            }
         } else {
             $('#id_subcategory').empty().append('<option value="">---------</option>');
         }
@@ -0,0 +1,75 @@
+// Снимок справочников (тип операции -> категория -> подкатегория) с кешем на клиенте.
+// Снимок хранится в localStorage вместе с ETag и при каждой загрузке страницы
+// сверяется с сервером условным запросом: если версия не изменилась, сервер отвечает 304.
+(function(window) {
+    'use strict';
+
+    var STORAGE_KEY = 'cashflow_taxonomy';
+
+    function readCache() {
+        try {
+            return JSON.parse(window.localStorage.getItem(STORAGE_KEY));
+        } catch (e) {
+            return null;
+        }
+    }
+
+    function writeCache(etag, data) {
+        try {
+            window.localStorage.setItem(STORAGE_KEY, JSON.stringify({etag: etag, data: data}));
+        } catch (e) {
+            // localStorage недоступен или переполнен - работаем без кеша
+        }
+    }
+
+    // Индексы для локальной фильтрации без запросов к серверу
+    function buildIndex(data) {
+        var categoriesByType = {};
+        var subcategoriesByCategory = {};
+
+        data.transaction_types.forEach(function(transactionType) {
+            categoriesByType[transactionType.id] = transactionType.categories;
+            transactionType.categories.forEach(function(category) {
+                subcategoriesByCategory[category.id] = category.subcategories;
+            });
+        });
+
+        return {
+            version: data.version,
+            categoriesFor: function(transactionTypeId) {
+                return categoriesByType[transactionTypeId] || [];
+            },
+            subcategoriesFor: function(categoryId) {
+                return subcategoriesByCategory[categoryId] || [];
+            }
+        };
+    }
+
+    // Загрузка снимка: возвращает Promise с индексом справочников
+    function load(url) {
+        var cached = readCache();
+        var headers = {};
+        if (cached && cached.etag) {
+            headers['If-None-Match'] = cached.etag;
+        }
+
+        return fetch(url, {headers: headers, credentials: 'same-origin'}).then(function(response) {
+            if (response.status === 304 && cached) {
+                return buildIndex(cached.data);
+            }
+            if (!response.ok) {
+                throw new Error('Ошибка загрузки справочников: ' + response.status);
+            }
+            var etag = response.headers.get('ETag');
+            return response.json().then(function(data) {
+                writeCache(etag, data);
+                return buildIndex(data);
+            });
+        });
+    }
+
+    window.CashFlowTaxonomy = {
+        url: '/ajax/taxonomy/',
+        load: load
+    };
+})(window);
@@ -1,8 +1,27 @@
-from django.contrib import admin
-from django.http import JsonResponse
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
 from django.urls import path, reverse
-from .models import Status, TransactionType, Category, Subcategory, CashFlowRecord
+from django.utils.html import format_html
+from .models import (
+    Status, TransactionType, Category, Subcategory, CashFlowRecord, CashFlowDailyRollup, RequestProfile,
+    ArchivedCashFlowRecord, CashFlowArchiveBatch, CapturedQuery
+)
 from .admin_forms import CashFlowRecordAdminForm
+from .merge import merge_dictionary
+from .pagination import CountStrategyPaginator, RollupEstimateCount
+from .profiling import PROFILE_HEADER, PROFILE_PARAM, make_profile_token
+from .rollup import annotate_records_count
+
+
 
 
 class AmountRangeFilter(admin.SimpleListFilter):
@@ -30,6 +49,105 @@ class AmountRangeFilter(admin.SimpleListFilter):
         return queryset
 
 
+class CategoryByTypeFilter(admin.SimpleListFilter):
+    """
+    Фильтр по категории, показывающий только категории выбранного типа операции.
+
+    Пока тип операции не выбран, варианты не выводятся - список не растет
+    вместе со справочником.
+    """
+    title = 'Категория'
+    parameter_name = 'category'
+
+    def lookups(self, request, model_admin):
+        transaction_type_id = request.GET.get('transaction_type__id__exact')
+        if not transaction_type_id:
+            return ()
+        return Category.objects.filter(transaction_type_id=transaction_type_id).values_list('id', 'name')
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(category_id=self.value())
+        return queryset
+
+
+class SubcategoryByCategoryFilter(admin.SimpleListFilter):
+    """Фильтр по подкатегории, показывающий только подкатегории выбранной категории"""
+    title = 'Подкатегория'
+    parameter_name = 'subcategory'
+
+    def lookups(self, request, model_admin):
+        category_id = request.GET.get(CategoryByTypeFilter.parameter_name)
+        if not category_id:
+            return ()
+        return Subcategory.objects.filter(category_id=category_id).values_list('id', 'name')
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(subcategory_id=self.value())
+        return queryset
+
+
+class RecentMonthFilter(admin.SimpleListFilter):
+    """
+    Ограниченная замена date_hierarchy: выбор месяца из последних max_months.
+
+    Месяцы берутся из дневных агрегатов, а не DISTINCT-сканированием записей;
+    фильтр по диапазону дат использует индекс created_date.
+    """
+    title = 'Месяц'
+    parameter_name = 'month'
+    max_months = 24
+
+    def lookups(self, request, model_admin):
+        months = CashFlowDailyRollup.objects.dates('day', 'month', order='DESC')[:self.max_months]
+        return [(month.strftime('%Y-%m'), month.strftime('%m.%Y')) for month in months]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            year, month = (int(part) for part in self.value().split('-'))
+            start = date(year, month, 1)
+        except ValueError:
+            return queryset
+        end = date(year + month // 12, month % 12 + 1, 1)
+        return queryset.filter(created_date__gte=start, created_date__lt=end)
+
+
+def admin_performance_mode():
+    """Режим производительности админки записей (читается при каждом запросе)"""
+    return getattr(settings, 'CASHFLOW_ADMIN_PERFORMANCE_MODE', False)
+
+
+# Параметры фильтров списка записей в админке -> параметры оценки количества
+# по дневным агрегатам; прочие фильтры и поиск считаются точно (с кэшем)
+ADMIN_COUNT_PARAMS = {
+    'status__id__exact': 'status',
+    'transaction_type__id__exact': 'transaction_type',
+    CategoryByTypeFilter.parameter_name: 'category',
+    SubcategoryByCategoryFilter.parameter_name: 'subcategory',
+}
+
+# Параметры страницы и сортировки списка админки
+ADMIN_LIST_PARAMS = ('p', 'o')
+
+
+def admin_count_params(query):
+    """
+    Параметры оценки количества (см. pagination.rollup_count) по параметрам
+    списка админки или None, если есть фильтр или поиск без соответствия.
+    """
+    params = {}
+    for name, value in query.items():
+        if name in ADMIN_LIST_PARAMS or not value:
+            continue
+        if name not in ADMIN_COUNT_PARAMS:
+            return None
+        params[ADMIN_COUNT_PARAMS[name]] = value
+    return params
+
+
 @admin.register(CashFlowRecord)
 class CashFlowRecordAdmin(admin.ModelAdmin):
     """Админка для записей ДДС"""
@@ -57,10 +175,58 @@ class CashFlowRecordAdmin(admin.ModelAdmin):
         'subcategory__name',
         'amount',
     )
-    date_hierarchy = 'created_date'
-    ordering = ('-created_date',)
     list_per_page = 50
 
+    # Режим производительности (CASHFLOW_ADMIN_PERFORMANCE_MODE): фильтры без вывода
+    # всех элементов справочников и без DISTINCT-сканирования дат, сумма ищется
+    # по индексу, количество записей - стратегией RollupEstimateCount
+    performance_list_filter = (
+        'status',
+        'transaction_type',
+        CategoryByTypeFilter,
+        SubcategoryByCategoryFilter,
+        'created_date',
+        RecentMonthFilter,
+        AmountRangeFilter,
+    )
+    performance_search_fields = (
+        'comment',
+        'category__name',
+        'subcategory__name',
+    )
+    ordering = ('-created_date',)
+
+    @property
+    def date_hierarchy(self):
+        return None if admin_performance_mode() else 'created_date'
+
+    @property
+    def show_full_result_count(self):
+        return not admin_performance_mode()
+
+    @property
+    def search_help_text(self):
+        if admin_performance_mode():
+            return 'Число ищется также как точная сумма, текст - в комментарии и названиях категорий'
+        return None
+
+    def get_list_filter(self, request):
+        return self.performance_list_filter if admin_performance_mode() else super().get_list_filter(request)
+
+    def get_search_fields(self, request):
+        return self.performance_search_fields if admin_performance_mode() else super().get_search_fields(request)
+
+    def get_autocomplete_fields(self, request):
+        return ('status', 'transaction_type') if admin_performance_mode() else ()
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if not admin_performance_mode():
+            return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        return CountStrategyPaginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            params=admin_count_params(request.GET), count_strategy=RollupEstimateCount()
+        )
+
     fieldsets = (
         ('Основная информация', {
             'fields': ('created_date', 'status', 'transaction_type')
@@ -71,6 +237,10 @@ class CashFlowRecordAdmin(admin.ModelAdmin):
         ('Финансовые данные', {
             'fields': ('amount', 'comment')
         }),
+        ('Внешняя система', {
+            'fields': ('source', 'external_id'),
+            'classes': ('collapse',)
+        }),
     )
 
     def comment_preview(self, obj):
@@ -85,29 +255,26 @@ class CashFlowRecordAdmin(admin.ModelAdmin):
             return ['created_date']
         return []
 
-    def get_urls(self):
-        """Добавляем AJAX URL для админки"""
-        urls = super().get_urls()
-        custom_urls = [
-            path('ajax/load-all-categories/', self.admin_site.admin_view(self.load_all_categories),
-                 name='cash_flow_load_all_categories'),
-        ]
-        return custom_urls + urls
-
-    def load_all_categories(self, request):
-        """Загрузка всех категорий и подкатегорий для клиентской фильтрации"""
-        categories = Category.objects.all().values('id', 'name', 'transaction_type_id')
-        subcategories = Subcategory.objects.all().values('id', 'name', 'category_id')
-
-        data = {
-            'categories': list(categories),
-            'subcategories': list(subcategories),
-        }
-        return JsonResponse(data)
+    def get_search_results(self, request, queryset, search_term):
+        """
+        В режиме производительности числовой запрос дополнительно ищется как
+        точная сумма (по индексу amount) вместо icontains по тексту суммы.
+        """
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if admin_performance_mode() and search_term:
+            try:
+                amount = Decimal(search_term.strip().replace(' ', '').replace(',', '.'))
+            except InvalidOperation:
+                pass
+            else:
+                if amount.is_finite():
+                    results |= queryset.filter(amount=amount)
+        return results, may_have_duplicates
 
     class Media:
         js = (
             'admin/js/jquery.init.js',
+            'js/taxonomy.js',
             'js/cashflow_admin.js',
         )
 
@@ -120,60 +287,124 @@ class CashFlowRecordAdmin(admin.ModelAdmin):
         return super().changeform_view(request, object_id, form_url, extra_context)
 
 
+class MergeAdminMixin:
+    """Действие списка справочника: объединение выбранных элементов в один"""
+    actions = ('merge_selected',)
+
+    @admin.action(description='Объединить выбранные', permissions=['delete'])
+    def merge_selected(self, request, queryset):
+        """
+        Промежуточная страница выбора основного элемента; остальные выбранные
+        объединяются с ним (записи переносятся пачками, см. merge_dictionary).
+        """
+        entries = list(queryset)
+        if len(entries) < 2:
+            self.message_user(request, 'Для объединения выберите хотя бы два элемента', messages.WARNING)
+            return None
+
+        target = next((entry for entry in entries if str(entry.pk) == request.POST.get('target')), None)
+        if target is None:
+            return TemplateResponse(request, 'admin/web/merge_dictionary.html', {
+                **self.admin_site.each_context(request),
+                'title': f'Объединение: {self.model._meta.verbose_name_plural}',
+                'opts': self.model._meta,
+                'entries': entries,
+                'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            })
+
+        records = archived_records = 0
+        for source in entries:
+            if source.pk != target.pk:
+                result = merge_dictionary(source, target)
+                records += result['records']
+                archived_records += result['archived_records']
+        self.message_user(
+            request,
+            f'Объединено с «{target}»: элементов {len(entries) - 1}, записей {records}, '
+            f'архивных записей {archived_records}',
+            messages.SUCCESS
+        )
+        return None
+
+
 # Регистрация остальных моделей остается без изменений
 @admin.register(Status)
-class StatusAdmin(admin.ModelAdmin):
+class StatusAdmin(MergeAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'cashflow_records_count')
     search_fields = ('name',)
     ordering = ('name',)
 
+    def get_queryset(self, request):
+        # Количество записей считается в запросе списка, а не отдельно для каждой строки
+        return annotate_records_count(super().get_queryset(request))
+
     def cashflow_records_count(self, obj):
-        return obj.cashflowrecord_set.count()
+        return obj.records_count
 
     cashflow_records_count.short_description = 'Количество записей'
+    cashflow_records_count.admin_order_field = 'records_count'
 
 
 @admin.register(TransactionType)
-class TransactionTypeAdmin(admin.ModelAdmin):
+class TransactionTypeAdmin(MergeAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'categories_count', 'cashflow_records_count')
     search_fields = ('name',)
     ordering = ('name',)
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).annotate(categories_total=Count('categories'))
+        return annotate_records_count(queryset)
+
     def categories_count(self, obj):
-        return obj.categories.count()
+        return obj.categories_total
 
     categories_count.short_description = 'Количество категорий'
+    categories_count.admin_order_field = 'categories_total'
 
     def cashflow_records_count(self, obj):
-        return obj.cashflowrecord_set.count()
+        return obj.records_count
 
     cashflow_records_count.short_description = 'Количество записей'
+    cashflow_records_count.admin_order_field = 'records_count'
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(MergeAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'transaction_type', 'subcategories_count', 'cashflow_records_count')
     list_filter = ('transaction_type',)
+    list_select_related = ('transaction_type',)
     search_fields = ('name', 'transaction_type__name')
     ordering = ('transaction_type', 'name')
+    autocomplete_fields = ('transaction_type',)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).annotate(subcategories_total=Count('subcategories'))
+        return annotate_records_count(queryset)
 
     def subcategories_count(self, obj):
-        return obj.subcategories.count()
+        return obj.subcategories_total
 
     subcategories_count.short_description = 'Количество подкатегорий'
+    subcategories_count.admin_order_field = 'subcategories_total'
 
     def cashflow_records_count(self, obj):
-        return obj.cashflowrecord_set.count()
+        return obj.records_count
 
     cashflow_records_count.short_description = 'Количество записей'
+    cashflow_records_count.admin_order_field = 'records_count'
 
 
 @admin.register(Subcategory)
-class SubcategoryAdmin(admin.ModelAdmin):
+class SubcategoryAdmin(MergeAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'category', 'transaction_type', 'cashflow_records_count')
     list_filter = ('category__transaction_type', 'category')
+    list_select_related = ('category__transaction_type',)
     search_fields = ('name', 'category__name')
     ordering = ('category', 'name')
+    autocomplete_fields = ('category',)
+
+    def get_queryset(self, request):
+        return annotate_records_count(super().get_queryset(request))
 
     def transaction_type(self, obj):
         return obj.category.transaction_type
@@ -181,12 +412,131 @@ class SubcategoryAdmin(admin.ModelAdmin):
     transaction_type.short_description = 'Тип операции'
 
     def cashflow_records_count(self, obj):
-        return obj.cashflowrecord_set.count()
+        return obj.records_count
 
     cashflow_records_count.short_description = 'Количество записей'
+    cashflow_records_count.admin_order_field = 'records_count'
+
+
+class ReadOnlyAdminMixin:
+    """Только просмотр: записи создаются и удаляются командами"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedCashFlowRecord)
+class ArchivedCashFlowRecordAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    """Архивные записи ДДС (перенос - командой archive_records)"""
+    list_display = ('id', 'created_date', 'status', 'transaction_type', 'category', 'subcategory', 'amount')
+    list_select_related = ('status', 'transaction_type', 'category', 'subcategory')
+    list_filter = ('transaction_type', 'created_date')
+    search_fields = ('comment',)
+    ordering = ('-created_date',)
+    list_per_page = 50
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        # Точное количество архива кэшируется до изменения версии записей
+        return CountStrategyPaginator(
+            queryset, per_page, orphans, allow_empty_first_page, count_strategy=RollupEstimateCount()
+        )
+
+
+@admin.register(CashFlowArchiveBatch)
+class CashFlowArchiveBatchAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    """Журнал архиваций"""
+    list_display = ('created_at', 'cutoff', 'records_count')
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Профили запросов: просмотр сводки и скачивание файла pstats"""
+    list_display = (
+        'created_at', 'method', 'path', 'view_name', 'status_code',
+        'duration_ms', 'trigger', 'user', 'download_link'
+    )
+    list_filter = ('trigger', 'method', 'view_name')
+    list_select_related = ('user',)
+    search_fields = ('path', 'view_name')
+    date_hierarchy = 'created_at'
+    exclude = ('profile_data', 'stats')
+    readonly_fields = (
+        'created_at', 'method', 'path', 'view_name', 'user', 'trigger',
+        'status_code', 'duration_ms', 'download_link', 'stats_preview'
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path(
+                '<path:object_id>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='web_requestprofile_download'
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def download_view(self, request, object_id):
+        """Файл pstats (python -m pstats, snakeviz)"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = get_object_or_404(RequestProfile, pk=object_id)
+        response = HttpResponse(bytes(profile.profile_data), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile.pk}.prof"'
+        return response
+
+    def changelist_view(self, request, extra_context=None):
+        """Токен профилирования текущего сотрудника - в сообщении над списком"""
+        if settings.CASHFLOW_PROFILING_ENABLED and request.method == 'GET':
+            token = make_profile_token(request.user)
+            self.message_user(
+                request,
+                f'Токен профилирования: {token} - заголовок {PROFILE_HEADER} или параметр '
+                f'?{PROFILE_PARAM}=; действует {settings.CASHFLOW_PROFILING_TOKEN_MAX_AGE // 60} мин.',
+                messages.INFO
+            )
+        return super().changelist_view(request, extra_context)
+
+    def download_link(self, obj):
+        url = reverse('admin:web_requestprofile_download', args=[obj.pk])
+        return format_html('<a href="{}">profile-{}.prof</a>', url, obj.pk)
+
+    download_link.short_description = 'Файл pstats'
+
+    def stats_preview(self, obj):
+        return format_html('<pre style="font-size: 11px; overflow-x: auto">{}</pre>', obj.stats)
+
+    stats_preview.short_description = 'Сводка'
 
 
 # Кастомизация заголовка админки
 admin.site.site_header = 'Система управления движением денежных средств (ДДС)'
 admin.site.site_title = 'ДДС Админка'
-admin.site.index_title = 'Панель управления ДДС'
\ No newline at end of file
+admin.site.index_title = 'Панель управления ДДС'
+
+
+@admin.register(CapturedQuery)
+class CapturedQueryAdmin(admin.ModelAdmin):
+    """Снятые формы SQL-запросов (см. QueryCaptureMiddleware и команду advise_indexes)"""
+    list_display = ('view_name', 'calls', 'total_ms', 'last_seen', 'first_seen')
+    list_filter = ('view_name',)
+    search_fields = ('sql',)
+    readonly_fields = ('fingerprint', 'view_name', 'sql', 'params', 'calls', 'total_ms', 'first_seen', 'last_seen')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
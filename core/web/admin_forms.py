@@ -2,6 +2,7 @@ from django import forms
 from django.core.exceptions import ValidationError
 from decimal import Decimal, InvalidOperation
 from .models import CashFlowRecord, Category, Subcategory
+from .taxonomy import check_hierarchy
 
 
 class CashFlowRecordAdminForm(forms.ModelForm):
@@ -27,13 +28,13 @@ class CashFlowRecordAdminForm(forms.ModelForm):
             self.fields['subcategory'].queryset = Subcategory.objects.none()
         else:
             # Для существующих записей - ограничиваем по выбранному типу
-            if self.instance.transaction_type:
+            if self.instance.transaction_type_id:
                 self.fields['category'].queryset = Category.objects.filter(
-                    transaction_type=self.instance.transaction_type
+                    transaction_type_id=self.instance.transaction_type_id
                 )
-            if self.instance.category:
+            if self.instance.category_id:
                 self.fields['subcategory'].queryset = Subcategory.objects.filter(
-                    category=self.instance.category
+                    category_id=self.instance.category_id
                 )
 
     def clean_amount(self):
@@ -58,20 +59,12 @@ class CashFlowRecordAdminForm(forms.ModelForm):
     def clean(self):
         """Валидация согласованности категорий и подкатегорий"""
         cleaned_data = super().clean()
-        transaction_type = cleaned_data.get('transaction_type')
-        category = cleaned_data.get('category')
-        subcategory = cleaned_data.get('subcategory')
-
-        if category and transaction_type:
-            if category.transaction_type != transaction_type:
-                raise ValidationError({
-                    'category': 'Выбранная категория не принадлежит выбранному типу операции.'
-                })
-
-        if subcategory and category:
-            if subcategory.category != category:
-                raise ValidationError({
-                    'subcategory': 'Выбранная подкатегория не принадлежит выбранной категории.'
-                })
+        # Сравнение id по индексу справочников, без загрузки связанных объектов
+        errors = check_hierarchy(*(
+            cleaned_data[field].pk if cleaned_data.get(field) else None
+            for field in ('transaction_type', 'category', 'subcategory')
+        ))
+        if errors:
+            raise ValidationError(errors)
 
         return cleaned_data
\ No newline at end of file
@@ -0,0 +1,105 @@
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import F, Max
+
+from .models import CashFlowRecord, ArchivedCashFlowRecord, CashFlowRecordWithArchive, CashFlowArchiveBatch
+from .versions import RECORDS, bump_version
+
+ARCHIVE_DEFAULT_CHUNK_SIZE = 5000
+
+# Поля, переносимые в архив (id сохраняется)
+ARCHIVE_FIELDS = (
+    'id', 'created_date', 'status_id', 'transaction_type_id',
+    'category_id', 'subcategory_id', 'amount', 'comment', 'source', 'external_id'
+)
+
+# Параметры запроса с фильтром по дате записи
+DATE_PARAMS = ('created_date', 'date_from', 'date_to')
+
+
+def archive_cutoff(using=None):
+    """Граница архива: в архиве только записи раньше этой даты (None - архив пуст)"""
+    return CashFlowArchiveBatch.objects.using(using).aggregate(cutoff=Max('cutoff'))['cutoff']
+
+
+async def aarchive_cutoff():
+    return (await CashFlowArchiveBatch.objects.aaggregate(cutoff=Max('cutoff')))['cutoff']
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def has_date_filter(params):
+    return any(_parse_date(params.get(name)) for name in DATE_PARAMS)
+
+
+def reaches_archive(params, cutoff):
+    """
+    Заходит ли фильтр по дате в архивный период (раньше cutoff).
+
+    Без фильтра по дате список показывает только оперативные записи;
+    фильтр только по date_to не ограничен снизу и всегда заходит в архив.
+    """
+    if cutoff is None:
+        return False
+    created_date = _parse_date(params.get('created_date'))
+    if created_date:
+        return created_date < cutoff
+    date_from = _parse_date(params.get('date_from'))
+    if date_from:
+        return date_from < cutoff
+    return _parse_date(params.get('date_to')) is not None
+
+
+def records_model(params, using=None):
+    """Модель записей для списка: с архивом, только если фильтр по дате заходит в него"""
+    if has_date_filter(params) and reaches_archive(params, archive_cutoff(using)):
+        return CashFlowRecordWithArchive
+    return CashFlowRecord
+
+
+async def arecords_model(params):
+    if has_date_filter(params) and reaches_archive(params, await aarchive_cutoff()):
+        return CashFlowRecordWithArchive
+    return CashFlowRecord
+
+
+def archive_records(cutoff, chunk_size=ARCHIVE_DEFAULT_CHUNK_SIZE, progress=None, using=None):
+    """
+    Перенос записей раньше cutoff в архив пачками по chunk_size.
+
+    Каждая пачка переносится в своей транзакции вместе с записью в журнале
+    архиваций и новой версией записей: прерванный запуск оставляет журнал
+    (границу архива) согласованным с уже перенесенными записями. Записи удаляются
+    без сигналов, поэтому дневные агрегаты и остатки сохраняют суммы архивных
+    периодов; индекс поиска очищается триггерами. Возвращает количество записей.
+    """
+    live = CashFlowRecord.objects.using(using).filter(created_date__lt=cutoff)
+    batch = None
+    moved = 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(live.order_by('pk').values(*ARCHIVE_FIELDS)[:chunk_size])
+            if not rows:
+                break
+            ArchivedCashFlowRecord.objects.using(using).bulk_create(
+                [ArchivedCashFlowRecord(**row) for row in rows]
+            )
+            chunk = CashFlowRecord.objects.using(using).filter(pk__in=[row['id'] for row in rows])
+            chunk._raw_delete(chunk.db)
+            if batch is None:
+                batch = CashFlowArchiveBatch.objects.using(using).create(cutoff=cutoff, records_count=len(rows))
+            else:
+                CashFlowArchiveBatch.objects.using(using).filter(pk=batch.pk).update(
+                    records_count=F('records_count') + len(rows)
+                )
+            bump_version(RECORDS, using=using)
+        moved += len(rows)
+        if progress:
+            progress(moved)
+    return moved
@@ -0,0 +1,189 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import CashFlowDailyRollup, CashFlowDailyBalance
+from .taxonomy import taxonomy_index
+
+# Знак суммы в сальдо по названию типа операции; прочие типы в остаток не входят
+BALANCE_SIGNS = {
+    'Пополнение': 1,
+    'Списание': -1,
+}
+
+
+def transaction_type_signs(using=None, verify=False):
+    """
+    Знак сальдо по id типа операции - по снимку справочников процесса,
+    без запроса на каждое изменение записей (verify - см. taxonomy_index).
+    """
+    return {
+        type_id: BALANCE_SIGNS[name]
+        for type_id, name in taxonomy_index(using, verify=verify).transaction_type_names.items()
+        if name in BALANCE_SIGNS
+    }
+
+
+def scopes_for(status_id):
+    """Области остатка для записи: итог по всем статусам и свой статус"""
+    return ((True, None), (False, status_id))
+
+
+def balance_deltas(rollup_deltas, using=None):
+    """
+    Изменения сальдо {(is_total, status_id, day): сумма} по изменениям
+    дневных агрегатов (см. rollup.collect_deltas).
+    """
+    signs = transaction_type_signs(using)
+    deltas = defaultdict(Decimal)
+    for (day, status_id, transaction_type_id, *rest), (amount, count) in rollup_deltas.items():
+        sign = signs.get(transaction_type_id)
+        if not sign or not amount:
+            continue
+        for is_total, scope_status_id in scopes_for(status_id):
+            deltas[(is_total, scope_status_id, day)] += amount * sign
+    return {key: value for key, value in deltas.items() if value}
+
+
+def _scope_rows(is_total, status_id, using=None):
+    return CashFlowDailyBalance.objects.using(using).filter(is_total=is_total, status_id=status_id)
+
+
+def apply_balance_delta(is_total, status_id, day, amount, using=None):
+    """
+    Применение изменения сальдо за день.
+
+    Остаток сдвигается у строки дня и всех более поздних строк области
+    (O(дней после day) для задним числом измененных записей), строка дня
+    создается при отсутствии и удаляется, если сальдо за день стало нулевым.
+    """
+    rows = _scope_rows(is_total, status_id, using)
+    rows.filter(day__gt=day).update(balance=F('balance') + amount)
+
+    updated = rows.filter(day=day).update(net=F('net') + amount, balance=F('balance') + amount)
+    if not updated:
+        previous = rows.filter(day__lt=day).order_by('-day').values_list('balance', flat=True).first()
+        CashFlowDailyBalance.objects.using(using).create(
+            day=day, status_id=status_id, is_total=is_total,
+            net=amount, balance=(previous or 0) + amount
+        )
+    else:
+        rows.filter(day=day, net=0).delete()
+
+
+def apply_balance_deltas(rollup_deltas, using=None):
+    """Обновление остатков по изменениям дневных агрегатов в одной транзакции"""
+    deltas = balance_deltas(rollup_deltas, using)
+    if not deltas:
+        return
+    with transaction.atomic(using=using):
+        for (is_total, status_id, day), amount in sorted(deltas.items(), key=lambda item: str(item[0])):
+            apply_balance_delta(is_total, status_id, day, amount, using=using)
+
+
+def balance_on(day, status_id=None, is_total=True, using=None):
+    """
+    Остаток на конец дня day - одна строка по индексу (is_total, status, day).
+    """
+    balance = (
+        _scope_rows(is_total, status_id, using)
+        .filter(day__lte=day)
+        .order_by('-day')
+        .values_list('balance', flat=True)
+        .first()
+    )
+    return balance or Decimal('0')
+
+
+def balance_curve(dates, date_to, status_id=None, is_total=True, using=None):
+    """
+    Остатки на конец интервалов.
+
+    dates - начала интервалов по возрастанию, date_to - конец последнего.
+    Читаются только строки в периоде и остаток на его начало: O(дней периода).
+    """
+    if not dates:
+        return []
+    rows = _scope_rows(is_total, status_id, using)
+    opening = rows.filter(day__lt=dates[0]).order_by('-day').values_list('balance', flat=True).first()
+    current = opening or Decimal('0')
+    changes = list(
+        rows.filter(day__gte=dates[0], day__lte=date_to).order_by('day').values_list('day', 'balance')
+    )
+
+    curve = []
+    position = 0
+    ends = dates[1:] + [None]
+    for end in ends:
+        while position < len(changes) and (end is None or changes[position][0] < end):
+            current = changes[position][1]
+            position += 1
+        curve.append(current)
+    return curve
+
+
+def raw_balances(using=None):
+    """
+    Остатки, посчитанные по дневным агрегатам: {(is_total, status_id, day): (сальдо, остаток)}.
+    """
+    signs = transaction_type_signs(using, verify=True)
+    nets = defaultdict(Decimal)
+    rows = (
+        CashFlowDailyRollup.objects.using(using)
+        .filter(transaction_type_id__in=signs)
+        .order_by()
+        .values('day', 'status_id', 'transaction_type_id')
+        .annotate(total=Sum('amount'))
+    )
+    for row in rows.iterator():
+        amount = Decimal(row['total']) * signs[row['transaction_type_id']]
+        for is_total, status_id in scopes_for(row['status_id']):
+            nets[(is_total, status_id, row['day'])] += amount
+
+    result = {}
+    running = defaultdict(Decimal)
+    for key in sorted(nets, key=lambda item: item[2]):
+        net = nets[key].quantize(Decimal('0.01'))
+        if not net:
+            continue
+        scope = key[:2]
+        running[scope] += net
+        result[key] = (net, running[scope])
+    return result
+
+
+def rebuild_balances(batch_size=1000, using=None):
+    """Полная пересборка остатков по дневным агрегатам. Возвращает количество строк"""
+    balances = raw_balances(using)
+    with transaction.atomic(using=using):
+        CashFlowDailyBalance.objects.using(using).all().delete()
+        CashFlowDailyBalance.objects.using(using).bulk_create(
+            [
+                CashFlowDailyBalance(is_total=is_total, status_id=status_id, day=day, net=net, balance=balance)
+                for (is_total, status_id, day), (net, balance) in balances.items()
+            ],
+            batch_size=batch_size
+        )
+    return len(balances)
+
+
+def verify_balances(using=None):
+    """Сверка остатков с дневными агрегатами. Возвращает список (ключ, ожидается, фактически)"""
+    expected = raw_balances(using)
+    actual = {
+        (row['is_total'], row['status_id'], row['day']): (
+            Decimal(row['net']).quantize(Decimal('0.01')),
+            Decimal(row['balance']).quantize(Decimal('0.01')),
+        )
+        for row in CashFlowDailyBalance.objects.using(using).values(
+            'is_total', 'status_id', 'day', 'net', 'balance'
+        ).iterator()
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        if expected.get(key) != actual.get(key):
+            mismatches.append((key, expected.get(key), actual.get(key)))
+    return mismatches
@@ -0,0 +1,193 @@
+import platform
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+
+import django
+from django.db import connection, transaction
+from django.conf import settings
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import TransactionType, Subcategory, CashFlowRecord
+
+
+class BenchmarkScenario:
+    """
+    Сценарий замера: HTTP-запрос к приложению.
+
+    path и data - строки/словари либо функции от контекста (id справочников),
+    write=True - запрос изменяет данные и выполняется в откатываемой транзакции.
+    """
+
+    def __init__(self, name, path, method='get', params=None, data=None, write=False):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.params = params
+        self.data = data
+        self.write = write
+
+    def resolve(self, value, context):
+        return value(context) if callable(value) else value
+
+
+def benchmark_context():
+    """Параметры сценариев по текущим данным: первые справочники и период фильтра"""
+    leaf = Subcategory.objects.select_related('category').order_by('pk').first()
+    transaction_type = TransactionType.objects.order_by('pk').first()
+    return {
+        'transaction_type': transaction_type.pk if transaction_type else None,
+        'category': leaf.category_id if leaf else None,
+        'subcategory': leaf.pk if leaf else None,
+        'leaf_transaction_type': leaf.category.transaction_type_id if leaf else None,
+        'date_from': (timezone.localdate() - timedelta(days=90)).isoformat(),
+    }
+
+
+BENCHMARK_SCENARIOS = (
+    BenchmarkScenario('records_list', lambda ctx: reverse('cashflowrecord-list')),
+    BenchmarkScenario(
+        'records_list_filtered', lambda ctx: reverse('cashflowrecord-list'),
+        params=lambda ctx: {'transaction_type': ctx['transaction_type'], 'date_from': ctx['date_from']}
+    ),
+    BenchmarkScenario(
+        'records_list_cursor', lambda ctx: reverse('cashflowrecord-list'), params={'cursor': ''}
+    ),
+    BenchmarkScenario('records_search', lambda ctx: reverse('cashflowrecord-list'), params={'search': 'Оплата'}),
+    BenchmarkScenario('summary', lambda ctx: reverse('cashflowrecord-summary')),
+    BenchmarkScenario('by_category', lambda ctx: reverse('cashflowrecord-by-category')),
+    BenchmarkScenario('monthly_report', lambda ctx: reverse('cashflowrecord-monthly-report')),
+    BenchmarkScenario(
+        'timeseries', lambda ctx: reverse('cashflowrecord-timeseries'), params={'bucket': 'week'}
+    ),
+    BenchmarkScenario(
+        'record_create', lambda ctx: reverse('cashflowrecord-list'), method='post', write=True,
+        data=lambda ctx: {
+            'created_date': timezone.localdate().isoformat(),
+            'transaction_type': ctx['leaf_transaction_type'],
+            'category': ctx['category'],
+            'subcategory': ctx['subcategory'],
+            'amount': '1000.00',
+            'comment': 'Замер производительности',
+        }
+    ),
+    BenchmarkScenario('html_index', lambda ctx: reverse('cash_flow:index')),
+    BenchmarkScenario('dictionary_manage', lambda ctx: reverse('cash_flow:dictionary_manage')),
+    BenchmarkScenario('category_list', lambda ctx: reverse('cash_flow:category_list')),
+    BenchmarkScenario('subcategory_list', lambda ctx: reverse('cash_flow:subcategory_list')),
+)
+
+
+def git_commit():
+    """Текущий коммит репозитория (None вне git)"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_scenario(client, scenario, context, iterations=5, warmup=1):
+    """
+    Замер сценария: время ответа (мс) и количество SQL-запросов.
+
+    Запросы на запись откатываются, чтобы замеры не меняли данные.
+    """
+    path = scenario.resolve(scenario.path, context)
+    params = scenario.resolve(scenario.params, context)
+    data = scenario.resolve(scenario.data, context)
+
+    timings = []
+    queries = None
+    status_code = None
+    for iteration in range(warmup + iterations):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                if scenario.method == 'post':
+                    response = client.post(path, data, content_type='application/json')
+                else:
+                    response = client.get(path, params, HTTP_ACCEPT='application/json')
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(scenario.write)
+
+        status_code = response.status_code
+        queries = len(captured)
+        if iteration >= warmup:
+            timings.append(elapsed * 1000)
+
+    return {
+        'name': scenario.name,
+        'method': scenario.method.upper(),
+        'path': path,
+        'status': status_code,
+        'iterations': iterations,
+        'queries': queries,
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'min_ms': round(min(timings), 2),
+        'max_ms': round(max(timings), 2),
+    }
+
+
+def run_benchmarks(user, names=None, iterations=5, warmup=1):
+    """
+    Прогон сценариев BENCHMARK_SCENARIOS от имени user внутри процесса.
+
+    Возвращает отчет в виде словаря (для сохранения в JSON и сравнения).
+    """
+    client = Client()
+    client.force_login(user)
+    context = benchmark_context()
+    scenarios = [scenario for scenario in BENCHMARK_SCENARIOS if not names or scenario.name in names]
+
+    # Тестовый клиент обращается к хосту testserver
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        results = [run_scenario(client, scenario, context, iterations, warmup) for scenario in scenarios]
+
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'records': CashFlowRecord.objects.count(),
+        'iterations': iterations,
+        'results': results,
+    }
+
+
+def compare_reports(report, baseline, threshold=1.25):
+    """
+    Сравнение с базовым отчетом.
+
+    Регрессия - медиана времени выросла больше чем в threshold раз или
+    увеличилось количество SQL-запросов. Возвращает список описаний регрессий.
+    """
+    previous = {result['name']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        before = previous.get(result['name'])
+        if not before:
+            continue
+        if before['median_ms'] and result['median_ms'] > before['median_ms'] * threshold:
+            regressions.append(
+                f"{result['name']}: медиана {before['median_ms']} -> {result['median_ms']} мс"
+            )
+        if before['queries'] is not None and result['queries'] > before['queries']:
+            regressions.append(
+                f"{result['name']}: SQL-запросов {before['queries']} -> {result['queries']}"
+            )
+    return regressions
@@ -0,0 +1,271 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from .models import CashFlowRecord, ArchivedCashFlowRecord
+from .rollup import RECORD_KEY_FIELDS, collect_deltas, apply_deltas
+from .serializers import CashFlowRecordBulkRowSerializer
+from .versions import RECORDS, bump_version
+
+
+BULK_DEFAULT_CHUNK_SIZE = 1000
+BULK_MAX_CHUNK_SIZE = 10000
+
+# Поля, которые синхронизация сравнивает и обновляет у существующей записи
+UPSERT_FIELDS = ('created_date', 'status', 'transaction_type', 'category', 'subcategory', 'amount', 'comment')
+
+# Количество внешних идентификаторов в одном запросе поиска (лимит параметров SQLite)
+UPSERT_LOOKUP_SIZE = 500
+
+
+def validate_bulk_rows(rows, snapshot, serializer_class=CashFlowRecordBulkRowSerializer, source='',
+                       fill_date=True):
+    """
+    Проверка строк массовой загрузки.
+
+    Формат полей проверяется сериализатором строки, справочники - по снимку
+    в памяти, без запросов к БД. Возвращает (записи, ошибки), где записи -
+    список несохраненных CashFlowRecord, ошибки - список
+    {'index': индекс, 'errors': {поле: сообщение}}.
+    source - источник по умолчанию для строк с внешним идентификатором.
+    При fill_date=False дата без значения остается None (ее подставляет
+    upsert_records).
+    """
+    records = []
+    errors = []
+    today = timezone.localdate() if fill_date else None
+    # Один экземпляр на все строки: поля сериализатора строятся один раз
+    serializer = serializer_class()
+
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'index': index, 'errors': {'non_field_errors': ['Ожидается объект']}})
+            continue
+
+        try:
+            data = serializer.run_validation(row)
+        except ValidationError as exc:
+            errors.append({'index': index, 'errors': as_serializer_error(exc)})
+            continue
+
+        row_errors = snapshot.check(
+            data['transaction_type'], data['category'], data['subcategory'], data.get('status')
+        )
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+            continue
+
+        records.append(CashFlowRecord(
+            created_date=data.get('created_date') or today,
+            status_id=data.get('status'),
+            transaction_type_id=data['transaction_type'],
+            category_id=data['category'],
+            subcategory_id=data['subcategory'],
+            amount=data['amount'],
+            comment=data.get('comment'),
+            source=data.get('source') or source,
+            external_id=data.get('external_id'),
+        ))
+
+    return records, errors
+
+
+def insert_records(records, chunk_size=BULK_DEFAULT_CHUNK_SIZE):
+    """
+    Вставка проверенных записей через bulk_create пачками.
+
+    Каждая пачка вставляется в своей транзакции вместе с обновлением дневных
+    агрегатов и версии записей (bulk_create не отправляет сигналы save).
+    Возвращает количество вставленных записей.
+    """
+    created = 0
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        with transaction.atomic():
+            CashFlowRecord.objects.bulk_create(chunk)
+            apply_deltas(collect_deltas(chunk))
+            bump_version(RECORDS)
+        created += len(chunk)
+    return created
+
+
+def find_by_external_id(queryset, keys, fields):
+    """
+    Поиск записей по ключам (источник, внешний идентификатор).
+
+    Запросы группируются по источнику и идут пачками по UPSERT_LOOKUP_SIZE.
+    Возвращает {ключ: словарь значений fields}.
+    """
+    by_source = {}
+    for source, external_id in keys:
+        by_source.setdefault(source, []).append(external_id)
+
+    found = {}
+    for source, external_ids in by_source.items():
+        for start in range(0, len(external_ids), UPSERT_LOOKUP_SIZE):
+            rows = queryset.filter(
+                source=source, external_id__in=external_ids[start:start + UPSERT_LOOKUP_SIZE]
+            ).values('external_id', *fields)
+            for row in rows:
+                found[(source, row['external_id'])] = row
+    return found
+
+
+def upsert_records(records, chunk_size=BULK_DEFAULT_CHUNK_SIZE):
+    """
+    Синхронизация проверенных записей по ключу (source, external_id).
+
+    Для каждой пачки существующие записи загружаются несколькими запросами
+    по ключам, измененные строки удаляются одним запросом и вставляются
+    заново с прежними id вместе с новыми (bulk_create), совпадающие
+    пропускаются. Дневные агрегаты меняются
+    на разницу старых и новых значений. Записи, уже перенесенные в архив,
+    не изменяются. При повторе ключа в наборе действует последняя строка.
+    Записи без даты сохраняют дату существующей записи, новые получают
+    текущую - повторная отправка той же строки ничего не меняет.
+    Возвращает счетчики inserted, updated, unchanged, archived.
+    """
+    unique = {}
+    for record in records:
+        unique[(record.source, record.external_id)] = record
+    records = list(unique.values())
+
+    stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'archived': 0}
+    compare_fields = [CashFlowRecord._meta.get_field(name).attname for name in UPSERT_FIELDS]
+    existing_fields = ('id', *RECORD_KEY_FIELDS, 'amount', 'comment')
+    today = timezone.localdate()
+
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        with transaction.atomic():
+            keys = [(record.source, record.external_id) for record in chunk]
+            existing = find_by_external_id(CashFlowRecord.objects.all(), keys, existing_fields)
+            archived = find_by_external_id(
+                ArchivedCashFlowRecord.objects.all(), [key for key in keys if key not in existing], ()
+            )
+
+            to_create, to_update, previous = [], [], []
+            for key, record in zip(keys, chunk):
+                current = existing.get(key)
+                if record.created_date is None:
+                    record.created_date = today if current is None else current['created_date']
+                if current is None:
+                    if key in archived:
+                        stats['archived'] += 1
+                    else:
+                        to_create.append(record)
+                elif all(getattr(record, field) == current[field] for field in compare_fields):
+                    stats['unchanged'] += 1
+                else:
+                    record.pk = current['id']
+                    to_update.append(record)
+                    previous.append(current)
+
+            if to_create or to_update:
+                # bulk_update строит CASE по каждому полю и на тысячах строк
+                # медленнее замены; удаление без сигналов, агрегаты - ниже
+                stale = CashFlowRecord.objects.filter(pk__in=[record.pk for record in to_update])
+                stale._raw_delete(stale.db)
+                CashFlowRecord.objects.bulk_create(to_create + to_update)
+                deltas = collect_deltas(previous, sign=-1)
+                apply_deltas(collect_deltas(to_create + to_update, deltas=deltas))
+                bump_version(RECORDS)
+        stats['inserted'] += len(to_create)
+        stats['updated'] += len(to_update)
+    return stats
+
+
+def validate_bulk_patch(data, snapshot):
+    """
+    Проверка изменения для записей фильтра один раз по снимку справочников.
+
+    Если меняется классификация, категория и тип операции берутся
+    из подкатегории (или проверяются на соответствие ей). Возвращает
+    (изменения {поле модели: значение}, ошибки по полям).
+    """
+    changes = {}
+    for field in ('created_date', 'comment'):
+        if field in data:
+            changes[field] = data[field]
+
+    errors = {}
+    status_id = data.get('status')
+    if 'status' in data:
+        changes['status_id'] = status_id
+        if status_id is not None and status_id not in snapshot.status_ids:
+            errors['status'] = 'Статус не найден'
+
+    if {'transaction_type', 'category', 'subcategory'} & set(data):
+        subcategory_id = data.get('subcategory')
+        if subcategory_id is None:
+            errors['subcategory'] = 'Для смены категории или типа операции укажите подкатегорию'
+            return changes, errors
+        category_id = data.get('category', snapshot.subcategory_categories.get(subcategory_id))
+        transaction_type_id = data.get('transaction_type', snapshot.category_types.get(category_id))
+        errors.update(snapshot.check(transaction_type_id, category_id, subcategory_id, status_id))
+        changes.update(
+            transaction_type_id=transaction_type_id, category_id=category_id, subcategory_id=subcategory_id
+        )
+    return changes, errors
+
+
+def iter_record_ids(queryset, chunk_size=BULK_DEFAULT_CHUNK_SIZE):
+    """
+    id записей queryset пачками по возрастанию.
+
+    Следующая пачка выбирается после последнего id (без OFFSET), поэтому
+    записи, переставшие подходить под фильтр после изменения, не сдвигают выборку.
+    """
+    ids_queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    last_id = None
+    while True:
+        chunk = ids_queryset if last_id is None else ids_queryset.filter(pk__gt=last_id)
+        ids = list(chunk[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def update_records(queryset, changes, chunk_size=BULK_DEFAULT_CHUNK_SIZE):
+    """
+    Изменение записей queryset пачками: UPDATE по id в своей транзакции.
+
+    Если меняются поля ключа дневного агрегата, прежние значения пачки
+    блокируются и читаются до UPDATE, агрегаты и остатки переносятся на
+    новые ключи. Сигналы save не отправляются. Подходит и для архива
+    (ArchivedCashFlowRecord) - его суммы тоже входят в агрегаты.
+    Возвращает количество записей.
+    """
+    rollup_changed = bool(set(changes) & set(RECORD_KEY_FIELDS))
+    updated = 0
+    for ids in iter_record_ids(queryset, chunk_size):
+        with transaction.atomic():
+            rows = queryset.model.objects.filter(pk__in=ids)
+            if rollup_changed:
+                previous = list(rows.select_for_update().values(*RECORD_KEY_FIELDS, 'amount'))
+            count = rows.update(**changes)
+            if rollup_changed:
+                deltas = collect_deltas(previous, sign=-1)
+                apply_deltas(collect_deltas([dict(row, **changes) for row in previous], deltas=deltas))
+            bump_version(RECORDS)
+        updated += count
+    return updated
+
+
+def delete_records(queryset, chunk_size=BULK_DEFAULT_CHUNK_SIZE):
+    """
+    Удаление записей queryset пачками: DELETE по id в своей транзакции
+    вместе с откатом дневных агрегатов и остатков. Возвращает количество записей.
+    """
+    deleted = 0
+    for ids in iter_record_ids(queryset, chunk_size):
+        with transaction.atomic():
+            rows = CashFlowRecord.objects.filter(pk__in=ids)
+            previous = list(rows.select_for_update().values(*RECORD_KEY_FIELDS, 'amount'))
+            count = rows._raw_delete(rows.db)
+            apply_deltas(collect_deltas(previous, sign=-1))
+            bump_version(RECORDS)
+        deleted += count
+    return deleted
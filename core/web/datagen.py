@@ -0,0 +1,141 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .balance import rebuild_balances
+from .models import Status, TransactionType, Category, Subcategory, CashFlowRecord
+from .rollup import rebuild_rollup
+from .versions import RECORDS, bump_version
+
+# Базовое дерево справочников: тип операции -> категория -> подкатегории
+BASE_STATUSES = ('Бизнес', 'Личное', 'Налог')
+BASE_TREE = {
+    'Пополнение': {
+        'Зарплата': ('Аванс', 'Оклад', 'Премия'),
+        'Инвестиции': ('Дивиденды', 'Купоны'),
+        'Продажи': ('Товары', 'Услуги'),
+    },
+    'Списание': {
+        'Инфраструктура': ('VPS', 'Proxy', 'Домены'),
+        'Маркетинг': ('Farpost', 'Avito', 'Контекстная реклама'),
+        'Офис': ('Аренда', 'Канцелярия'),
+        'Налоги': ('НДФЛ', 'НДС'),
+    },
+}
+
+COMMENT_WORDS = ('Оплата', 'Поступление', 'Счет', 'Перевод', 'Возврат', 'Договор', 'Акт', 'Аванс')
+
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+def build_dictionary_tree(extra_categories=0, subcategories_per_category=5):
+    """
+    Создание справочников: базовое дерево и extra_categories дополнительных
+    категорий (поровну по типам операций) с подкатегориями.
+
+    Повторный запуск не создает дубликатов. Возвращает (статусы, список
+    троек (тип операции, категория, подкатегория)).
+    """
+    tree = {transaction_type: dict(categories) for transaction_type, categories in BASE_TREE.items()}
+    type_names = list(tree)
+    for index in range(extra_categories):
+        tree[type_names[index % len(type_names)]][f'Категория {index + 1}'] = tuple(
+            f'Подкатегория {index + 1}.{number + 1}' for number in range(subcategories_per_category)
+        )
+
+    statuses = [Status.objects.get_or_create(name=name)[0] for name in BASE_STATUSES]
+    leaves = []
+    for type_name, categories in tree.items():
+        transaction_type = TransactionType.objects.get_or_create(name=type_name)[0]
+        for category_name, subcategory_names in categories.items():
+            category = Category.objects.get_or_create(transaction_type=transaction_type, name=category_name)[0]
+            for subcategory_name in subcategory_names:
+                subcategory = Subcategory.objects.get_or_create(category=category, name=subcategory_name)[0]
+                leaves.append((transaction_type.pk, category.pk, subcategory.pk))
+    return statuses, leaves
+
+
+def zipf_weights(count, exponent=1.1, rng=None):
+    """Веса с распределением Ципфа (несколько частых значений, длинный хвост) в случайном порядке"""
+    weights = [1 / (rank ** exponent) for rank in range(1, count + 1)]
+    (rng or random).shuffle(weights)
+    return weights
+
+
+class RecordGenerator:
+    """
+    Генератор записей ДДС с неравномерным распределением.
+
+    Даты смещены к последним дням периода, суммы - логнормальные
+    (пополнения крупнее списаний), подкатегории - по Ципфу, статусы
+    заполнены у 80% записей, комментарии - у половины.
+    """
+
+    def __init__(self, statuses, leaves, days=730, seed=None, income_type_id=None):
+        self.rng = random.Random(seed)
+        self.statuses = [status.pk for status in statuses]
+        self.leaves = leaves
+        self.days = days
+        self.today = timezone.localdate()
+        self.income_type_id = income_type_id
+
+        weights = zipf_weights(len(leaves), rng=self.rng)
+        self.cum_weights = []
+        total = 0
+        for weight in weights:
+            total += weight
+            self.cum_weights.append(total)
+        self.status_weights = zipf_weights(len(self.statuses), rng=self.rng)
+
+    def amount(self, income):
+        value = self.rng.lognormvariate(9 if income else 8, 1.2)
+        return min(Decimal(value).quantize(Decimal('0.01')), MAX_AMOUNT) or Decimal('0.01')
+
+    def records(self, count):
+        rng = self.rng
+        leaves = rng.choices(self.leaves, cum_weights=self.cum_weights, k=count)
+        statuses = rng.choices(self.statuses, weights=self.status_weights, k=count)
+        for (transaction_type_id, category_id, subcategory_id), status_id in zip(leaves, statuses):
+            # random() ** 2 чаще дает значения около нуля - недавние даты
+            created_date = self.today - timedelta(days=int(self.days * rng.random() ** 2))
+            comment = None
+            if rng.random() < 0.5:
+                comment = f'{rng.choice(COMMENT_WORDS)} №{rng.randint(1, 99999)} от {created_date:%d.%m.%Y}'
+            yield CashFlowRecord(
+                created_date=created_date,
+                status_id=status_id if rng.random() < 0.8 else None,
+                transaction_type_id=transaction_type_id,
+                category_id=category_id,
+                subcategory_id=subcategory_id,
+                amount=self.amount(transaction_type_id == self.income_type_id),
+                comment=comment,
+            )
+
+
+def generate_records(generator, total, chunk_size=5000, progress=None):
+    """
+    Вставка total записей пачками bulk_create.
+
+    Агрегаты и остатки не обновляются по каждой пачке - они пересобираются
+    один раз в конце (см. finish_generation). Возвращает количество записей.
+    """
+    created = 0
+    while created < total:
+        size = min(chunk_size, total - created)
+        with transaction.atomic():
+            CashFlowRecord.objects.bulk_create(generator.records(size), batch_size=chunk_size)
+        created += size
+        if progress:
+            progress(created)
+    return created
+
+
+def finish_generation():
+    """Пересборка агрегатов и остатков после массовой генерации, новая версия записей"""
+    rollup_rows = rebuild_rollup()
+    balance_rows = rebuild_balances()
+    bump_version(RECORDS)
+    return rollup_rows, balance_rows
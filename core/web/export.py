@@ -0,0 +1,105 @@
+import csv
+import json
+import zlib
+from datetime import date
+from decimal import Decimal
+
+
+# Поля выгрузки - совпадают с CashFlowRecordSerializer
+EXPORT_FIELDS = (
+    ('id', 'id'),
+    ('created_date', 'created_date'),
+    ('status', 'status_id'),
+    ('status_name', 'status__name'),
+    ('transaction_type', 'transaction_type_id'),
+    ('transaction_type_name', 'transaction_type__name'),
+    ('category', 'category_id'),
+    ('category_name', 'category__name'),
+    ('subcategory', 'subcategory_id'),
+    ('subcategory_name', 'subcategory__name'),
+    ('amount', 'amount'),
+    ('comment', 'comment'),
+)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+EXPORT_CHUNK_SIZE = 2000
+# Примерный размер куска ответа, отдаваемого серверу за раз
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи в файл"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Строки выгрузки без создания экземпляров моделей.
+
+    Выборка читается чанками через iterator(), поэтому память не зависит
+    от размера результата.
+    """
+    lookups = [lookup for _, lookup in EXPORT_FIELDS]
+    return queryset.values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def _format_value(value):
+    """Дата - в ISO-формате, Decimal - строкой (без потери точности)"""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _buffered(lines):
+    """Склейка мелких строк в куски ~STREAM_BUFFER_SIZE"""
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= STREAM_BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_csv(rows):
+    """Потоковая выгрузка в CSV (первая строка - заголовок)"""
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow([name for name, _ in EXPORT_FIELDS])
+        for row in rows:
+            yield writer.writerow(['' if value is None else _format_value(value) for value in row])
+
+    return _buffered(lines())
+
+
+def iter_ndjson(rows):
+    """Потоковая выгрузка в NDJSON (один JSON-объект на строку)"""
+    names = [name for name, _ in EXPORT_FIELDS]
+
+    def lines():
+        for row in rows:
+            item = {name: _format_value(value) for name, value in zip(names, row)}
+            yield json.dumps(item, ensure_ascii=False) + '\n'
+
+    return _buffered(lines())
+
+
+def iter_gzip(chunks):
+    """Потоковое сжатие gzip без накопления всего ответа в памяти"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,5 +1,9 @@
+from datetime import datetime
+
 import django_filters
+from rest_framework.filters import OrderingFilter, SearchFilter
 from .models import CashFlowRecord
+from .search import search_records
 
 
 class CashFlowRecordFilter(django_filters.FilterSet):
@@ -17,4 +21,55 @@ class CashFlowRecordFilter(django_filters.FilterSet):
             'subcategory': ['exact'],
             'created_date': ['gte', 'lte', 'exact'],
             'amount': ['gte', 'lte', 'exact'],
-        }
\ No newline at end of file
+        }
+
+
+def filter_records_by_params(queryset, params, date_field='created_date'):
+    """
+    Фильтры записей по параметрам запроса для записей или дневных агрегатов.
+
+    Поддерживает те же параметры, что и список записей: статус, тип операции,
+    категорию, подкатегорию, дату и период date_from/date_to.
+    Некорректные значения параметров игнорируются.
+    """
+    for field in ('status', 'transaction_type', 'category', 'subcategory'):
+        value = params.get(field)
+        if value and value.isdigit():
+            queryset = queryset.filter(**{f'{field}_id': value})
+
+    for param, lookup in (('created_date', ''), ('date_from', '__gte'), ('date_to', '__lte')):
+        value = params.get(param)
+        if value:
+            try:
+                queryset = queryset.filter(**{
+                    f'{date_field}{lookup}': datetime.strptime(value, '%Y-%m-%d').date()
+                })
+            except ValueError:
+                pass
+
+    return queryset
+
+
+class CashFlowRecordSearchFilter(SearchFilter):
+    """
+    Поиск записей ДДС (параметр search) по полнотекстовому индексу FTS5.
+
+    Найденные записи сортируются по релевантности, если клиент не указал
+    ordering. Без FTS5 - обычный поиск icontains.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = ' '.join(self.get_search_terms(request))
+        queryset, ranked = search_records(queryset, text)
+        if ranked:
+            queryset = queryset.order_by('search_rank', '-pk')
+        return queryset
+
+
+class CashFlowRecordOrderingFilter(OrderingFilter):
+    """Сортировка записей ДДС, не перекрывающая сортировку по релевантности поиска"""
+
+    def filter_queryset(self, request, queryset, view):
+        if 'search_rank' in queryset.query.extra_select and not request.query_params.get(self.ordering_param):
+            return queryset
+        return super().filter_queryset(request, queryset, view)
@@ -1,15 +1,18 @@
 from decimal import InvalidOperation, Decimal
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 
 from .models import Subcategory, Category, CashFlowRecord, Status, TransactionType
+from .taxonomy import taxonomy_index
 
 
 class CashFlowRecordForm(forms.ModelForm):
     """Форма записи ДДС"""
     class Meta:
         model = CashFlowRecord
-        fields = '__all__'
+        # Ключ синхронизации меняется только через API (bulk_upsert)
+        exclude = ('source', 'external_id')
         widgets = {
             'created_date': forms.DateInput(attrs={
                 'type': 'date',
@@ -24,30 +27,26 @@ class CashFlowRecordForm(forms.ModelForm):
         # Статус не обязательный
         self.fields['status'].required = False
 
-        # Для существующей записи - ограничиваем выбор категорий и подкатегорий
-        if self.instance and self.instance.pk:
-            # Устанавливаем правильные queryset для существующей записи
-            if self.instance.transaction_type:
-                # Получаем категории для текущего типа операции
-                categories = Category.objects.filter(
-                    transaction_type=self.instance.transaction_type
-                )
-                # Добавляем текущую категорию, если она не входит в queryset
-                if self.instance.category and self.instance.category not in categories:
-                    categories = categories | Category.objects.filter(id=self.instance.category.id)
-                self.fields['category'].queryset = categories
+        # Для существующей записи - ограничиваем выбор категорий и подкатегорий.
+        # Принадлежность текущих значений проверяется по индексу справочников,
+        # queryset остаются ленивыми - запросы только при выводе списков
+        instance = self.instance
+        if instance and instance.pk:
+            index = taxonomy_index()
+            if instance.transaction_type_id:
+                # Категории текущего типа операции и текущая категория, даже если она из другого типа
+                condition = Q(transaction_type_id=instance.transaction_type_id)
+                if instance.category_id and index.category_types.get(instance.category_id) != instance.transaction_type_id:
+                    condition |= Q(pk=instance.category_id)
+                self.fields['category'].queryset = Category.objects.filter(condition)
             else:
                 self.fields['category'].queryset = Category.objects.all()
 
-            if self.instance.category:
-                # Получаем подкатегории для текущей категории
-                subcategories = Subcategory.objects.filter(
-                    category=self.instance.category
-                )
-                # Добавляем текущую подкатегорию, если она не входит в queryset
-                if self.instance.subcategory and self.instance.subcategory not in subcategories:
-                    subcategories = subcategories | Subcategory.objects.filter(id=self.instance.subcategory.id)
-                self.fields['subcategory'].queryset = subcategories
+            if instance.category_id:
+                condition = Q(category_id=instance.category_id)
+                if instance.subcategory_id and index.subcategory_categories.get(instance.subcategory_id) != instance.category_id:
+                    condition |= Q(pk=instance.subcategory_id)
+                self.fields['subcategory'].queryset = Subcategory.objects.filter(condition)
             else:
                 self.fields['subcategory'].queryset = Subcategory.objects.all()
         else:
@@ -55,16 +54,16 @@ class CashFlowRecordForm(forms.ModelForm):
             self.fields['category'].queryset = Category.objects.all()
             self.fields['subcategory'].queryset = Subcategory.objects.all()
 
-        # Устанавливаем начальные значения для существующей записи
-        if self.instance and self.instance.pk:
-            self.fields['created_date'].initial = self.instance.created_date
-            if self.instance.status:
-                self.fields['status'].initial = self.instance.status
-            self.fields['transaction_type'].initial = self.instance.transaction_type
-            self.fields['category'].initial = self.instance.category
-            self.fields['subcategory'].initial = self.instance.subcategory
-            self.fields['amount'].initial = self.instance.amount
-            self.fields['comment'].initial = self.instance.comment
+        # Устанавливаем начальные значения для существующей записи (id без загрузки справочников)
+        if instance and instance.pk:
+            self.fields['created_date'].initial = instance.created_date
+            if instance.status_id:
+                self.fields['status'].initial = instance.status_id
+            self.fields['transaction_type'].initial = instance.transaction_type_id
+            self.fields['category'].initial = instance.category_id
+            self.fields['subcategory'].initial = instance.subcategory_id
+            self.fields['amount'].initial = instance.amount
+            self.fields['comment'].initial = instance.comment
 
     def clean_amount(self):
         """Простая валидация суммы"""
@@ -132,8 +131,8 @@ class SubcategoryForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Для существующей записи ограничиваем выбор категорий
-        if self.instance and self.instance.pk and self.instance.category:
+        # Для существующей записи ограничиваем выбор категорий (тип - по индексу справочников)
+        if self.instance and self.instance.pk and self.instance.category_id:
             self.fields['category'].queryset = Category.objects.filter(
-                transaction_type=self.instance.category.transaction_type
+                transaction_type_id=taxonomy_index().category_types.get(self.instance.category_id)
             )
@@ -0,0 +1,489 @@
+import hashlib
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connection, models, transaction
+from django.db.models import F
+from django.db.migrations import AddIndex, Migration
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from .models import CapturedQuery
+from .profiling import view_names
+
+# Не больше колонок в предлагаемом индексе (вместе с колонками покрытия)
+MAX_INDEX_COLUMNS = 5
+
+# Списки IN (%s, %s, ...) разной длины - одна форма запроса
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+
+# Строка плана SQLite: SCAN/SEARCH таблицы (или псевдонима) и использованный индекс
+PLAN_TABLE_RE = re.compile(
+    r'^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?(?: USING (?:(COVERING) )?INDEX (\w+))?'
+)
+
+# Псевдонимы таблиц в SQL Django: "web_cashflowrecord" U0
+ALIAS_RE = re.compile(r'"(\w+)" (?:AS )?"?([A-Z]\d+)"?(?=[\s,)])')
+
+
+def query_shape(sql):
+    """Форма запроса: текст без значений (они в параметрах) и с одинаковыми списками IN"""
+    return ' '.join(IN_LIST_RE.sub('IN (...)', sql).split())
+
+
+def shape_fingerprint(view_name, sql):
+    return hashlib.sha1(f'{view_name}\n{query_shape(sql)}'.encode()).hexdigest()
+
+
+class QueryShapeCollector:
+    """
+    Обертка выполнения SQL (connection.execute_wrapper): формы SELECT-запросов
+    с последним примером параметров, количеством выполнений и временем.
+    """
+
+    def __init__(self, view_name=''):
+        self.view_name = view_name
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if many or not sql.lstrip()[:6].upper().startswith(('SELECT', 'WITH')):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add(sql, params, (time.perf_counter() - started) * 1000)
+
+    def add(self, sql, params, duration_ms, view_name=None):
+        view_name = self.view_name if view_name is None else view_name
+        fingerprint = shape_fingerprint(view_name, sql)
+        shape = self.shapes.get(fingerprint)
+        if shape is None:
+            shape = self.shapes[fingerprint] = CapturedQuery(
+                fingerprint=fingerprint, view_name=view_name, sql=sql
+            )
+        # Пример хранится целиком: текст и параметры одного выполнения (длина списков IN совпадает)
+        shape.sql = sql
+        shape.params = list(params or ())
+        shape.calls += 1
+        shape.total_ms += duration_ms
+        return shape
+
+
+def capture_sampled(request):
+    """
+    Снимать ли формы запросов: представление из CASHFLOW_QUERY_CAPTURE_VIEWS
+    и доля запросов. Возвращает ResolverMatch запроса или None.
+    """
+    rate = settings.CASHFLOW_QUERY_CAPTURE_SAMPLE_RATE
+    if rate <= 0 or not settings.CASHFLOW_QUERY_CAPTURE_VIEWS:
+        return None
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    if view_names(match, request.method).isdisjoint(settings.CASHFLOW_QUERY_CAPTURE_VIEWS):
+        return None
+    return match if random.random() < rate else None
+
+
+def save_captured(collector):
+    """Накопление форм запроса в CapturedQuery (счетчики - атомарным UPDATE)"""
+    now = timezone.now()
+    for shape in collector.shapes.values():
+        updated = CapturedQuery.objects.filter(fingerprint=shape.fingerprint).update(
+            calls=F('calls') + shape.calls,
+            total_ms=F('total_ms') + shape.total_ms,
+            sql=shape.sql,
+            params=shape.params,
+            last_seen=now,
+        )
+        if not updated:
+            shape.first_seen = shape.last_seen = now
+            shape.save()
+
+
+def captured_shapes(window=None):
+    """Снятые формы запросов за последние window (timedelta) или за все время"""
+    queryset = CapturedQuery.objects.all()
+    if window is not None:
+        queryset = queryset.filter(last_seen__gte=timezone.now() - window)
+    return list(queryset)
+
+
+def replay_scenarios(user, names=None):
+    """
+    Формы запросов сценариев замера (BENCHMARK_SCENARIOS) на текущих данных -
+    без снятия с рабочих запросов, например на копии базы.
+    """
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    from .benchmarks import BENCHMARK_SCENARIOS, benchmark_context
+
+    client = Client()
+    client.force_login(user)
+    context = benchmark_context()
+    collector = QueryShapeCollector()
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for scenario in BENCHMARK_SCENARIOS:
+            if names and scenario.name not in names:
+                continue
+            collector.view_name = scenario.name
+            path = scenario.resolve(scenario.path, context)
+            params = scenario.resolve(scenario.params, context)
+            data = scenario.resolve(scenario.data, context)
+            with transaction.atomic(), connection.execute_wrapper(collector):
+                if scenario.method == 'post':
+                    response = client.post(path, data, content_type='application/json')
+                else:
+                    response = client.get(path, params, HTTP_ACCEPT='application/json')
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+                transaction.set_rollback(scenario.write)
+    return list(collector.shapes.values())
+
+
+@dataclass
+class PlanProblem:
+    """Проблема плана: полный просмотр таблицы или сортировка во временном B-дереве"""
+    kind: str
+    detail: str
+    table: str = None
+    ref: str = None
+
+
+@dataclass
+class IndexCandidate:
+    """Предлагаемый индекс: колонки таблицы (с '-' для убывания) и формы запросов, которым он поможет"""
+    table: str
+    columns: tuple
+    covering: bool = False
+    shapes: list = field(default_factory=list)
+    measured: dict = None
+
+    @property
+    def calls(self):
+        return sum(shape.calls for shape in self.shapes)
+
+    @property
+    def at_stake_ms(self):
+        """Оценка выигрыша сверху: время форм с проблемным планом за окно"""
+        return sum(shape.total_ms for shape in self.shapes)
+
+    @property
+    def benefit_ms(self):
+        """Выигрыш за окно: измеренный (--measure) или оценка сверху"""
+        if self.measured:
+            return sum(
+                max(before - after, 0) * shape.calls
+                for shape, (before, after) in zip(self.shapes, self.measured['timings'])
+            )
+        return self.at_stake_ms
+
+
+def explain(sql, params):
+    """Строки EXPLAIN QUERY PLAN (только SQLite)"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan, aliases, large_tables):
+    """Полные просмотры больших таблиц и временные B-деревья сортировки/группировки"""
+    problems, sorts, touches_large = [], [], False
+    for detail in plan:
+        if detail.startswith('USE TEMP B-TREE'):
+            sorts.append(PlanProblem('sort', detail))
+            continue
+        match = PLAN_TABLE_RE.match(detail)
+        if not match:
+            continue
+        ref = match.group(3) or match.group(2)
+        table = aliases.get(ref, match.group(2))
+        if table not in large_tables:
+            continue
+        touches_large = True
+        if match.group(1) == 'SCAN' and not match.group(5):
+            problems.append(PlanProblem('scan', detail, table, ref))
+    # Сортировка нескольких строк справочника не проблема - только в запросах к большим таблицам
+    return problems + sorts if touches_large else problems
+
+
+def table_aliases(sql):
+    return {alias: table for table, alias in ALIAS_RE.findall(sql)}
+
+
+def _column_ref(ref):
+    return rf'"?{re.escape(ref)}"?\."(\w+)"'
+
+
+def _dedupe(columns):
+    result = []
+    for column in columns:
+        if column.lstrip('-') not in [existing.lstrip('-') for existing in result]:
+            result.append(column)
+    return result
+
+
+def sort_clause(sql, clause):
+    """Текст последнего предложения ORDER BY или GROUP BY запроса (до LIMIT/HAVING/ORDER BY)"""
+    position = sql.rfind(f' {clause} ')
+    if position == -1:
+        return ''
+    return re.split(r' (?:LIMIT|HAVING|ORDER BY)\b', sql[position + len(clause) + 2:])[0]
+
+
+def index_columns(sql, ref, pk_column='id'):
+    """
+    Колонки индекса для таблицы (ref - имя или псевдоним) по тексту запроса:
+    сначала условия равенства, затем диапазон либо колонки сортировки/группировки,
+    затем (если помещаются) остальные колонки запроса - покрывающий индекс.
+
+    Возвращает (колонки, покрывающий ли) или (None, False), если подобрать нечего.
+    """
+    column = _column_ref(ref)
+    equality, ranges = [], []
+    # Справа - параметр, подзапрос или внешняя колонка в скобках (OuterRef); условия JOIN не учитываются
+    predicates = re.findall(rf'{column} (=|IN|IS NULL|>=|<=|>|<|BETWEEN)(?= \(|(?: %s)|$)', sql)
+    for name, operator in predicates:
+        (equality if operator in ('=', 'IN', 'IS NULL') else ranges).append(name)
+
+    ordering = []
+    for clause in ('ORDER BY', 'GROUP BY'):
+        terms = [term.strip() for term in sort_clause(sql, clause).split(',')]
+        parsed = [re.fullmatch(rf'{column}(?: (ASC|DESC))?', term) for term in terms]
+        if parsed and all(parsed):
+            ordering = [('-' if match.group(2) == 'DESC' else '') + match.group(1) for match in parsed]
+            break
+
+    equality = [name for name in _dedupe(equality) if name != pk_column]
+    if pk_column in equality:
+        return None, False
+    columns = list(equality)
+    order_columns = [name for name in ordering if name.lstrip('-') not in equality]
+    # Первичный ключ SQLite (rowid) - неявная последняя колонка любого индекса
+    while order_columns and order_columns[-1].lstrip('-') == pk_column:
+        order_columns.pop()
+    if order_columns and (not ranges or ranges[0] == order_columns[0].lstrip('-')):
+        # Одно направление сортировки индекс обходит в обе стороны
+        if all(name.startswith('-') for name in order_columns):
+            order_columns = [name[1:] for name in order_columns]
+        columns += order_columns
+    elif ranges:
+        columns.append(ranges[0])
+    columns = _dedupe(columns)
+
+    referenced = [name for name in _dedupe(re.findall(column, sql)) if name != pk_column]
+    extra = [name for name in referenced if name not in [existing.lstrip('-') for existing in columns]]
+    covering = bool(extra) and len(columns) + len(extra) <= MAX_INDEX_COLUMNS
+    if covering:
+        columns += extra
+    elif not extra and columns:
+        covering = True
+    if not columns:
+        return None, False
+    return tuple(columns[:MAX_INDEX_COLUMNS]), covering
+
+
+def existing_indexes(table):
+    """Колонки существующих индексов таблицы"""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [
+        tuple(constraint['columns']) for constraint in constraints.values()
+        if constraint['columns'] and (constraint['index'] or constraint['unique'])
+    ]
+
+
+def table_rows(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
+
+
+def model_tables():
+    """Таблицы моделей, для которых можно предложить индекс: {таблица: модель}"""
+    return {
+        model._meta.db_table: model for model in apps.get_models()
+        if model._meta.managed and not model._meta.proxy
+    }
+
+
+def analyze_shapes(shapes, min_rows=1000):
+    """
+    EXPLAIN QUERY PLAN для каждой формы запроса: проблемы плана и кандидаты в индексы.
+
+    Полным просмотром считается SCAN без индекса таблицы модели с min_rows
+    строк и больше. Кандидаты одной таблицы объединяются, если колонки
+    одного - начало колонок другого. Возвращает (результаты по формам, кандидаты).
+    """
+    if connection.vendor != 'sqlite':
+        raise DatabaseError('Анализ планов запросов поддерживается только для SQLite')
+
+    tables = model_tables()
+    rows = {}
+    for table in tables:
+        try:
+            rows[table] = table_rows(table)
+        except DatabaseError:
+            continue
+    large_tables = {table for table, count in rows.items() if count >= min_rows}
+
+    results, candidates = [], {}
+    for shape in shapes:
+        try:
+            plan = explain(shape.sql, shape.params)
+        except DatabaseError as exc:
+            results.append({'shape': shape, 'plan': [], 'problems': [], 'error': str(exc)})
+            continue
+        aliases = table_aliases(shape.sql)
+        problems = plan_problems(plan, aliases, large_tables)
+        results.append({'shape': shape, 'plan': plan, 'problems': problems, 'error': None})
+        if not problems:
+            continue
+
+        targets = {(problem.table, problem.ref) for problem in problems if problem.table}
+        if not targets:
+            # Только сортировка: индекс для большой таблицы, колонки которой в ORDER BY/GROUP BY
+            ordering = ' '.join(sort_clause(shape.sql, clause) for clause in ('ORDER BY', 'GROUP BY'))
+            targets = {
+                (table, ref) for ref, table in [*aliases.items(), *((name, name) for name in large_tables)]
+                if table in large_tables and re.search(_column_ref(ref), ordering)
+            }
+        for table, ref in targets:
+            model = tables[table]
+            columns, covering = index_columns(shape.sql, ref, model._meta.pk.column)
+            if not columns:
+                continue
+            plain = tuple(name.lstrip('-') for name in columns)
+            if any(existing[:len(plain)] == plain for existing in existing_indexes(table)):
+                continue
+            candidate = candidates.setdefault((table, columns), IndexCandidate(table, columns, covering))
+            candidate.shapes.append(shape)
+
+    return results, merge_candidates(candidates.values())
+
+
+def absorbs(wider, candidate):
+    """
+    Индекс wider обслуживает запросы candidate: колонки candidate - начало
+    колонок wider, либо оба покрывающие с той же первой колонкой.
+    """
+    if wider.table != candidate.table:
+        return False
+    if wider.columns[:len(candidate.columns)] == candidate.columns:
+        return True
+    return (
+        wider.covering and candidate.covering and wider.columns[0] == candidate.columns[0]
+        and set(candidate.columns) <= set(wider.columns)
+    )
+
+
+def merge_candidates(candidates):
+    """Кандидаты, запросы которых обслуживает более широкий кандидат той же таблицы, поглощаются им"""
+    candidates = sorted(candidates, key=lambda candidate: -len(candidate.columns))
+    merged = []
+    for candidate in candidates:
+        wider = next((other for other in merged if absorbs(other, candidate)), None)
+        if wider is None:
+            merged.append(candidate)
+        else:
+            wider.shapes.extend(shape for shape in candidate.shapes if shape not in wider.shapes)
+    return sorted(merged, key=lambda candidate: -candidate.at_stake_ms)
+
+
+def time_query(sql, params, repeat=3):
+    """Лучшее из repeat выполнений запроса, мс"""
+    timings = []
+    with connection.cursor() as cursor:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def index_sql(name, table, columns):
+    quote = connection.ops.quote_name
+    parts = ', '.join(
+        f'{quote(column[1:])} DESC' if column.startswith('-') else quote(column) for column in columns
+    )
+    return f'CREATE INDEX {quote(name)} ON {quote(table)} ({parts})'
+
+
+def measure_candidate(candidate, repeat=3):
+    """
+    Замер кандидата: индекс создается во временно открытой транзакции,
+    формы запросов выполняются до и после, затем транзакция откатывается.
+    """
+    timings, plans = [], []
+    with transaction.atomic():
+        before = [time_query(shape.sql, shape.params, repeat) for shape in candidate.shapes]
+        with connection.cursor() as cursor:
+            cursor.execute(index_sql('index_advisor_candidate', candidate.table, candidate.columns))
+        for shape, elapsed in zip(candidate.shapes, before):
+            timings.append((elapsed, time_query(shape.sql, shape.params, repeat)))
+            plans.append(explain(shape.sql, shape.params))
+        transaction.set_rollback(True)
+    candidate.measured = {
+        'timings': timings,
+        'used': all(any('index_advisor_candidate' in detail for detail in plan) for plan in plans),
+    }
+    return candidate.measured
+
+
+def candidate_index(candidate):
+    """(модель, models.Index) кандидата с именем, как у индекса без имени в Meta.indexes"""
+    model = model_tables()[candidate.table]
+    fields = {field.column: field.name for field in model._meta.concrete_fields}
+    index = models.Index(fields=[
+        ('-' if column.startswith('-') else '') + fields[column.lstrip('-')] for column in candidate.columns
+    ])
+    index.set_name_with_model(model)
+    return model, index
+
+
+def write_index_migration(candidates, path=None):
+    """
+    Миграция AddIndex для выбранных кандидатов (приложение web).
+
+    Возвращает путь к файлу и строки для Meta.indexes моделей, которые нужно
+    добавить, чтобы makemigrations не предлагал удалить индексы.
+    """
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    leaves = loader.graph.leaf_nodes('web')
+    number = max(int(name.split('_')[0]) for app_label, name in leaves) + 1 if leaves else 1
+    migration = Migration(f'{number:04d}_advised_indexes', 'web')
+    migration.dependencies = leaves
+
+    meta_lines = []
+    for candidate in candidates:
+        model, index = candidate_index(candidate)
+        if model._meta.app_label != 'web':
+            continue
+        migration.operations.append(AddIndex(model_name=model._meta.model_name, index=index))
+        meta_lines.append(f'{model.__name__}: models.Index(fields={index.fields!r})')
+
+    writer = MigrationWriter(migration)
+    path = path or writer.path
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(writer.as_string())
+    return path, meta_lines
+
+
+def parse_window(value):
+    """Окно выборки: число с суффиксом m/h/d (минуты, часы, дни)"""
+    match = re.fullmatch(r'(\d+)([mhd])', value or '')
+    if not match:
+        raise ValueError(value)
+    unit = {'m': 'minutes', 'h': 'hours', 'd': 'days'}[match.group(2)]
+    return timedelta(**{unit: int(match.group(1))})
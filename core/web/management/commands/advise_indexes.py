@@ -0,0 +1,142 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from ...benchmarks import BENCHMARK_SCENARIOS
+from ...index_advisor import (
+    analyze_shapes, candidate_index, captured_shapes, measure_candidate, parse_window, replay_scenarios,
+    write_index_migration
+)
+from ...models import CapturedQuery
+
+
+class Command(BaseCommand):
+    """
+    Советник по индексам: формы SQL-запросов, снятые QueryCaptureMiddleware
+    за окно выборки (или полученные прогоном сценариев замера), проверяются
+    через EXPLAIN QUERY PLAN. Полные просмотры больших таблиц и сортировки
+    во временном B-дереве отмечаются, для них предлагаются индексы
+    (по возможности покрывающие) с оценкой выигрыша.
+
+    С --migration для выбранных индексов создается миграция AddIndex.
+    """
+    help = 'Предлагает индексы по планам снятых запросов API записей, HTML-списка и аналитики'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window', default='24h',
+            help='Окно выборки: формы, выполнявшиеся за последние 30m/24h/7d (по умолчанию 24h)'
+        )
+        parser.add_argument(
+            '--replay', action='store_true',
+            help='Не читать снятые формы, а прогнать сценарии замера на текущих данных'
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=[scenario.name for scenario in BENCHMARK_SCENARIOS],
+            help='Сценарий для --replay (можно несколько раз, по умолчанию - все)'
+        )
+        parser.add_argument('--user', default='benchmark', help='Пользователь для --replay')
+        parser.add_argument(
+            '--min-rows', type=int, default=1000,
+            help='Полный просмотр отмечается для таблиц с таким количеством строк и больше'
+        )
+        parser.add_argument(
+            '--measure', action='store_true',
+            help='Замерить запросы до и после создания индекса (индекс создается в откатываемой транзакции)'
+        )
+        parser.add_argument('--verbose-plans', action='store_true', help='Выводить планы всех форм')
+        parser.add_argument('--migration', action='store_true', help='Создать миграцию для выбранных индексов')
+        parser.add_argument(
+            '--select', type=int, nargs='+',
+            help='Номера предложенных индексов для миграции (по умолчанию - все)'
+        )
+        parser.add_argument('--migration-path', help='Файл миграции (по умолчанию - в web/migrations)')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить снятые формы после анализа (начать новое окно выборки)'
+        )
+
+    def handle(self, *args, **options):
+        if options['replay']:
+            user, created = get_user_model().objects.get_or_create(username=options['user'])
+            if created:
+                user.set_unusable_password()
+                user.save()
+            shapes = replay_scenarios(user, options['scenario'])
+        else:
+            try:
+                window = parse_window(options['window'])
+            except ValueError:
+                raise CommandError('Окно выборки задается как 30m, 24h или 7d')
+            shapes = captured_shapes(window)
+        if not shapes:
+            raise CommandError(
+                'Нет снятых форм запросов: включите CASHFLOW_QUERY_CAPTURE_ENABLED или используйте --replay'
+            )
+
+        try:
+            results, candidates = analyze_shapes(shapes, options['min_rows'])
+        except DatabaseError as exc:
+            raise CommandError(str(exc))
+
+        flagged = [result for result in results if result['problems'] or result['error']]
+        self.stdout.write(f'Форм запросов: {len(results)}, с проблемами плана: {len(flagged)}')
+        for result in results if options['verbose_plans'] else flagged:
+            self.write_result(result)
+
+        if not candidates:
+            self.stdout.write(self.style.SUCCESS('Новые индексы не требуются'))
+        else:
+            self.stdout.write('\nПредлагаемые индексы:')
+        for number, candidate in enumerate(candidates, 1):
+            if options['measure']:
+                measure_candidate(candidate)
+            self.write_candidate(number, candidate)
+
+        if options['migration'] and candidates:
+            selected = options['select'] or range(1, len(candidates) + 1)
+            if any(number < 1 or number > len(candidates) for number in selected):
+                raise CommandError(f'Номера индексов - от 1 до {len(candidates)}')
+            path, meta_lines = write_index_migration(
+                [candidates[number - 1] for number in selected], options['migration_path']
+            )
+            self.stdout.write(self.style.SUCCESS(f'\nМиграция: {path}'))
+            self.stdout.write('Добавьте в Meta.indexes моделей:')
+            for line in meta_lines:
+                self.stdout.write(f'  {line}')
+
+        if options['clear'] and not options['replay']:
+            deleted, _ = CapturedQuery.objects.all().delete()
+            self.stdout.write(f'Удалено снятых форм: {deleted}')
+
+    def write_result(self, result):
+        shape = result['shape']
+        self.stdout.write(
+            f'\n[{shape.view_name or "-"}] выполнений {shape.calls}, {shape.total_ms:.1f} мс'
+        )
+        self.stdout.write(f'  {shape.sql[:300]}')
+        if result['error']:
+            self.stdout.write(self.style.ERROR(f'  EXPLAIN: {result["error"]}'))
+        problems = {problem.detail for problem in result['problems']}
+        for detail in result['plan']:
+            line = f'  {"!" if detail in problems else " "} {detail}'
+            self.stdout.write(self.style.WARNING(line) if detail in problems else line)
+
+    def write_candidate(self, number, candidate):
+        model, index = candidate_index(candidate)
+        kind = 'покрывающий, ' if candidate.covering else ''
+        self.stdout.write(
+            f'{number}. {candidate.table} ({", ".join(candidate.columns)}) - {kind}'
+            f'форм {len(candidate.shapes)}, выполнений {candidate.calls}'
+        )
+        if candidate.measured:
+            before = sum(before for before, after in candidate.measured['timings'])
+            after = sum(after for before, after in candidate.measured['timings'])
+            used = 'используется' if candidate.measured['used'] else 'НЕ используется планировщиком'
+            self.stdout.write(
+                f'   замер: {before:.1f} -> {after:.1f} мс на выполнение форм, '
+                f'выигрыш за окно ~{candidate.benefit_ms:.0f} мс, индекс {used}'
+            )
+        else:
+            self.stdout.write(f'   оценка выигрыша за окно: до {candidate.benefit_ms:.0f} мс')
+        self.stdout.write(f'   {model.__name__}.Meta.indexes: models.Index(fields={index.fields!r})')
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...archive import ARCHIVE_DEFAULT_CHUNK_SIZE, archive_records
+
+
+class Command(BaseCommand):
+    """
+    Перенос старых записей ДДС в архивную таблицу пачками.
+
+    Аналитика (summary, by_category, monthly_report) продолжает учитывать
+    архивные периоды через дневные агрегаты; список обращается к архиву,
+    только если фильтр по дате заходит в архивный период.
+    """
+    help = 'Переносит записи ДДС старше даты отсечки в архив'
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group(required=True)
+        cutoff.add_argument('--before', help='Дата отсечки ГГГГ-ММ-ДД: архивируются записи раньше нее')
+        cutoff.add_argument('--older-than-days', type=int, help='Архивировать записи старше N дней')
+        parser.add_argument(
+            '--chunk-size', type=int, default=ARCHIVE_DEFAULT_CHUNK_SIZE,
+            help='Количество записей в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+
+        if options['before']:
+            try:
+                cutoff = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Ожидается дата в формате ГГГГ-ММ-ДД')
+        else:
+            if options['older_than_days'] < 0:
+                raise CommandError('Количество дней не может быть отрицательным')
+            cutoff = timezone.localdate() - timedelta(days=options['older_than_days'])
+
+        moved = archive_records(
+            cutoff, options['chunk_size'],
+            progress=lambda count: self.stdout.write(f'Перенесено записей: {count}')
+        )
+        self.stdout.write(self.style.SUCCESS(f'Архивировано записей раньше {cutoff:%d.%m.%Y}: {moved}'))
@@ -0,0 +1,113 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+# Пары синхронный (DRF) / асинхронный путь одного и того же ответа
+READ_PATHS = {
+    'list': ('/api/records/', '/api/async/records/'),
+    'summary': ('/api/records/summary/', '/api/async/records/summary/'),
+    'monthly_report': ('/api/records/monthly_report/', '/api/async/records/monthly_report/'),
+    'timeseries': ('/api/records/timeseries/?bucket=month', '/api/async/records/timeseries/?bucket=month'),
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочное сравнение синхронного (DRF) и асинхронного путей чтения API.
+
+    Сервер запускается отдельно, например:
+    gunicorn core.wsgi / uvicorn core.asgi:application --workers 1.
+    Команда создает сессию пользователя и выполняет запросы из пула потоков
+    с заданной параллельностью, выводя пропускную способность и задержки.
+    """
+    help = 'Сравнивает пропускную способность синхронных и асинхронных эндпоинтов чтения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Адрес запущенного сервера')
+        parser.add_argument('--user', required=True, help='Имя пользователя, от которого выполняются запросы')
+        parser.add_argument('--requests', type=int, default=200, help='Количество запросов на эндпоинт')
+        parser.add_argument('--concurrency', type=int, default=20, help='Количество параллельных клиентов')
+        parser.add_argument(
+            '--endpoint', action='append', choices=sorted(READ_PATHS),
+            help='Эндпоинт для проверки (можно несколько раз, по умолчанию - все)'
+        )
+        parser.add_argument('--json', action='store_true', help='Вывод результатов в JSON')
+
+    def create_session(self, username):
+        """Сессия пользователя без входа через форму (cookie для запросов)"""
+        try:
+            user = get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'Пользователь {username} не найден')
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session
+
+    def fetch(self, url, cookie):
+        request = Request(url, headers={'Cookie': cookie, 'Accept': 'application/json'})
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=60) as response:
+                response.read()
+                ok = response.status == 200
+        except (HTTPError, URLError, OSError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def run_path(self, url, cookie, total, concurrency):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda _: self.fetch(url, cookie), range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for latency, ok in results if ok]
+        return {
+            'url': url,
+            'requests': total,
+            'errors': total - len(latencies),
+            'seconds': round(elapsed, 3),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        }
+
+    def handle(self, *args, **options):
+        session = self.create_session(options['user'])
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+        base_url = options['base_url'].rstrip('/')
+
+        results = []
+        try:
+            for name in options['endpoint'] or sorted(READ_PATHS):
+                for mode, path in zip(('sync', 'async'), READ_PATHS[name]):
+                    result = self.run_path(base_url + path, cookie, options['requests'], options['concurrency'])
+                    result.update({'endpoint': name, 'mode': mode, 'concurrency': options['concurrency']})
+                    results.append(result)
+        finally:
+            session.delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+
+        for result in results:
+            self.stdout.write(
+                f"{result['endpoint']:<15} {result['mode']:<6} rps={result['rps']} "
+                f"p50={result['p50_ms']}мс p95={result['p95_ms']}мс ошибок={result['errors']}"
+            )
@@ -0,0 +1,85 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...bulk import BULK_DEFAULT_CHUNK_SIZE, BULK_MAX_CHUNK_SIZE
+from ...statement_import import ImportMapping, ImportMappingError, import_statement
+
+
+class Command(BaseCommand):
+    """
+    Импорт банковской выписки CSV в записи ДДС.
+
+    Файл читается потоково, столбцы сопоставляются полям записи по настройке
+    (см. ImportMapping), справочники ищутся по названиям в памяти. Записи
+    вставляются пачками, каждая - в своей транзакции; после каждой пачки
+    выводится последняя обработанная строка и номер следующей - с нее
+    прерванный импорт продолжается (--resume-from) без повторной вставки.
+    """
+    help = 'Импортирует записи ДДС из CSV-выписки пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV-файл выписки')
+        parser.add_argument('--mapping', required=True, help='JSON-файл настройки столбцов')
+        parser.add_argument(
+            '--chunk-size', type=int, default=BULK_DEFAULT_CHUNK_SIZE,
+            help=f'Строк в одной транзакции (не более {BULK_MAX_CHUNK_SIZE})'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить файл, ничего не записывая')
+        parser.add_argument(
+            '--resume-from', type=int, default=1,
+            help='Номер строки данных (без заголовка), с которой продолжить импорт'
+        )
+        parser.add_argument('--errors-file', help='CSV-файл для строк с ошибками (номер строки, ошибки)')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['chunk_size'] <= BULK_MAX_CHUNK_SIZE:
+            raise CommandError(f'Размер пачки должен быть от 1 до {BULK_MAX_CHUNK_SIZE}')
+        if options['resume_from'] < 1:
+            raise CommandError('Номер строки должен быть положительным')
+
+        try:
+            mapping = ImportMapping.load(options['mapping'])
+        except ImportMappingError as exc:
+            raise CommandError(str(exc))
+
+        errors_file = open(options['errors_file'], 'w', newline='', encoding='utf-8') if options['errors_file'] else None
+        errors_writer = csv.writer(errors_file) if errors_file else None
+        if errors_writer:
+            errors_writer.writerow(['line', 'errors'])
+
+        def on_error(number, errors):
+            if errors_writer:
+                errors_writer.writerow([number, json.dumps(errors, ensure_ascii=False, default=str)])
+            else:
+                self.stderr.write(f'Строка {number}: {json.dumps(errors, ensure_ascii=False, default=str)}')
+
+        action = 'Проверено' if options['dry_run'] else 'Записано'
+
+        def progress(stats):
+            resume = '' if options['dry_run'] else f", продолжение: --resume-from {stats['last_row'] + 1}"
+            self.stdout.write(
+                f"Строка {stats['last_row']}: {action.lower()} {stats['created']}, ошибок {stats['errors']}{resume}"
+            )
+
+        try:
+            with open(options['path'], newline='', encoding=mapping.encoding) as file:
+                stats = import_statement(
+                    file, mapping,
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                    start_row=options['resume_from'],
+                    progress=progress,
+                    on_error=on_error,
+                )
+        except (OSError, UnicodeDecodeError, csv.Error, ImportMappingError) as exc:
+            raise CommandError(f'Ошибка чтения выписки: {exc}')
+        finally:
+            if errors_file:
+                errors_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} записей: {stats['created']}, строк с ошибками: {stats['errors']}, "
+            f"последняя строка: {stats['last_row']}"
+        ))
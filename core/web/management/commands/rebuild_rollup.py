@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...balance import rebuild_balances, verify_balances
+from ...rollup import rebuild_rollup, verify_rollup
+
+
+class Command(BaseCommand):
+    """
+    Пересборка дневных агрегатов ДДС (CashFlowDailyRollup) по исходным записям
+    и остатков на день (CashFlowDailyBalance) по агрегатам, сверка с исходными данными.
+    """
+    help = 'Пересобирает дневные агрегаты и остатки ДДС и сверяет их с записями'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Только сверить агрегаты с записями, без пересборки'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки при вставке строк агрегата'
+        )
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Алиас базы данных'
+        )
+
+    def handle(self, *args, **options):
+        database = options['database']
+
+        if not options['verify_only']:
+            created = rebuild_rollup(batch_size=options['batch_size'], using=database)
+            self.stdout.write(f'Пересобрано строк агрегата: {created}')
+            created = rebuild_balances(batch_size=options['batch_size'], using=database)
+            self.stdout.write(f'Пересобрано строк остатков: {created}')
+
+        mismatches = verify_rollup(using=database)
+        if mismatches:
+            for key, expected, actual in mismatches[:20]:
+                self.stderr.write(f'Расхождение {key}: записи={expected}, агрегат={actual}')
+            raise CommandError(f'Найдено расхождений: {len(mismatches)}')
+
+        mismatches = verify_balances(using=database)
+        if mismatches:
+            for key, expected, actual in mismatches[:20]:
+                self.stderr.write(f'Расхождение остатка {key}: агрегаты={expected}, остатки={actual}')
+            raise CommandError(f'Найдено расхождений остатков: {len(mismatches)}')
+
+        self.stdout.write(self.style.SUCCESS('Агрегаты и остатки совпадают с записями'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """
+    Пересборка полнотекстового индекса FTS5 записей ДДС
+    (комментарий, категория, подкатегория).
+    """
+    help = 'Пересобирает полнотекстовый индекс FTS5 по записям ДДС'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Алиас базы данных'
+        )
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(using=options['database'])
+        if indexed is None:
+            raise CommandError('FTS5 недоступен: поиск работает через icontains')
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано записей: {indexed}'))
@@ -0,0 +1,60 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from ...benchmarks import BENCHMARK_SCENARIOS, run_benchmarks, compare_reports
+
+
+class Command(BaseCommand):
+    """
+    Замер основных эндпоинтов (время ответа и количество SQL-запросов)
+    на текущих данных, например после generate_cashflow_data.
+
+    Отчет выводится в JSON; с --baseline сравнивается с сохраненным отчетом.
+    """
+    help = 'Замеряет время ответа и количество SQL-запросов основных эндпоинтов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=[scenario.name for scenario in BENCHMARK_SCENARIOS],
+            help='Сценарий для замера (можно несколько раз, по умолчанию - все)'
+        )
+        parser.add_argument('--iterations', type=int, default=5, help='Количество замеров на сценарий')
+        parser.add_argument('--warmup', type=int, default=1, help='Прогревочные запросы перед замерами')
+        parser.add_argument('--user', default='benchmark', help='Пользователь, от имени которого идут запросы')
+        parser.add_argument('--output', help='Файл для сохранения отчета JSON')
+        parser.add_argument('--baseline', help='Отчет JSON для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=1.25,
+            help='Допустимый рост медианы времени относительно базового отчета'
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться с ошибкой при регрессии относительно --baseline'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('Количество замеров должно быть положительным')
+
+        user, created = get_user_model().objects.get_or_create(username=options['user'])
+        if created:
+            user.set_unusable_password()
+            user.save()
+
+        report = run_benchmarks(user, options['scenario'], options['iterations'], options['warmup'])
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                regressions = compare_reports(report, json.load(file), options['threshold'])
+            for regression in regressions:
+                self.stderr.write(f'Регрессия: {regression}')
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'Найдено регрессий: {len(regressions)}')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from ...routers import replica_alias, replica_lag
+
+
+class Command(BaseCommand):
+    """
+    Копирование основной SQLite-базы в файл реплики (sqlite3 backup API).
+
+    Для локальной проверки маршрутизации чтений на реплику: между запусками
+    реплика отстает от основной базы, как при асинхронной репликации.
+    """
+    help = 'Копирует основную базу SQLite в реплику для чтения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lag', action='store_true', help='Только вывести текущее отставание реплики')
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if not alias:
+            raise CommandError('Реплика не настроена (DATABASE_REPLICA_NAME)')
+
+        if not options['lag']:
+            source, target = connections[DEFAULT_DB_ALIAS], connections[alias]
+            if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+                raise CommandError('Копирование поддерживается только для SQLite')
+            source.ensure_connection()
+            target.ensure_connection()
+            source.connection.backup(target.connection)
+            self.stdout.write(self.style.SUCCESS(f'База {DEFAULT_DB_ALIAS} скопирована в {alias}'))
+
+        self.stdout.write(f'Отставание реплики: {replica_lag(alias):.1f} с')
@@ -0,0 +1,86 @@
+from collections import Counter
+
+from .bulk import update_records
+from .models import TransactionType, Category, Subcategory, CashFlowRecord, ArchivedCashFlowRecord
+from .rollup import ROLLUP_DICTIONARY_FIELDS
+
+MERGE_DEFAULT_CHUNK_SIZE = 5000
+
+# Дочерние справочники: related_name и поле ссылки на родителя
+MERGE_CHILDREN = {
+    TransactionType: ('categories', 'transaction_type'),
+    Category: ('subcategories', 'category'),
+}
+
+
+class MergeError(ValueError):
+    """Справочники нельзя объединить"""
+
+
+def record_changes(entry):
+    """
+    Значения полей записи ДДС, указывающие на справочник entry и его родителей
+    (для подкатегории - также категория и тип операции).
+    """
+    if isinstance(entry, Subcategory):
+        return {
+            'subcategory_id': entry.pk,
+            'category_id': entry.category_id,
+            'transaction_type_id': entry.category.transaction_type_id,
+        }
+    if isinstance(entry, Category):
+        return {'category_id': entry.pk, 'transaction_type_id': entry.transaction_type_id}
+    return {f'{ROLLUP_DICTIONARY_FIELDS[type(entry)]}_id': entry.pk}
+
+
+def repoint_records(lookup, changes, chunk_size, stats):
+    """Перенос записей (оперативных и архивных) пачками с обновлением агрегатов"""
+    stats['records'] += update_records(CashFlowRecord.objects.filter(**lookup), changes, chunk_size)
+    stats['archived_records'] += update_records(
+        ArchivedCashFlowRecord.objects.filter(**lookup), changes, chunk_size
+    )
+
+
+def _merge(source, target, chunk_size, stats):
+    if type(source) in MERGE_CHILDREN:
+        related_name, parent_field = MERGE_CHILDREN[type(source)]
+        twins = {child.name: child for child in getattr(target, related_name).all()}
+        for child in list(getattr(source, related_name).all()):
+            twin = twins.get(child.name)
+            if twin is not None:
+                # Одноименный дочерний справочник у цели - объединяется с ним
+                _merge(child, twin, chunk_size, stats)
+                stats['merged'] += 1
+                continue
+            # Иначе дочерний справочник переносится к цели вместе со своими записями
+            child_field = ROLLUP_DICTIONARY_FIELDS[type(child)]
+            repoint_records({f'{child_field}_id': child.pk}, record_changes(target), chunk_size, stats)
+            setattr(child, parent_field, target)
+            child.save(update_fields=[parent_field])
+            stats['moved'] += 1
+
+    field = ROLLUP_DICTIONARY_FIELDS[type(source)]
+    repoint_records({f'{field}_id': source.pk}, record_changes(target), chunk_size, stats)
+    source.delete()
+
+
+def merge_dictionary(source, target, chunk_size=MERGE_DEFAULT_CHUNK_SIZE):
+    """
+    Объединение справочника source с target: все записи ДДС (и архивные)
+    переводятся на target, после чего source удаляется.
+
+    Записи переносятся пачками по chunk_size, каждая - в своей транзакции
+    вместе с дневными агрегатами и остатками, поэтому долгой блокировки нет;
+    прерванное объединение можно запустить повторно. Тип операции и категория
+    записей приводятся к target. Дочерние справочники source (категории типа,
+    подкатегории категории) переносятся к target, одноименные - объединяются.
+    Возвращает счетчики: records, archived_records, moved, merged.
+    """
+    if type(source) is not type(target) or type(source) not in ROLLUP_DICTIONARY_FIELDS:
+        raise MergeError('Объединять можно только справочники одного вида')
+    if source.pk == target.pk:
+        raise MergeError('Справочник нельзя объединить с самим собой')
+
+    stats = Counter(records=0, archived_records=0, moved=0, merged=0)
+    _merge(source, target, chunk_size, stats)
+    return dict(stats)
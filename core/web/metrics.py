@@ -0,0 +1,121 @@
+import threading
+from collections import defaultdict
+
+# Границы корзин гистограмм длительности (секунды)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Границы корзин гистограммы количества SQL-запросов
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Гистограмма Prometheus: количество наблюдений по корзинам, сумма и общее количество"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """(граница, накопленное количество), последней идет +Inf"""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield format_value(bound), cumulative
+        yield '+Inf', self.count
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in labels)
+
+
+class MetricsRegistry:
+    """
+    Метрики запросов в памяти процесса, по имени URL (view_name).
+
+    У каждого воркера (gunicorn/uvicorn) свой реестр - Prometheus
+    собирает их по отдельности, суммирование выполняется в запросах.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = defaultdict(int)
+            self.durations = {}
+            self.sql_durations = {}
+            self.queries = {}
+
+    def observe(self, view, method, status, duration, sql_duration, queries):
+        with self.lock:
+            self.requests[(view, method, status)] += 1
+            self._histogram(self.durations, (view, method), DURATION_BUCKETS).observe(duration)
+            self._histogram(self.sql_durations, (view,), DURATION_BUCKETS).observe(sql_duration)
+            self._histogram(self.queries, (view,), QUERY_BUCKETS).observe(queries)
+
+    @staticmethod
+    def _histogram(histograms, key, buckets):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus"""
+        lines = []
+        with self.lock:
+            lines += [
+                '# HELP cashflow_http_requests_total Количество обработанных запросов',
+                '# TYPE cashflow_http_requests_total counter',
+            ]
+            for (view, method, status), count in sorted(self.requests.items()):
+                labels = format_labels((('view', view), ('method', method), ('status', status)))
+                lines.append(f'cashflow_http_requests_total{{{labels}}} {count}')
+
+            self._render_histogram(
+                lines, 'cashflow_http_request_duration_seconds', 'Время обработки запроса',
+                self.durations, ('view', 'method')
+            )
+            self._render_histogram(
+                lines, 'cashflow_http_request_sql_duration_seconds', 'Время SQL-запросов за запрос',
+                self.sql_durations, ('view',)
+            )
+            self._render_histogram(
+                lines, 'cashflow_http_request_queries', 'Количество SQL-запросов за запрос',
+                self.queries, ('view',)
+            )
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histogram(lines, name, help_text, histograms, label_names):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for key, histogram in sorted(histograms.items()):
+            labels = list(zip(label_names, key))
+            for bound, count in histogram.samples():
+                lines.append(f'{name}_bucket{{{format_labels([*labels, ("le", bound)])}}} {count}')
+            lines.append(f'{name}_sum{{{format_labels(labels)}}} {format_value(histogram.sum)}')
+            lines.append(f'{name}_count{{{format_labels(labels)}}} {histogram.count}')
+
+
+REGISTRY = MetricsRegistry()
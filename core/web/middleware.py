@@ -0,0 +1,287 @@
+import logging
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+
+from .index_advisor import QueryShapeCollector, capture_sampled, save_captured
+from .metrics import REGISTRY
+from .profiling import profile_trigger, profile_request
+from .routers import (
+    PRIMARY_COOKIE, SAFE_METHODS, replica_alias, replica_view, replica_is_fresh, use_replica, release_replica
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _enter_wrappers(stack, wrapper):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+@contextmanager
+def wrap_queries(wrapper):
+    """Обертка выполнения SQL на всех подключениях на время блока"""
+    with ExitStack() as stack:
+        _enter_wrappers(stack, wrapper)
+        yield
+
+
+@asynccontextmanager
+async def awrap_queries(wrapper):
+    """
+    Асинхронный вариант wrap_queries. Подключения к БД привязаны к потоку,
+    поэтому обертки ставятся в потоке sync_to_async запроса - в нем же
+    (thread_sensitive) выполняются запросы асинхронного ORM.
+    """
+    stack = ExitStack()
+    await sync_to_async(_enter_wrappers)(stack, wrapper)
+    try:
+        yield
+    finally:
+        await sync_to_async(stack.close)()
+
+
+class HybridMiddleware:
+    """
+    Основа middleware для WSGI и ASGI: при асинхронной цепочке __call__
+    возвращает корутину __acall__, и асинхронные представления выполняются
+    без перевода всей цепочки в поток.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+class QueryTimer:
+    """Обертка выполнения SQL (connection.execute_wrapper): количество и суммарное время запросов"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class RequestTimings:
+    """Отметки времени одного запроса"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.render_started = None
+        self.render_finished = None
+        self.queries = QueryTimer()
+
+
+class RequestMetricsMiddleware(HybridMiddleware):
+    """
+    Замер запроса: количество и время SQL, время представления и рендеринга.
+
+    Результат отдается в заголовке Server-Timing и накапливается
+    в гистограммах по имени URL (см. metrics.REGISTRY, эндпоинт /metrics/).
+    Рендеринг - это TemplateResponse и ответы DRF (сериализация в JSON);
+    шаблоны, отрисованные внутри представления через render(), входят во время view.
+
+    При CASHFLOW_METRICS_ENABLED = False middleware исключается из цепочки
+    при запуске и не добавляет накладных расходов.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CASHFLOW_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = request._request_timings = RequestTimings()
+        with wrap_queries(timings.queries):
+            response = self.get_response(request)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = request._request_timings = RequestTimings()
+        async with awrap_queries(timings.queries):
+            response = await self.get_response(request)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        finished = time.perf_counter()
+
+        total = finished - timings.started
+        view_finished = timings.render_started or finished
+        view = view_finished - timings.view_started if timings.view_started else 0.0
+        render = 0.0
+        if timings.render_started:
+            render = (timings.render_finished or finished) - timings.render_started
+
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={timings.queries.duration * 1000:.1f};desc="{timings.queries.count} queries"',
+            f'view;dur={view * 1000:.1f}',
+            f'render;dur={render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        match = request.resolver_match
+        REGISTRY.observe(
+            match.view_name if match else 'unresolved', request.method, response.status_code,
+            total, timings.queries.duration, timings.queries.count
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._request_timings.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = request._request_timings
+        timings.render_started = time.perf_counter()
+
+        def render_finished(response):
+            timings.render_finished = time.perf_counter()
+
+        response.add_post_render_callback(render_finished)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование отдельных запросов (cProfile) без перезапуска.
+
+    Запрос профилируется по подписанному токену сотрудника (заголовок
+    X-Profile-Token или параметр _profile) либо выборочно - доля
+    CASHFLOW_PROFILING_SAMPLE_RATE запросов к CASHFLOW_PROFILING_VIEWS.
+    Профили сохраняются в RequestProfile и доступны в админке.
+
+    Только синхронный: cProfile снимает один поток, а при асинхронной цепочке
+    запросы ORM выполняются в потоках sync_to_async, и в профиль попали бы
+    соседние запросы цикла событий. Включенный middleware переводит цепочку
+    под ним в синхронный режим - это цена профилирования, при выключенном
+    (MiddlewareNotUsed) асинхронные представления его не замечают.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CASHFLOW_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger, user = profile_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return profile_request(self.get_response, request, trigger, user)
+
+
+class QueryCaptureMiddleware(HybridMiddleware):
+    """
+    Выборочное снятие форм SQL-запросов (текст без значений, время, количество)
+    для команды advise_indexes.
+
+    Снимается доля CASHFLOW_QUERY_CAPTURE_SAMPLE_RATE запросов к представлениям
+    из CASHFLOW_QUERY_CAPTURE_VIEWS; формы накапливаются в CapturedQuery
+    после ответа, сохранение в выборку не попадает.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CASHFLOW_QUERY_CAPTURE_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        match = capture_sampled(request)
+        if match is None:
+            return self.get_response(request)
+
+        collector = QueryShapeCollector(match.view_name)
+        with wrap_queries(collector):
+            response = self.get_response(request)
+        self.save(request, collector)
+        return response
+
+    async def __acall__(self, request):
+        match = capture_sampled(request)
+        if match is None:
+            return await self.get_response(request)
+
+        collector = QueryShapeCollector(match.view_name)
+        async with awrap_queries(collector):
+            response = await self.get_response(request)
+        await sync_to_async(self.save)(request, collector)
+        return response
+
+    def save(self, request, collector):
+        try:
+            save_captured(collector)
+        except DatabaseError:
+            logger.exception('Не удалось сохранить формы запросов %s', request.path)
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Чтения аналитики, выгрузки и HTML-списка - на реплику (см. ReplicaRouter).
+
+    Запрос идет на реплику, если представление это допускает, метод безопасный,
+    реплика отстает не больше CASHFLOW_REPLICA_MAX_LAG и клиент недавно
+    ничего не записывал: после успешной записи в течение
+    CASHFLOW_REPLICA_STICKY_SECONDS его чтения идут в основную базу
+    (cookie), чтобы он видел свои изменения.
+    """
+
+    def __init__(self, get_response):
+        if not replica_alias():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.release(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.release(request)
+        return self.finish(request, response)
+
+    def release(self, request):
+        token = getattr(request, '_replica_token', None)
+        if token is not None:
+            release_replica(token)
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=settings.CASHFLOW_REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and PRIMARY_COOKIE not in request.COOKIES
+            and replica_view(view_func, request.method)
+            and replica_is_fresh()
+        ):
+            request._replica_token = use_replica()
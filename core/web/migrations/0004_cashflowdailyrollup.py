@@ -0,0 +1,65 @@
+# Generated by Django 4.2.24 on 2026-10-17 21:00
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def fill_rollup(apps, schema_editor):
+    """Первичное заполнение дневных агрегатов по существующим записям"""
+    CashFlowRecord = apps.get_model('web', 'CashFlowRecord')
+    CashFlowDailyRollup = apps.get_model('web', 'CashFlowDailyRollup')
+    db_alias = schema_editor.connection.alias
+
+    rows = (
+        CashFlowRecord.objects.using(db_alias)
+        .order_by()
+        .values('created_date', 'status_id', 'transaction_type_id', 'category_id', 'subcategory_id')
+        .annotate(total_amount=Sum('amount'), record_count=Count('id'))
+    )
+    CashFlowDailyRollup.objects.using(db_alias).bulk_create([
+        CashFlowDailyRollup(
+            day=row['created_date'],
+            status_id=row['status_id'],
+            transaction_type_id=row['transaction_type_id'],
+            category_id=row['category_id'],
+            subcategory_id=row['subcategory_id'],
+            amount=row['total_amount'],
+            records_count=row['record_count'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0003_alter_cashflowrecord_created_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlowDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Сумма')),
+                ('records_count', models.PositiveIntegerField(default=0, verbose_name='Количество записей')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='web.category', verbose_name='Категория')),
+                ('status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='web.status', verbose_name='Статус')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='web.subcategory', verbose_name='Подкатегория')),
+                ('transaction_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='web.transactiontype', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Дневной агрегат ДДС',
+                'verbose_name_plural': 'Дневные агрегаты ДДС',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day', 'transaction_type'], name='web_cashflo_day_014597_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cashflowdailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'status', 'transaction_type', 'category', 'subcategory'), name='unique_daily_rollup_key'),
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-17 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0004_cashflowdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cashflowrecord',
+            index=models.Index(fields=['amount'], name='web_cashflo_amount_3034a3_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import DatabaseError, migrations
+
+# DDL индекса зафиксирован на момент миграции: последующие изменения web.search
+# не должны менять уже примененную схему
+FTS_CREATE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS web_cashflowrecord_fts "
+    "USING fts5(comment, category_name, subcategory_name, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+FTS_TRIGGERS = {
+    'web_cashflowrecord_fts_ai': (
+        "CREATE TRIGGER IF NOT EXISTS web_cashflowrecord_fts_ai AFTER INSERT ON web_cashflowrecord BEGIN "
+        "INSERT INTO web_cashflowrecord_fts(rowid, comment, category_name, subcategory_name) "
+        "SELECT NEW.id, COALESCE(NEW.comment, ''), "
+        "(SELECT name FROM web_category WHERE id = NEW.category_id), "
+        "(SELECT name FROM web_subcategory WHERE id = NEW.subcategory_id); END"
+    ),
+    'web_cashflowrecord_fts_au': (
+        "CREATE TRIGGER IF NOT EXISTS web_cashflowrecord_fts_au "
+        "AFTER UPDATE OF comment, category_id, subcategory_id ON web_cashflowrecord BEGIN "
+        "DELETE FROM web_cashflowrecord_fts WHERE rowid = OLD.id; "
+        "INSERT INTO web_cashflowrecord_fts(rowid, comment, category_name, subcategory_name) "
+        "SELECT NEW.id, COALESCE(NEW.comment, ''), "
+        "(SELECT name FROM web_category WHERE id = NEW.category_id), "
+        "(SELECT name FROM web_subcategory WHERE id = NEW.subcategory_id); END"
+    ),
+    'web_cashflowrecord_fts_ad': (
+        "CREATE TRIGGER IF NOT EXISTS web_cashflowrecord_fts_ad AFTER DELETE ON web_cashflowrecord BEGIN "
+        "DELETE FROM web_cashflowrecord_fts WHERE rowid = OLD.id; END"
+    ),
+    'web_category_fts_au': (
+        "CREATE TRIGGER IF NOT EXISTS web_category_fts_au AFTER UPDATE OF name ON web_category BEGIN "
+        "UPDATE web_cashflowrecord_fts SET category_name = NEW.name "
+        "WHERE rowid IN (SELECT id FROM web_cashflowrecord WHERE category_id = NEW.id); END"
+    ),
+    'web_subcategory_fts_au': (
+        "CREATE TRIGGER IF NOT EXISTS web_subcategory_fts_au AFTER UPDATE OF name ON web_subcategory BEGIN "
+        "UPDATE web_cashflowrecord_fts SET subcategory_name = NEW.name "
+        "WHERE rowid IN (SELECT id FROM web_cashflowrecord WHERE subcategory_id = NEW.id); END"
+    ),
+}
+
+FTS_POPULATE_SQL = (
+    "INSERT INTO web_cashflowrecord_fts(rowid, comment, category_name, subcategory_name) "
+    "SELECT r.id, COALESCE(r.comment, ''), "
+    "(SELECT name FROM web_category WHERE id = r.category_id), "
+    "(SELECT name FROM web_subcategory WHERE id = r.subcategory_id) "
+    "FROM web_cashflowrecord r"
+)
+
+
+def create_search_index(apps, schema_editor):
+    """Создание индекса FTS5 с триггерами и индексация существующих записей"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(FTS_CREATE_SQL)
+            for sql in FTS_TRIGGERS.values():
+                cursor.execute(sql)
+    except DatabaseError:
+        # SQLite собран без FTS5: поиск работает без индекса
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DELETE FROM web_cashflowrecord_fts')
+        cursor.execute(FTS_POPULATE_SQL)
+        cursor.execute("INSERT INTO web_cashflowrecord_fts(web_cashflowrecord_fts) VALUES ('optimize')")
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name in FTS_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute('DROP TABLE IF EXISTS web_cashflowrecord_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0006_dataversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.24 on 2026-10-17 21:16
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_balances(apps, schema_editor):
+    """Первичный расчет остатков на день по дневным агрегатам"""
+    TransactionType = apps.get_model('web', 'TransactionType')
+    CashFlowDailyRollup = apps.get_model('web', 'CashFlowDailyRollup')
+    CashFlowDailyBalance = apps.get_model('web', 'CashFlowDailyBalance')
+    db_alias = schema_editor.connection.alias
+
+    signs = {'Пополнение': 1, 'Списание': -1}
+    type_signs = {
+        type_id: signs[name]
+        for type_id, name in TransactionType.objects.using(db_alias)
+        .filter(name__in=signs).values_list('id', 'name')
+    }
+
+    nets = defaultdict(Decimal)
+    rows = (
+        CashFlowDailyRollup.objects.using(db_alias)
+        .filter(transaction_type_id__in=type_signs)
+        .order_by()
+        .values('day', 'status_id', 'transaction_type_id')
+        .annotate(total=Sum('amount'))
+    )
+    for row in rows:
+        amount = Decimal(row['total']) * type_signs[row['transaction_type_id']]
+        nets[(True, None, row['day'])] += amount
+        nets[(False, row['status_id'], row['day'])] += amount
+
+    running = defaultdict(Decimal)
+    balances = []
+    for is_total, status_id, day in sorted(nets, key=lambda key: key[2]):
+        net = nets[(is_total, status_id, day)]
+        if not net:
+            continue
+        running[(is_total, status_id)] += net
+        balances.append(CashFlowDailyBalance(
+            is_total=is_total, status_id=status_id, day=day,
+            net=net, balance=running[(is_total, status_id)]
+        ))
+    CashFlowDailyBalance.objects.using(db_alias).bulk_create(balances, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0007_cashflowrecord_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlowDailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('is_total', models.BooleanField(default=True, verbose_name='Итог по всем статусам')),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Сальдо за день')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Остаток на конец дня')),
+                ('status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='web.status', verbose_name='Статус')),
+            ],
+            options={
+                'verbose_name': 'Остаток на день',
+                'verbose_name_plural': 'Остатки на день',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cashflowdailybalance',
+            constraint=models.UniqueConstraint(fields=('is_total', 'status', 'day'), name='unique_daily_balance_key'),
+        ),
+        migrations.RunPython(fill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.24 on 2026-10-17 21:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+# Записи вместе с архивом (модель CashFlowRecordWithArchive)
+RECORD_COLUMNS = 'id, created_date, status_id, transaction_type_id, category_id, subcategory_id, amount, comment'
+CREATE_VIEW = (
+    f'CREATE VIEW web_cashflowrecord_with_archive AS '
+    f'SELECT {RECORD_COLUMNS}, 0 AS is_archived FROM web_cashflowrecord '
+    f'UNION ALL SELECT {RECORD_COLUMNS}, 1 AS is_archived FROM web_archivedcashflowrecord'
+)
+DROP_VIEW = 'DROP VIEW IF EXISTS web_cashflowrecord_with_archive'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0009_requestprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlowRecordWithArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateField(verbose_name='Дата создания записи')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('comment', models.TextField(blank=True, null=True, verbose_name='Комментарий')),
+                ('is_archived', models.BooleanField(verbose_name='В архиве')),
+            ],
+            options={
+                'verbose_name': 'Запись ДДС (с архивом)',
+                'verbose_name_plural': 'Записи ДДС (с архивом)',
+                'db_table': 'web_cashflowrecord_with_archive',
+                'ordering': ['-created_date'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CashFlowArchiveBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата архивации')),
+                ('cutoff', models.DateField(verbose_name='Дата отсечки')),
+                ('records_count', models.PositiveIntegerField(default=0, verbose_name='Перенесено записей')),
+            ],
+            options={
+                'verbose_name': 'Архивация ДДС',
+                'verbose_name_plural': 'Архивации ДДС',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedCashFlowRecord',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_date', models.DateField(verbose_name='Дата создания записи')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('comment', models.TextField(blank=True, null=True, verbose_name='Комментарий')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='web.category', verbose_name='Категория')),
+                ('status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='web.status', verbose_name='Статус')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='web.subcategory', verbose_name='Подкатегория')),
+                ('transaction_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='web.transactiontype', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Архивная запись ДДС',
+                'verbose_name_plural': 'Архивные записи ДДС',
+                'ordering': ['-created_date'],
+                'indexes': [models.Index(fields=['created_date'], name='web_archive_created_12e072_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_VIEW, DROP_VIEW),
+    ]
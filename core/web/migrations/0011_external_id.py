@@ -0,0 +1,105 @@
+# Generated by Django 4.2.24 on 2026-10-17 21:43
+
+from django.db import migrations, models
+
+# SQLite пересоздает таблицу записей при добавлении полей: представление
+# с архивом и ссылающиеся на нее триггеры поиска на время изменения удаляются
+RECORD_COLUMNS = 'id, created_date, status_id, transaction_type_id, category_id, subcategory_id, amount, comment'
+CREATE_VIEW = (
+    f'CREATE VIEW web_cashflowrecord_with_archive AS '
+    f'SELECT {RECORD_COLUMNS}, 0 AS is_archived FROM web_cashflowrecord '
+    f'UNION ALL SELECT {RECORD_COLUMNS}, 1 AS is_archived FROM web_archivedcashflowrecord'
+)
+DROP_VIEW = 'DROP VIEW IF EXISTS web_cashflowrecord_with_archive'
+
+# Триггеры поиска (0007_cashflowrecord_fts) на момент миграции
+FTS_TRIGGERS = {
+    'web_cashflowrecord_fts_ai': (
+        "CREATE TRIGGER IF NOT EXISTS web_cashflowrecord_fts_ai AFTER INSERT ON web_cashflowrecord BEGIN "
+        "INSERT INTO web_cashflowrecord_fts(rowid, comment, category_name, subcategory_name) "
+        "SELECT NEW.id, COALESCE(NEW.comment, ''), "
+        "(SELECT name FROM web_category WHERE id = NEW.category_id), "
+        "(SELECT name FROM web_subcategory WHERE id = NEW.subcategory_id); END"
+    ),
+    'web_cashflowrecord_fts_au': (
+        "CREATE TRIGGER IF NOT EXISTS web_cashflowrecord_fts_au "
+        "AFTER UPDATE OF comment, category_id, subcategory_id ON web_cashflowrecord BEGIN "
+        "DELETE FROM web_cashflowrecord_fts WHERE rowid = OLD.id; "
+        "INSERT INTO web_cashflowrecord_fts(rowid, comment, category_name, subcategory_name) "
+        "SELECT NEW.id, COALESCE(NEW.comment, ''), "
+        "(SELECT name FROM web_category WHERE id = NEW.category_id), "
+        "(SELECT name FROM web_subcategory WHERE id = NEW.subcategory_id); END"
+    ),
+    'web_cashflowrecord_fts_ad': (
+        "CREATE TRIGGER IF NOT EXISTS web_cashflowrecord_fts_ad AFTER DELETE ON web_cashflowrecord BEGIN "
+        "DELETE FROM web_cashflowrecord_fts WHERE rowid = OLD.id; END"
+    ),
+    'web_category_fts_au': (
+        "CREATE TRIGGER IF NOT EXISTS web_category_fts_au AFTER UPDATE OF name ON web_category BEGIN "
+        "UPDATE web_cashflowrecord_fts SET category_name = NEW.name "
+        "WHERE rowid IN (SELECT id FROM web_cashflowrecord WHERE category_id = NEW.id); END"
+    ),
+    'web_subcategory_fts_au': (
+        "CREATE TRIGGER IF NOT EXISTS web_subcategory_fts_au AFTER UPDATE OF name ON web_subcategory BEGIN "
+        "UPDATE web_cashflowrecord_fts SET subcategory_name = NEW.name "
+        "WHERE rowid IN (SELECT id FROM web_cashflowrecord WHERE subcategory_id = NEW.id); END"
+    ),
+}
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in FTS_TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def restore_search_triggers(apps, schema_editor):
+    connection = schema_editor.connection
+    # Без FTS5 индекса нет - и триггеры не нужны
+    if connection.vendor != 'sqlite' or 'web_cashflowrecord_fts' not in connection.introspection.table_names():
+        return
+    for sql in FTS_TRIGGERS.values():
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0010_archive'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DROP_VIEW, CREATE_VIEW),
+        migrations.RunPython(drop_search_triggers, restore_search_triggers),
+        migrations.AddField(
+            model_name='archivedcashflowrecord',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Внешний идентификатор'),
+        ),
+        migrations.AddField(
+            model_name='archivedcashflowrecord',
+            name='source',
+            field=models.CharField(blank=True, default='', max_length=50, verbose_name='Источник'),
+        ),
+        migrations.AddField(
+            model_name='cashflowrecord',
+            name='external_id',
+            field=models.CharField(blank=True, help_text='Идентификатор записи во внешней системе, уникален в пределах источника', max_length=100, null=True, verbose_name='Внешний идентификатор'),
+        ),
+        migrations.AddField(
+            model_name='cashflowrecord',
+            name='source',
+            field=models.CharField(blank=True, default='', help_text='Внешняя система, из которой загружена запись', max_length=50, verbose_name='Источник'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcashflowrecord',
+            index=models.Index(fields=['source', 'external_id'], name='web_archive_source_481c48_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cashflowrecord',
+            constraint=models.UniqueConstraint(fields=('source', 'external_id'), name='unique_record_external_id'),
+        ),
+        migrations.RunSQL(CREATE_VIEW, DROP_VIEW),
+        migrations.RunPython(restore_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.24 on 2026-10-17 22:12
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0011_external_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapturedQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True, verbose_name='Отпечаток')),
+                ('view_name', models.CharField(blank=True, max_length=255, verbose_name='Представление')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('params', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Параметры примера')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='Выполнений')),
+                ('total_ms', models.FloatField(default=0, verbose_name='Суммарное время, мс')),
+                ('first_seen', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Впервые')),
+                ('last_seen', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Последний раз')),
+            ],
+            options={
+                'verbose_name': 'Форма SQL-запроса',
+                'verbose_name_plural': 'Формы SQL-запросов',
+                'ordering': ['-total_ms'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+# Представление с архивом (CashFlowRecordWithArchive) получает source и external_id
+DROP_VIEW = 'DROP VIEW IF EXISTS web_cashflowrecord_with_archive'
+
+OLD_RECORD_COLUMNS = 'id, created_date, status_id, transaction_type_id, category_id, subcategory_id, amount, comment'
+RECORD_COLUMNS = f'{OLD_RECORD_COLUMNS}, source, external_id'
+
+
+def create_view(columns):
+    return (
+        f'CREATE VIEW web_cashflowrecord_with_archive AS '
+        f'SELECT {columns}, 0 AS is_archived FROM web_cashflowrecord '
+        f'UNION ALL SELECT {columns}, 1 AS is_archived FROM web_archivedcashflowrecord'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0012_query_capture'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [DROP_VIEW, create_view(RECORD_COLUMNS)],
+            [DROP_VIEW, create_view(OLD_RECORD_COLUMNS)],
+        ),
+    ]
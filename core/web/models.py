@@ -1,4 +1,6 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -163,6 +165,22 @@ class CashFlowRecord(models.Model):
         help_text="Комментарий к записи в свободной форме (необязательное поле)"
     )
 
+    source = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        verbose_name="Источник",
+        help_text="Внешняя система, из которой загружена запись"
+    )
+
+    external_id = models.CharField(
+        max_length=100,
+        blank=True,
+        null=True,
+        verbose_name="Внешний идентификатор",
+        help_text="Идентификатор записи во внешней системе, уникален в пределах источника"
+    )
+
     class Meta:
         verbose_name = "Запись ДДС"
         verbose_name_plural = "Записи ДДС"
@@ -172,6 +190,11 @@ class CashFlowRecord(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['transaction_type']),
             models.Index(fields=['category', 'subcategory']),
+            models.Index(fields=['amount']),
+        ]
+        constraints = [
+            # Записи без external_id (NULL) ограничением не затрагиваются
+            models.UniqueConstraint(fields=['source', 'external_id'], name='unique_record_external_id'),
         ]
 
     def clean(self):
@@ -189,23 +212,374 @@ class CashFlowRecord(models.Model):
 
         if not self.category_id:
             errors['category'] = 'Категория обязательна для заполнения'
-        elif self.transaction_type_id and self.category.transaction_type_id != self.transaction_type_id:
-            errors['category'] = 'Выбранная категория не принадлежит выбранному типу операции'
 
         if not self.subcategory_id:
             errors['subcategory'] = 'Подкатегория обязательна для заполнения'
-        elif self.category_id and self.subcategory.category_id != self.category_id:
-            errors['subcategory'] = 'Выбранная подкатегория не принадлежит выбранной категории'
+
+        # Согласованность справочников - по индексу процесса, без загрузки связанных объектов
+        from .taxonomy import check_hierarchy
+        for field, message in check_hierarchy(
+            self.transaction_type_id, self.category_id, self.subcategory_id
+        ).items():
+            errors.setdefault(field, message)
 
         if errors:
             raise ValidationError(errors)
 
     def save(self, *args, **kwargs):
         """
-        Переопределение метода save для автоматической валидации
+        Переопределение метода save для автоматической валидации.
+
+        Сохранение выполняется в транзакции, чтобы дневные агрегаты
+        (CashFlowDailyRollup), обновляемые сигналами, менялись атомарно с записью.
         """
         self.clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """
+        Удаление в транзакции вместе с откатом дневных агрегатов
+        """
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"ДДС #{self.id} - {self.created_date.strftime('%d.%m.%Y')} - {self.amount} руб."
+
+
+class ArchivedCashFlowRecord(models.Model):
+    """
+    Архивная запись ДДС (холодное хранение).
+
+    Записи старше даты отсечки переносятся сюда командой
+    ``manage.py archive_records`` с сохранением id. Дневные агрегаты
+    и остатки при переносе не меняются, поэтому аналитика учитывает
+    архивные периоды. Архив только для чтения.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    created_date = models.DateField(verbose_name="Дата создания записи")
+    status = models.ForeignKey(
+        Status,
+        on_delete=models.PROTECT,
+        verbose_name="Статус",
+        blank=True,
+        null=True
+    )
+    transaction_type = models.ForeignKey(
+        TransactionType,
+        on_delete=models.PROTECT,
+        verbose_name="Тип операции"
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.PROTECT,
+        verbose_name="Категория"
+    )
+    subcategory = models.ForeignKey(
+        Subcategory,
+        on_delete=models.PROTECT,
+        verbose_name="Подкатегория"
+    )
+    amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        verbose_name="Сумма"
+    )
+    comment = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name="Комментарий"
+    )
+    source = models.CharField(max_length=50, blank=True, default='', verbose_name="Источник")
+    external_id = models.CharField(max_length=100, blank=True, null=True, verbose_name="Внешний идентификатор")
+
+    class Meta:
+        verbose_name = "Архивная запись ДДС"
+        verbose_name_plural = "Архивные записи ДДС"
+        ordering = ['-created_date']
+        indexes = [
+            models.Index(fields=['created_date']),
+            models.Index(fields=['source', 'external_id']),
+        ]
+
+    def __str__(self):
+        return f"Архив ДДС #{self.id} - {self.created_date.strftime('%d.%m.%Y')} - {self.amount} руб."
+
+
+class CashFlowRecordWithArchive(models.Model):
+    """
+    Записи ДДС вместе с архивом (представление БД, UNION ALL двух таблиц).
+
+    Используется списком и выгрузкой, когда фильтр по дате заходит
+    в архивный период, и пересборкой дневных агрегатов.
+    """
+    created_date = models.DateField(verbose_name="Дата создания записи")
+    status = models.ForeignKey(
+        Status, on_delete=models.DO_NOTHING, related_name='+', blank=True, null=True, verbose_name="Статус"
+    )
+    transaction_type = models.ForeignKey(
+        TransactionType, on_delete=models.DO_NOTHING, related_name='+', verbose_name="Тип операции"
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.DO_NOTHING, related_name='+', verbose_name="Категория"
+    )
+    subcategory = models.ForeignKey(
+        Subcategory, on_delete=models.DO_NOTHING, related_name='+', verbose_name="Подкатегория"
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма")
+    comment = models.TextField(blank=True, null=True, verbose_name="Комментарий")
+    source = models.CharField(max_length=50, blank=True, default='', verbose_name="Источник")
+    external_id = models.CharField(max_length=100, blank=True, null=True, verbose_name="Внешний идентификатор")
+    is_archived = models.BooleanField(verbose_name="В архиве")
+
+    class Meta:
+        managed = False
+        db_table = 'web_cashflowrecord_with_archive'
+        verbose_name = "Запись ДДС (с архивом)"
+        verbose_name_plural = "Записи ДДС (с архивом)"
+        ordering = ['-created_date']
+
+
+class CashFlowArchiveBatch(models.Model):
+    """
+    Запуск архивации: дата отсечки и количество перенесенных записей.
+
+    Максимальная дата отсечки - граница архива: список обращается к архиву,
+    только если фильтр по дате заходит раньше нее.
+    """
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Дата архивации")
+    cutoff = models.DateField(verbose_name="Дата отсечки")
+    records_count = models.PositiveIntegerField(default=0, verbose_name="Перенесено записей")
+
+    class Meta:
+        verbose_name = "Архивация ДДС"
+        verbose_name_plural = "Архивации ДДС"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Архивация до {self.cutoff.strftime('%d.%m.%Y')} - {self.records_count} записей"
+
+
+class CashFlowDailyRollup(models.Model):
+    """
+    Предагрегированные суммы записей ДДС по дням.
+
+    Ключ: день, статус, тип операции, категория, подкатегория.
+    Таблица поддерживается инкрементально сигналами CashFlowRecord
+    в той же транзакции, что и сама запись, и используется аналитическими
+    действиями API вместо полного сканирования CashFlowRecord.
+    Полная пересборка - команда ``manage.py rebuild_rollup``.
+    """
+    day = models.DateField(verbose_name="День")
+
+    status = models.ForeignKey(
+        Status,
+        on_delete=models.CASCADE,
+        verbose_name="Статус",
+        blank=True,
+        null=True
+    )
+
+    transaction_type = models.ForeignKey(
+        TransactionType,
+        on_delete=models.CASCADE,
+        verbose_name="Тип операции"
+    )
+
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        verbose_name="Категория"
+    )
+
+    subcategory = models.ForeignKey(
+        Subcategory,
+        on_delete=models.CASCADE,
+        verbose_name="Подкатегория"
+    )
+
+    amount = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма"
+    )
+
+    records_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Количество записей"
+    )
+
+    class Meta:
+        verbose_name = "Дневной агрегат ДДС"
+        verbose_name_plural = "Дневные агрегаты ДДС"
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'status', 'transaction_type', 'category', 'subcategory'],
+                name='unique_daily_rollup_key'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['day', 'transaction_type']),
+        ]
+
+    def __str__(self):
+        return f"{self.day.strftime('%d.%m.%Y')} - {self.category} - {self.amount} руб."
+
+
+class CashFlowDailyBalance(models.Model):
+    """
+    Остаток (нарастающий итог) на конец дня.
+
+    Строки хранятся только для дней с ненулевым сальдо: остаток на любую дату
+    равен остатку последней строки не позже этой даты (поиск по индексу).
+    is_total=True - итог по всем статусам, иначе - по статусу status
+    (status=None - записи без статуса). Сальдо - пополнения минус списания.
+    Поддерживается инкрементально вместе с дневными агрегатами.
+    """
+    day = models.DateField(verbose_name="День")
+
+    status = models.ForeignKey(
+        Status,
+        on_delete=models.CASCADE,
+        verbose_name="Статус",
+        blank=True,
+        null=True
+    )
+
+    is_total = models.BooleanField(
+        default=True,
+        verbose_name="Итог по всем статусам"
+    )
+
+    net = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сальдо за день"
+    )
+
+    balance = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=0,
+        verbose_name="Остаток на конец дня"
+    )
+
+    class Meta:
+        verbose_name = "Остаток на день"
+        verbose_name_plural = "Остатки на день"
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_total', 'status', 'day'],
+                name='unique_daily_balance_key'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.day.strftime('%d.%m.%Y')} - {self.balance} руб."
+
+
+class DataVersion(models.Model):
+    """
+    Счетчик версий данных.
+
+    Одна строка на область данных (например, 'taxonomy' - справочники).
+    Версия увеличивается сигналами при любом изменении данных области
+    и используется для ETag и инвалидации кешей во всех процессах.
+    """
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name="Область данных"
+    )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Версия"
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Дата изменения"
+    )
+
+    class Meta:
+        verbose_name = "Версия данных"
+        verbose_name_plural = "Версии данных"
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class RequestProfile(models.Model):
+    """
+    Профиль выполнения запроса (cProfile) с данными запроса.
+
+    Снимается по подписанному токену персонала или выборочно для
+    заданных представлений (см. web.profiling). stats - текстовая сводка,
+    profile_data - файл pstats для snakeviz/pstats.
+    """
+    TRIGGER_TOKEN = 'token'
+    TRIGGER_SAMPLE = 'sample'
+    TRIGGER_CHOICES = (
+        (TRIGGER_TOKEN, 'По токену'),
+        (TRIGGER_SAMPLE, 'Выборка'),
+    )
+
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name="Дата"
+    )
+    method = models.CharField(max_length=10, verbose_name="Метод")
+    path = models.CharField(max_length=2000, verbose_name="Путь")
+    view_name = models.CharField(max_length=255, blank=True, verbose_name="Представление")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        verbose_name="Пользователь"
+    )
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES, verbose_name="Причина")
+    status_code = models.PositiveSmallIntegerField(null=True, verbose_name="Код ответа")
+    duration_ms = models.FloatField(verbose_name="Время, мс")
+    stats = models.TextField(blank=True, verbose_name="Сводка")
+    profile_data = models.BinaryField(verbose_name="Данные pstats")
+
+    class Meta:
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} - {self.duration_ms:.0f} мс"
+
+
+class CapturedQuery(models.Model):
+    """
+    Форма SQL-запроса (текст без значений параметров), снятая выборочно
+    с запросов к представлениям записей и аналитики (см. QueryCaptureMiddleware).
+
+    Исходные данные команды advise_indexes: хранится последний пример
+    с параметрами для EXPLAIN, количество выполнений и суммарное время.
+    """
+    fingerprint = models.CharField(max_length=40, unique=True, verbose_name="Отпечаток")
+    view_name = models.CharField(max_length=255, blank=True, verbose_name="Представление")
+    sql = models.TextField(verbose_name="SQL")
+    params = models.JSONField(default=list, encoder=DjangoJSONEncoder, verbose_name="Параметры примера")
+    calls = models.PositiveIntegerField(default=0, verbose_name="Выполнений")
+    total_ms = models.FloatField(default=0, verbose_name="Суммарное время, мс")
+    first_seen = models.DateTimeField(default=timezone.now, verbose_name="Впервые")
+    last_seen = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Последний раз")
+
+    class Meta:
+        verbose_name = "Форма SQL-запроса"
+        verbose_name_plural = "Формы SQL-запросов"
+        ordering = ['-total_ms']
+
+    def __str__(self):
+        return f"{self.view_name}: {self.calls} x, {self.total_ms:.0f} мс"
@@ -0,0 +1,343 @@
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q, Sum
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .archive import DATE_PARAMS, archive_cutoff
+from .filters import filter_records_by_params
+from .models import CashFlowRecord, CashFlowRecordWithArchive, CashFlowDailyRollup
+from .versions import RECORDS, TAXONOMY, versions_key
+
+
+# Допустимые сортировки для курсорной (keyset) пагинации; второй ключ - всегда id
+KEYSET_ORDERINGS = ('-created_date', 'created_date', '-amount', 'amount')
+DEFAULT_KEYSET_ORDERING = '-created_date'
+
+
+class InvalidCursor(Exception):
+    """Курсор поврежден или не соответствует текущей сортировке"""
+
+
+class KeysetPage:
+    """
+    Страница курсорной пагинации.
+
+    Содержит объекты страницы и непрозрачные курсоры соседних страниц
+    (None, если страницы нет). Общее количество записей не вычисляется.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(ordering, obj, reverse=False):
+    """Упаковка позиции (значение поля сортировки, id) в непрозрачную строку"""
+    field = ordering.lstrip('-')
+    payload = {
+        'o': ordering,
+        'v': str(getattr(obj, field)),
+        'id': obj.pk,
+        'r': int(reverse),
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, ordering):
+    """
+    Распаковка курсора.
+
+    Возвращает (значение поля сортировки, id, reverse). Курсор, выданный для другой
+    сортировки, считается недействительным.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if payload['o'] != ordering:
+            raise InvalidCursor
+        field = CashFlowRecord._meta.get_field(ordering.lstrip('-'))
+        return field.to_python(payload['v']), int(payload['id']), bool(payload['r'])
+    except (binascii.Error, ValueError, KeyError, TypeError, DjangoValidationError):
+        raise InvalidCursor
+
+
+def keyset_paginate(queryset, ordering, cursor, page_size):
+    """
+    Курсорная пагинация по (поле сортировки, id).
+
+    Вместо OFFSET используется условие "после позиции курсора", поэтому стоимость
+    страницы не зависит от ее глубины, а COUNT(*) не выполняется.
+    Пустой курсор - первая страница.
+    """
+    field = ordering.lstrip('-')
+    descending = ordering.startswith('-')
+    value, pk, reverse = decode_cursor(cursor, ordering) if cursor else (None, None, False)
+
+    # При движении назад сравнения и порядок сортировки инвертируются
+    take_lower = descending != reverse
+    if value is not None:
+        if take_lower:
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        else:
+            queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+
+    prefix = '-' if take_lower else ''
+    rows = list(queryset.order_by(f'{prefix}{field}', f'{prefix}pk')[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if reverse:
+        rows.reverse()
+        has_next = value is not None
+        has_previous = has_more
+    else:
+        has_next = has_more
+        has_previous = value is not None
+
+    next_cursor = encode_cursor(ordering, rows[-1]) if has_next and rows else None
+    previous_cursor = encode_cursor(ordering, rows[0], reverse=True) if has_previous and rows else None
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def get_keyset_ordering(value):
+    """
+    Сортировка для курсорного режима по значению параметра ordering.
+
+    Возвращает None для неподдерживаемой сортировки.
+    """
+    if not value:
+        return DEFAULT_KEYSET_ORDERING
+    return value if value in KEYSET_ORDERINGS else None
+
+
+class CashFlowRecordPagination(PageNumberPagination):
+    """
+    Пагинация записей ДДС.
+
+    По умолчанию - постраничная (page=N). При наличии параметра cursor
+    включается курсорный режим: сортировка по (created_date, id) или (amount, id)
+    с учетом параметра ordering, ответ без count с курсорами next/previous.
+    """
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.keyset_page = None
+            # Количество - по стратегии подсчета с учетом параметров запроса
+            self.django_paginator_class = partial(CountStrategyPaginator, params=request.query_params)
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        ordering = get_keyset_ordering(request.query_params.get('ordering'))
+        if ordering is None:
+            raise ValidationError({
+                'ordering': f'Курсорная пагинация поддерживает сортировку: {", ".join(KEYSET_ORDERINGS)}'
+            })
+
+        try:
+            self.keyset_page = keyset_paginate(
+                queryset, ordering, request.query_params.get(self.cursor_query_param),
+                self.get_page_size(request)
+            )
+        except InvalidCursor:
+            raise NotFound('Некорректный курсор')
+        return list(self.keyset_page)
+
+    def get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if self.keyset_page is None:
+            response = super().get_paginated_response(data)
+            if getattr(self.page.paginator, 'count_is_estimate', False):
+                response.data['count_is_estimate'] = True
+            return response
+        return Response({
+            'next': self.get_cursor_link(self.keyset_page.next_cursor),
+            'previous': self.get_cursor_link(self.keyset_page.previous_cursor),
+            'results': data,
+        })
+
+
+# Параметры, по которым количество записей можно оценить по дневным агрегатам
+ROLLUP_COUNT_PARAMS = ('status', 'transaction_type', 'category', 'subcategory', *DATE_PARAMS)
+
+# Параметры пагинации и вывода, не влияющие на количество
+PAGINATION_PARAMS = ('page', 'page_size', 'ordering', 'cursor', 'format')
+
+
+def count_cache_key(queryset):
+    """Ключ кэша количества: текст COUNT-запроса с параметрами и версии записей и справочников"""
+    sql, params = queryset.order_by().query.sql_with_params()
+    versions = versions_key((RECORDS, TAXONOMY), using=queryset.db)
+    raw = f'{queryset.db}|{sql}|{params!r}|{versions}'
+    return 'cashflow:count:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def rollup_count(queryset, params):
+    """
+    Количество записей по дневным агрегатам для фильтров списка (статус,
+    справочники, даты) или None, если фильтры через агрегаты не выражаются
+    (поиск, суммы) либо значения некорректны.
+
+    Агрегаты включают архив; для оперативных записей берутся дни с границы
+    архива - записи, добавленные задним числом раньше нее, не учитываются.
+    """
+    if params is None or queryset.model not in (CashFlowRecord, CashFlowRecordWithArchive):
+        return None
+    for name, value in params.items():
+        if not value or name in PAGINATION_PARAMS:
+            continue
+        if name not in ROLLUP_COUNT_PARAMS:
+            return None
+        if name in DATE_PARAMS:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                return None
+        elif not value.isdigit():
+            return None
+
+    rollup = filter_records_by_params(CashFlowDailyRollup.objects.using(queryset.db), params, 'day')
+    if queryset.model is CashFlowRecord:
+        cutoff = archive_cutoff(queryset.db)
+        if cutoff:
+            rollup = rollup.filter(day__gte=cutoff)
+    return rollup.aggregate(total=Sum('records_count'))['total'] or 0
+
+
+class ExactCount:
+    """Стратегия подсчета: точный COUNT(*) со всеми фильтрами"""
+
+    def count(self, queryset, params=None):
+        """(количество, оценка ли это)"""
+        return queryset.count(), False
+
+
+class CachedCount(ExactCount):
+    """
+    Точный COUNT(*), кэшируемый по набору фильтров (тексту запроса) до
+    изменения версии записей или справочников. Проверка версий - один
+    запрос к DataVersion вместо подсчета. Наследники кэшируют так же
+    результат uncached_count (в том числе оценку).
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = settings.CASHFLOW_COUNT_CACHE_TIMEOUT if timeout is None else timeout
+
+    def count(self, queryset, params=None):
+        key = count_cache_key(queryset)
+        cached = cache.get(key)
+        if cached is None:
+            cached = self.uncached_count(queryset, params)
+            cache.set(key, cached, self.timeout)
+        return tuple(cached)
+
+    def uncached_count(self, queryset, params=None):
+        return super().count(queryset, params)
+
+
+class RollupEstimateCount(CachedCount):
+    """
+    Оценка по дневным агрегатам, когда фильтры через них выражаются и оценка
+    не меньше threshold, иначе точный подсчет; результат кэшируется до
+    изменения версии данных. Выигрыш - на сочетаниях фильтров, которые
+    не обслуживает один индекс записей.
+    """
+
+    def __init__(self, threshold=None, timeout=None):
+        super().__init__(timeout)
+        self.threshold = settings.CASHFLOW_COUNT_ESTIMATE_THRESHOLD if threshold is None else threshold
+
+    def uncached_count(self, queryset, params=None):
+        estimate = rollup_count(queryset, params)
+        if estimate is not None and estimate >= self.threshold:
+            return estimate, True
+        return super().uncached_count(queryset, params)
+
+
+def get_count_strategy():
+    """Стратегия подсчета из CASHFLOW_COUNT_STRATEGY (путь к классу)"""
+    return import_string(settings.CASHFLOW_COUNT_STRATEGY)()
+
+
+class EstimatedPage(Page):
+    """Страница при оценочном количестве: наличие следующей определяется по строкам"""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class CountStrategyPaginator(Paginator):
+    """
+    Paginator с подключаемой стратегией подсчета (CASHFLOW_COUNT_STRATEGY).
+
+    params - параметры запроса для стратегий, оценивающих количество по фильтрам.
+    При оценке (count_is_estimate=True) номера страниц за оценочной последней
+    допустимы, а следующая страница определяется выборкой на строку больше.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 params=None, count_strategy=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.params = params
+        self.count_strategy = count_strategy or get_count_strategy()
+        self.count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        count, self.count_is_estimate = self.count_strategy.count(self.object_list, self.params)
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.count_is_estimate or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('Страница не содержит результатов')
+        return EstimatedPage(rows[:self.per_page], number, self, len(rows) > self.per_page)
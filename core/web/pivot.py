@@ -0,0 +1,226 @@
+from decimal import Decimal
+
+from django.db.models import Avg, Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncMonth, TruncQuarter, TruncWeek, TruncYear
+from rest_framework.exceptions import ValidationError
+
+from .models import Status, TransactionType, Category, Subcategory
+
+
+# Периоды группировки: функция усечения даты (day - сама дата)
+PIVOT_PERIODS = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+
+# Измерения-справочники и их модели
+PIVOT_DIMENSIONS = {
+    'status': Status,
+    'transaction_type': TransactionType,
+    'category': Category,
+    'subcategory': Subcategory,
+}
+
+PIVOT_MEASURES = ('sum', 'count', 'avg', 'min', 'max')
+
+# Меры, которые вычисляются по дневным агрегатам без обращения к записям
+ROLLUP_MEASURES = {'sum', 'count', 'avg'}
+
+# Фильтры значений столбцов матрицы по параметрам запроса
+COLUMN_FILTERS = {
+    'status': {'status': 'id'},
+    'transaction_type': {'transaction_type': 'id'},
+    'category': {'category': 'id', 'transaction_type': 'transaction_type_id'},
+    'subcategory': {
+        'subcategory': 'id',
+        'category': 'category_id',
+        'transaction_type': 'category__transaction_type_id',
+    },
+}
+
+MAX_PIVOT_COLUMNS = 50
+
+
+class PivotSpec:
+    """
+    Параметры сводной таблицы.
+
+    group_by - измерения строк (не более одного периода), measures - меры,
+    columns - измерение-справочник столбцов матрицы (None - плоский список строк).
+    """
+
+    def __init__(self, group_by, measures, columns=None):
+        self.group_by = group_by
+        self.measures = measures
+        self.columns = columns
+
+    @classmethod
+    def from_params(cls, params):
+        """Разбор параметров group_by, measures, columns с проверкой допустимых значений"""
+        group_by = _split(params.get('group_by'))
+        measures = _split(params.get('measures')) or ['sum']
+        columns = params.get('columns') or None
+
+        errors = {}
+        unknown = [name for name in group_by if name not in PIVOT_PERIODS and name not in PIVOT_DIMENSIONS]
+        if unknown:
+            errors['group_by'] = f'Неизвестные измерения: {", ".join(unknown)}'
+        elif len([name for name in group_by if name in PIVOT_PERIODS]) > 1:
+            errors['group_by'] = 'Допускается только один период группировки'
+        elif len(set(group_by)) != len(group_by):
+            errors['group_by'] = 'Измерения не должны повторяться'
+
+        unknown = [name for name in measures if name not in PIVOT_MEASURES]
+        if unknown:
+            errors['measures'] = f'Неизвестные меры: {", ".join(unknown)}. Допустимые: {", ".join(PIVOT_MEASURES)}'
+
+        if columns is not None:
+            if columns not in PIVOT_DIMENSIONS:
+                errors['columns'] = f'Столбцами может быть справочник: {", ".join(PIVOT_DIMENSIONS)}'
+            elif columns in group_by:
+                errors['columns'] = 'Измерение столбцов не должно входить в group_by'
+
+        if errors:
+            raise ValidationError(errors)
+        return cls(group_by, list(dict.fromkeys(measures)), columns)
+
+    @property
+    def uses_rollup(self):
+        """Можно ли посчитать таблицу по дневным агрегатам (без min/max)"""
+        return set(self.measures) <= ROLLUP_MEASURES
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+def _measure_aggregates(measures, rollup, prefix='', condition=None):
+    """
+    Агрегаты для мер; condition - условие для условной агрегации (ячейка матрицы).
+
+    По агрегатам avg собирается из суммы и количества после запроса.
+    """
+    aggregates = {}
+    needed = set(measures)
+    if rollup and 'avg' in needed:
+        needed |= {'sum', 'count'}
+
+    for measure in needed:
+        if measure == 'sum':
+            aggregate = Sum('amount', filter=condition)
+        elif measure == 'count':
+            aggregate = Sum('records_count', filter=condition) if rollup else Count('id', filter=condition)
+        elif measure == 'avg':
+            if rollup:
+                continue
+            aggregate = Avg('amount', filter=condition)
+        elif measure == 'min':
+            aggregate = Min('amount', filter=condition)
+        else:
+            aggregate = Max('amount', filter=condition)
+        aggregates[f'{prefix}{measure}'] = aggregate
+    return aggregates
+
+
+def _measure_values(row, measures, rollup, prefix=''):
+    """Значения мер из строки результата; пустые суммы и количества - 0"""
+    values = {}
+    for measure in measures:
+        if measure == 'avg' and rollup:
+            total = row.get(f'{prefix}sum')
+            count = row.get(f'{prefix}count')
+            value = (total / count).quantize(Decimal('0.01')) if count else None
+        else:
+            value = row.get(f'{prefix}{measure}')
+        if value is None and measure in ('sum', 'count'):
+            value = 0
+        values[measure] = value
+    return values
+
+
+def column_values(spec, params):
+    """
+    Значения столбцов матрицы из справочника с учетом фильтров запроса.
+
+    Количество столбцов ограничено MAX_PIVOT_COLUMNS: каждый столбец - отдельный
+    условный агрегат в запросе.
+    """
+    queryset = PIVOT_DIMENSIONS[spec.columns].objects.order_by('name')
+    for param, lookup in COLUMN_FILTERS[spec.columns].items():
+        value = params.get(param)
+        if value and value.isdigit():
+            queryset = queryset.filter(**{lookup: value})
+
+    values = list(queryset.values('id', 'name')[:MAX_PIVOT_COLUMNS + 1])
+    if len(values) > MAX_PIVOT_COLUMNS:
+        raise ValidationError({
+            'columns': f'Слишком много столбцов (больше {MAX_PIVOT_COLUMNS}), уточните фильтры'
+        })
+    return values
+
+
+def build_pivot(queryset, spec, date_field, params):
+    """
+    Сводная таблица одним запросом GROUP BY.
+
+    queryset - дневные агрегаты (если spec.uses_rollup) или записи ДДС с уже
+    примененными фильтрами; date_field - поле даты (day или created_date).
+    В режиме матрицы каждая ячейка - условный агрегат (FILTER/CASE) по значению
+    измерения столбцов, поэтому вся матрица считается за один проход.
+    """
+    rollup = spec.uses_rollup
+    group_fields = []
+    for name in spec.group_by:
+        if name in PIVOT_PERIODS:
+            trunc = PIVOT_PERIODS[name]
+            queryset = queryset.annotate(period=trunc(date_field) if trunc else F(date_field))
+            group_fields.append('period')
+        else:
+            group_fields.extend([f'{name}_id', f'{name}__name'])
+
+    columns = column_values(spec, params) if spec.columns else None
+    if columns is None:
+        aggregates = _measure_aggregates(spec.measures, rollup)
+    else:
+        aggregates = {}
+        for column in columns:
+            condition = Q(**{f'{spec.columns}_id': column['id']})
+            aggregates.update(_measure_aggregates(spec.measures, rollup, f'c{column["id"]}_', condition))
+
+    queryset = queryset.order_by().values(*group_fields)
+    if group_fields:
+        rows = queryset.annotate(**aggregates).order_by(*group_fields)
+    else:
+        rows = [queryset.aggregate(**aggregates)]
+
+    result = []
+    for row in rows:
+        item = {}
+        for name in spec.group_by:
+            if name in PIVOT_PERIODS:
+                item['period'] = row['period']
+            else:
+                item[name] = row[f'{name}_id']
+                item[f'{name}_name'] = row[f'{name}__name']
+
+        if columns is None:
+            item.update(_measure_values(row, spec.measures, rollup))
+        else:
+            item['cells'] = {
+                str(column['id']): _measure_values(row, spec.measures, rollup, f'c{column["id"]}_')
+                for column in columns
+            }
+        result.append(item)
+
+    data = {
+        'group_by': spec.group_by,
+        'measures': spec.measures,
+        'source': 'rollup' if rollup else 'records',
+        'rows': result,
+    }
+    if columns is not None:
+        data['columns'] = {'dimension': spec.columns, 'values': columns}
+    return data
@@ -0,0 +1,156 @@
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import DatabaseError
+from django.urls import Resolver404, resolve
+
+from .models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_PARAM = '_profile'
+TOKEN_SALT = 'web.profiling'
+
+# Строк в текстовой сводке профиля
+STATS_LINES = 60
+
+
+def make_profile_token(user):
+    """Подписанный токен профилирования для сотрудника (срок - CASHFLOW_PROFILING_TOKEN_MAX_AGE)"""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def token_user(token):
+    """Сотрудник по токену профилирования (None для неверного или просроченного токена)"""
+    try:
+        user_pk = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.CASHFLOW_PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(pk=user_pk, is_staff=True, is_active=True).first()
+
+
+def view_names(match, method):
+    """
+    Имена представления для сопоставления с CASHFLOW_PROFILING_VIEWS:
+    класс (CashFlowRecordListView), действие ViewSet (CashFlowRecordViewSet.monthly_report)
+    и те же имена с модулем.
+    """
+    func = match.func
+    view_class = getattr(func, 'view_class', None) or getattr(func, 'cls', None)
+    if view_class is None:
+        name = func.__qualname__
+        return {name, f'{func.__module__}.{name}'}
+
+    names = {view_class.__qualname__}
+    action = (getattr(func, 'actions', None) or {}).get(method.lower())
+    if action:
+        names.add(f'{view_class.__qualname__}.{action}')
+    return names | {f'{view_class.__module__}.{name}' for name in names}
+
+
+def sampled(request):
+    """Выборочное профилирование: представление из CASHFLOW_PROFILING_VIEWS и доля запросов"""
+    rate = settings.CASHFLOW_PROFILING_SAMPLE_RATE
+    if rate <= 0 or not settings.CASHFLOW_PROFILING_VIEWS:
+        return False
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+    if view_names(match, request.method).isdisjoint(settings.CASHFLOW_PROFILING_VIEWS):
+        return False
+    return random.random() < rate
+
+
+def profile_trigger(request):
+    """
+    Причина профилирования запроса: (RequestProfile.TRIGGER_*, пользователь токена)
+    или (None, None), если запрос не профилируется.
+    """
+    token = request.headers.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+    if token:
+        user = token_user(token)
+        if user is not None:
+            return RequestProfile.TRIGGER_TOKEN, user
+    if sampled(request):
+        return RequestProfile.TRIGGER_SAMPLE, None
+    return None, None
+
+
+def profile_stats(profiler):
+    """Текстовая сводка (по накопленному времени) и данные pstats для скачивания"""
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(STATS_LINES)
+    return output.getvalue(), marshal.dumps(stats.stats)
+
+
+def profile_path(request):
+    """Путь запроса для профиля - без токена профилирования в параметрах"""
+    params = request.GET.copy()
+    params.pop(PROFILE_PARAM, None)
+    query = params.urlencode()
+    return f'{request.path}?{query}' if query else request.path
+
+
+def save_profile(request, response, profiler, trigger, user, duration):
+    """Сохранение профиля; ошибки сохранения не влияют на ответ"""
+    stats, data = profile_stats(profiler)
+    if user is None and getattr(request, 'user', None) is not None and request.user.is_authenticated:
+        user = request.user
+    match = request.resolver_match
+    try:
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=profile_path(request)[:2000],
+            view_name=match.view_name if match else '',
+            user=user,
+            trigger=trigger,
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            stats=stats,
+            profile_data=data,
+        )
+        prune_profiles()
+    except DatabaseError:
+        logger.exception('Не удалось сохранить профиль запроса %s', request.path)
+        return None
+    return profile
+
+
+def prune_profiles():
+    """Хранится не более CASHFLOW_PROFILING_MAX_PROFILES последних профилей"""
+    keep = settings.CASHFLOW_PROFILING_MAX_PROFILES
+    stale = list(RequestProfile.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)[keep:])
+    if stale:
+        RequestProfile.objects.filter(pk__in=stale).delete()
+
+
+def profile_request(get_response, request, trigger, user):
+    """Выполнение запроса под cProfile и сохранение профиля"""
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Уже запущен другой профилировщик (например, соседний запрос в потоке)
+        return get_response(request)
+    try:
+        response = get_response(request)
+    finally:
+        profiler.disable()
+    profile = save_profile(request, response, profiler, trigger, user, time.perf_counter() - started)
+    if profile is not None:
+        response['X-Profile-Id'] = str(profile.pk)
+    return response
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from django.db.models import Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+# Запросы аналитических отчетов по дневным агрегатам. Общие для синхронного
+# API и асинхронных представлений: запрос строится здесь, выполняется
+# вызывающей стороной (aggregate/aaggregate, итерация/async for).
+
+
+def income_expense_sums():
+    """Суммы пополнений (доходов) и списаний (расходов) условной агрегацией"""
+    return {
+        'income': Sum('amount', filter=Q(transaction_type__name='Пополнение')),
+        'expense': Sum('amount', filter=Q(transaction_type__name='Списание')),
+    }
+
+
+def summary_period(params):
+    """Период сводки из date_from/date_to; если период не указан - текущий месяц"""
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+
+    if not date_from or not date_to:
+        today = datetime.now().date()
+        date_from = today.replace(day=1)  # Первое число текущего месяца
+        next_month = today.replace(day=28) + timedelta(days=4)  # Переход к следующему месяцу
+        date_to = next_month - timedelta(days=next_month.day)  # Последний день текущего месяца
+
+    return date_from, date_to
+
+
+def summary_etag_suffix(request):
+    """Период сводки для ETag: без дат в запросе он зависит от текущего дня"""
+    date_from, date_to = summary_period(request.GET)
+    return f'{date_from}-{date_to}'
+
+
+def summary_data(totals, date_from, date_to):
+    """Данные сводки для CashFlowRecordSummarySerializer"""
+    income = totals['income'] or 0
+    expense = totals['expense'] or 0
+    return {
+        'total_income': income,
+        'total_expense': expense,
+        'balance': income - expense,
+        'period_start': date_from,
+        'period_end': date_to
+    }
+
+
+def category_totals(queryset):
+    """Суммы и количество записей по категориям"""
+    return queryset.values(
+        'category__id',
+        'category__name',
+        'transaction_type__name'
+    ).annotate(
+        total_amount=Sum('amount'),
+        record_count=Sum('records_count')
+    ).order_by('transaction_type__name', '-total_amount')
+
+
+def monthly_totals(queryset):
+    """Доходы, расходы и количество записей по месяцам"""
+    return queryset.annotate(
+        year=ExtractYear('day'),
+        month=ExtractMonth('day')
+    ).values('year', 'month').annotate(
+        record_count=Sum('records_count'),
+        **income_expense_sums()
+    ).order_by('-year', '-month')
+
+
+def format_monthly_report(rows):
+    """Строки ежемесячного отчета в формате ответа API"""
+    return [
+        {
+            'year': int(item['year']),
+            'month': int(item['month']),
+            'period': f"{item['month']:02d}/{item['year']}",
+            'income': float(item['income'] or 0),
+            'expense': float(item['expense'] or 0),
+            'balance': float((item['income'] or 0) - (item['expense'] or 0)),
+            'record_count': item['record_count']
+        }
+        for item in rows
+    ]
@@ -0,0 +1,180 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .balance import apply_balance_deltas
+from .models import (
+    Status, TransactionType, Category, Subcategory, CashFlowRecord, CashFlowRecordWithArchive, CashFlowDailyRollup
+)
+
+
+# Поля записи ДДС, образующие ключ дневного агрегата (в порядке полей CashFlowDailyRollup)
+RECORD_KEY_FIELDS = ('created_date', 'status_id', 'transaction_type_id', 'category_id', 'subcategory_id')
+ROLLUP_KEY_FIELDS = ('day', 'status_id', 'transaction_type_id', 'category_id', 'subcategory_id')
+
+_created_date_field = CashFlowRecord._meta.get_field('created_date')
+
+# Поле агрегата, ссылающееся на справочник
+ROLLUP_DICTIONARY_FIELDS = {
+    Status: 'status',
+    TransactionType: 'transaction_type',
+    Category: 'category',
+    Subcategory: 'subcategory',
+}
+
+
+def record_key(values):
+    """
+    Ключ агрегата для записи.
+
+    Принимает экземпляр CashFlowRecord или словарь из ``.values(*RECORD_KEY_FIELDS)``.
+    """
+    if isinstance(values, dict):
+        key = [values[field] for field in RECORD_KEY_FIELDS]
+    else:
+        key = [getattr(values, field) for field in RECORD_KEY_FIELDS]
+    # До сохранения created_date может быть datetime (default=timezone.now)
+    key[0] = _created_date_field.to_python(key[0])
+    return tuple(key)
+
+
+def collect_deltas(records, sign=1, deltas=None):
+    """
+    Накопление изменений агрегатов по набору записей.
+
+    Возвращает словарь {ключ: [сумма, количество]}, пригодный для apply_deltas.
+    sign=-1 используется для удаляемых записей.
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for record in records:
+        amount = record['amount'] if isinstance(record, dict) else record.amount
+        delta = deltas[record_key(record)]
+        delta[0] += Decimal(amount) * sign
+        delta[1] += sign
+    return deltas
+
+
+def apply_delta(key, amount, count, using=None):
+    """
+    Применение изменения к одной строке агрегата.
+
+    Строка обновляется выражением F(), при отсутствии - создается.
+    Строки с нулевым количеством записей удаляются.
+    """
+    if not count and not amount:
+        return
+
+    lookup = dict(zip(ROLLUP_KEY_FIELDS, key))
+    manager = CashFlowDailyRollup.objects.db_manager(using)
+    rows = manager.filter(**lookup)
+
+    updated = rows.update(
+        amount=F('amount') + amount,
+        records_count=F('records_count') + count
+    )
+    if not updated:
+        manager.create(amount=amount, records_count=count, **lookup)
+    elif count < 0:
+        # Без Collector: на агрегат никто не ссылается, сигналов нет
+        empty = rows.filter(records_count__lte=0)
+        empty._raw_delete(empty.db)
+
+
+def apply_deltas(deltas, using=None):
+    """
+    Применение накопленных изменений (см. collect_deltas) в одной транзакции
+    вместе с обновлением остатков на день.
+    """
+    with transaction.atomic(using=using):
+        for key, (amount, count) in deltas.items():
+            apply_delta(key, amount, count, using=using)
+        apply_balance_deltas(deltas, using=using)
+
+
+def raw_aggregates(using=None):
+    """Агрегаты, посчитанные напрямую по записям, включая архивные"""
+    return (
+        CashFlowRecordWithArchive.objects.using(using)
+        .order_by()
+        .values(*RECORD_KEY_FIELDS)
+        .annotate(total_amount=Sum('amount'), record_count=Count('id'))
+    )
+
+
+def rebuild_rollup(batch_size=1000, using=None):
+    """
+    Полная пересборка таблицы агрегатов по исходным записям.
+
+    Возвращает количество созданных строк агрегата.
+    """
+    with transaction.atomic(using=using):
+        CashFlowDailyRollup.objects.using(using).all().delete()
+
+        batch = []
+        created = 0
+        for row in raw_aggregates(using).iterator(chunk_size=batch_size):
+            batch.append(CashFlowDailyRollup(
+                amount=row['total_amount'],
+                records_count=row['record_count'],
+                **dict(zip(ROLLUP_KEY_FIELDS, record_key(row)))
+            ))
+            if len(batch) >= batch_size:
+                CashFlowDailyRollup.objects.using(using).bulk_create(batch)
+                created += len(batch)
+                batch = []
+
+        if batch:
+            CashFlowDailyRollup.objects.using(using).bulk_create(batch)
+            created += len(batch)
+
+    return created
+
+
+def verify_rollup(using=None):
+    """
+    Сверка таблицы агрегатов с исходными записями.
+
+    Возвращает список расхождений: (ключ, (сумма, количество) по записям,
+    (сумма, количество) по агрегату). Отсутствующая сторона - None.
+    """
+    expected = {
+        record_key(row): (Decimal(row['total_amount']).quantize(Decimal('0.01')), row['record_count'])
+        for row in raw_aggregates(using).iterator()
+    }
+    actual = {
+        tuple(row[field] for field in ROLLUP_KEY_FIELDS): (
+            Decimal(row['amount']).quantize(Decimal('0.01')), row['records_count']
+        )
+        for row in CashFlowDailyRollup.objects.using(using).values(
+            *ROLLUP_KEY_FIELDS, 'amount', 'records_count'
+        ).iterator()
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        if expected.get(key) != actual.get(key):
+            mismatches.append((key, expected.get(key), actual.get(key)))
+    return mismatches
+
+
+def annotate_records_count(queryset, name='records_count'):
+    """
+    Количество записей ДДС для каждого элемента справочника.
+
+    Считается по дневным агрегатам коррелированным подзапросом в том же SQL,
+    без отдельного COUNT на каждую строку и без сканирования CashFlowRecord.
+    """
+    field = ROLLUP_DICTIONARY_FIELDS[queryset.model]
+    counts = (
+        CashFlowDailyRollup.objects
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Sum('records_count'))
+        .values('total')
+    )
+    return queryset.annotate(**{name: Coalesce(Subquery(counts), 0)})
@@ -0,0 +1,116 @@
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.utils import timezone
+
+# Признак запроса, чтения которого можно выполнять на реплике
+_replica_reads = ContextVar('replica_reads', default=False)
+
+# Результат последней проверки отставания реплики (в пределах процесса)
+_freshness = {'checked': None, 'fresh': True}
+
+# Cookie "недавно была запись": чтения клиента идут в основную базу
+PRIMARY_COOKIE = 'cashflow_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_alias():
+    """Алиас реплики для чтения (None - реплика не настроена)"""
+    return getattr(settings, 'CASHFLOW_READ_REPLICA', None)
+
+
+def use_replica():
+    """Чтения текущего запроса идут на реплику; возвращает токен для release_replica"""
+    return _replica_reads.set(True)
+
+
+def release_replica(token):
+    try:
+        _replica_reads.reset(token)
+    except ValueError:
+        # Токен из другого контекста: при ASGI process_view выполняется в потоке
+        # sync_to_async, и его изменения переносятся в контекст запроса копией
+        _replica_reads.set(False)
+
+
+def replica_view(view_func, method):
+    """
+    Можно ли читать с реплики в представлении: класс с read_replica = True
+    или действие ViewSet из replica_actions.
+    """
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, 'read_replica', False)
+    if getattr(view_class, 'read_replica', False):
+        return True
+    action = (getattr(view_func, 'actions', None) or {}).get(method.lower())
+    return action in getattr(view_class, 'replica_actions', ())
+
+
+def replica_lag(alias=None):
+    """
+    Оценка отставания реплики в секундах по счетчикам версий (DataVersion).
+
+    Если версия области на реплике меньше, чем в основной базе, реплика
+    не получила как минимум последнее изменение - отставание не меньше
+    времени, прошедшего с него. Недоступная реплика - бесконечное отставание.
+    """
+    from .models import DataVersion
+
+    alias = alias or replica_alias()
+    primary = DataVersion.objects.using(DEFAULT_DB_ALIAS).values_list('name', 'version', 'updated_at')
+    try:
+        replica = dict(DataVersion.objects.using(alias).values_list('name', 'version'))
+    except DatabaseError:
+        return float('inf')
+
+    now = timezone.now()
+    lag = 0.0
+    for name, version, updated_at in primary:
+        if replica.get(name, 0) < version:
+            lag = max(lag, (now - updated_at).total_seconds())
+    return lag
+
+
+def replica_is_fresh():
+    """
+    Отставание реплики не больше CASHFLOW_REPLICA_MAX_LAG.
+
+    Проверка выполняется не чаще раза в CASHFLOW_REPLICA_CHECK_INTERVAL секунд.
+    """
+    now = time.monotonic()
+    checked = _freshness['checked']
+    if checked is None or now - checked >= settings.CASHFLOW_REPLICA_CHECK_INTERVAL:
+        _freshness['fresh'] = replica_lag() <= settings.CASHFLOW_REPLICA_MAX_LAG
+        _freshness['checked'] = now
+    return _freshness['fresh']
+
+
+class ReplicaRouter:
+    """
+    Маршрутизация чтений моделей приложения на реплику.
+
+    На реплику идут только чтения запросов, помеченных ReplicaRoutingMiddleware
+    (аналитика, выгрузка, HTML-список). Запись, пользователи, сессии и все
+    остальные чтения - в основной базе.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias and _replica_reads.get() and model._meta.app_label == 'web':
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплики приходит вместе с данными из основной базы
+        return db != replica_alias()
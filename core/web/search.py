@@ -0,0 +1,173 @@
+import re
+
+from django.db import DatabaseError, connections
+from django.db.models import Q
+
+# Полнотекстовый индекс SQLite FTS5 по комментарию записи и названиям
+# категории и подкатегории. rowid строки индекса равен id записи ДДС.
+FTS_TABLE = 'web_cashflowrecord_fts'
+
+FTS_CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(comment, category_name, subcategory_name, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+FTS_ROW_SELECT_SQL = (
+    "SELECT {id}, COALESCE({comment}, ''), "
+    "(SELECT name FROM web_category WHERE id = {category_id}), "
+    "(SELECT name FROM web_subcategory WHERE id = {subcategory_id})"
+)
+
+# Триггеры поддерживают индекс при любых изменениях, включая bulk_create
+# и queryset.update(), которые не отправляют сигналы моделей
+FTS_TRIGGERS = {
+    'web_cashflowrecord_fts_ai': (
+        f"CREATE TRIGGER IF NOT EXISTS web_cashflowrecord_fts_ai AFTER INSERT ON web_cashflowrecord BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, comment, category_name, subcategory_name) "
+        + FTS_ROW_SELECT_SQL.format(
+            id='NEW.id', comment='NEW.comment',
+            category_id='NEW.category_id', subcategory_id='NEW.subcategory_id'
+        )
+        + "; END"
+    ),
+    'web_cashflowrecord_fts_au': (
+        "CREATE TRIGGER IF NOT EXISTS web_cashflowrecord_fts_au "
+        "AFTER UPDATE OF comment, category_id, subcategory_id ON web_cashflowrecord BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id; "
+        f"INSERT INTO {FTS_TABLE}(rowid, comment, category_name, subcategory_name) "
+        + FTS_ROW_SELECT_SQL.format(
+            id='NEW.id', comment='NEW.comment',
+            category_id='NEW.category_id', subcategory_id='NEW.subcategory_id'
+        )
+        + "; END"
+    ),
+    'web_cashflowrecord_fts_ad': (
+        "CREATE TRIGGER IF NOT EXISTS web_cashflowrecord_fts_ad AFTER DELETE ON web_cashflowrecord BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id; END"
+    ),
+    'web_category_fts_au': (
+        "CREATE TRIGGER IF NOT EXISTS web_category_fts_au AFTER UPDATE OF name ON web_category BEGIN "
+        f"UPDATE {FTS_TABLE} SET category_name = NEW.name "
+        "WHERE rowid IN (SELECT id FROM web_cashflowrecord WHERE category_id = NEW.id); END"
+    ),
+    'web_subcategory_fts_au': (
+        "CREATE TRIGGER IF NOT EXISTS web_subcategory_fts_au AFTER UPDATE OF name ON web_subcategory BEGIN "
+        f"UPDATE {FTS_TABLE} SET subcategory_name = NEW.name "
+        "WHERE rowid IN (SELECT id FROM web_cashflowrecord WHERE subcategory_id = NEW.id); END"
+    ),
+}
+
+# Поля поиска LIKE, если FTS5 недоступен
+FALLBACK_SEARCH_FIELDS = ('comment', 'category__name', 'subcategory__name')
+
+# Результат проверки наличия индекса по алиасу БД
+_fts_available = {}
+
+
+def install_search_index(connection):
+    """
+    Создание таблицы FTS5 и триггеров синхронизации.
+
+    Возвращает False, если БД не SQLite или SQLite собран без FTS5.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(FTS_CREATE_SQL)
+            for sql in FTS_TRIGGERS.values():
+                cursor.execute(sql)
+    except DatabaseError:
+        return False
+    finally:
+        _fts_available.pop(connection.alias, None)
+    return True
+
+
+def drop_search_index(connection):
+    """Удаление триггеров и таблицы FTS5"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in FTS_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    _fts_available.pop(connection.alias, None)
+
+
+def rebuild_search_index(using='default'):
+    """
+    Полная пересборка индекса по текущим записям.
+
+    Создает таблицу и триггеры, если их нет. Возвращает количество
+    проиндексированных записей или None, если FTS5 недоступен.
+    """
+    connection = connections[using]
+    if not install_search_index(connection):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, comment, category_name, subcategory_name) "
+            + FTS_ROW_SELECT_SQL.format(
+                id='r.id', comment='r.comment',
+                category_id='r.category_id', subcategory_id='r.subcategory_id'
+            )
+            + " FROM web_cashflowrecord r"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def fts_available(using='default'):
+    """Есть ли в БД полнотекстовый индекс записей (результат кешируется по алиасу)"""
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[using]
+
+
+def search_terms(text):
+    """Слова поискового запроса без знаков препинания и служебного синтаксиса FTS5"""
+    return re.findall(r'\w+', text or '')
+
+
+def build_match_query(terms):
+    """Запрос MATCH: все слова обязательны, каждое - с поиском по префиксу"""
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_records(queryset, text):
+    """
+    Поиск записей ДДС по комментарию, категории и подкатегории.
+
+    При наличии FTS5 каждое слово ищется по префиксу в индексе, к записям
+    добавляется релевантность search_rank (bm25, меньше - лучше). Без FTS5 -
+    поиск icontains по тем же полям, каждое слово должно найтись хотя бы в одном.
+    Возвращает (queryset, ranked), где ranked - доступна ли сортировка по search_rank.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset, False
+
+    # Индекс есть только у оперативной таблицы (архив ищется без него)
+    if queryset.model._meta.db_table == 'web_cashflowrecord' and fts_available(queryset.db):
+        table = queryset.model._meta.db_table
+        queryset = queryset.extra(
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[build_match_query(terms)],
+        )
+        return queryset, True
+
+    for term in terms:
+        condition = Q()
+        for field in FALLBACK_SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(condition)
+    return queryset, False
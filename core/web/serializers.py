@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Status, TransactionType, Category, Subcategory, CashFlowRecord
+from .taxonomy import check_hierarchy
 
 
 class StatusSerializer(serializers.ModelSerializer):
@@ -52,7 +53,7 @@ class CashFlowRecordSerializer(serializers.ModelSerializer):
             'id', 'created_date', 'status', 'status_name',
             'transaction_type', 'transaction_type_name',
             'category', 'category_name', 'subcategory', 'subcategory_name',
-            'amount', 'comment'
+            'amount', 'comment', 'source', 'external_id'
         ]
         read_only_fields = ['id']
 
@@ -70,19 +71,13 @@ class CashFlowRecordCreateSerializer(serializers.ModelSerializer):
         """
         Валидация логических зависимостей
         """
-        # Проверка соответствия категории и типа операции
-        if 'category' in data and 'transaction_type' in data:
-            if data['category'].transaction_type != data['transaction_type']:
-                raise serializers.ValidationError({
-                    'category': 'Выбранная категория не принадлежит выбранному типу операции'
-                })
-
-        # Проверка соответствия подкатегории и категории
-        if 'subcategory' in data and 'category' in data:
-            if data['subcategory'].category != data['category']:
-                raise serializers.ValidationError({
-                    'subcategory': 'Выбранная подкатегория не принадлежит выбранной категории'
-                })
+        # Соответствие тип -> категория -> подкатегория (по индексу справочников, со сверкой версии)
+        errors = check_hierarchy(*(
+            data[field].pk if data.get(field) else None
+            for field in ('transaction_type', 'category', 'subcategory')
+        ))
+        if errors:
+            raise serializers.ValidationError(errors)
 
         # Проверка суммы
         if 'amount' in data and data['amount'] <= 0:
@@ -102,4 +97,55 @@ class CashFlowRecordSummarySerializer(serializers.Serializer):
     period_end = serializers.DateField()
 
     class Meta:
-        fields = ['total_income', 'total_expense', 'balance', 'period_start', 'period_end']
\ No newline at end of file
+        fields = ['total_income', 'total_expense', 'balance', 'period_start', 'period_end']
+
+
+class CashFlowRecordBulkRowSerializer(serializers.Serializer):
+    """
+    Сериализатор строки массовой загрузки записей ДДС.
+
+    Справочники передаются id и не загружаются из БД - их существование
+    и согласованность проверяются по снимку справочников (TaxonomySnapshot).
+    """
+    created_date = serializers.DateField(required=False)
+    status = serializers.IntegerField(required=False, allow_null=True)
+    transaction_type = serializers.IntegerField()
+    category = serializers.IntegerField()
+    subcategory = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    comment = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Сумма должна быть положительным числом')
+        return value
+
+
+class CashFlowRecordUpsertRowSerializer(CashFlowRecordBulkRowSerializer):
+    """
+    Строка синхронизации записей: ключ записи - источник и внешний идентификатор.
+
+    Источник можно не указывать в строке, тогда берется параметр запроса source.
+    """
+    source = serializers.CharField(required=False, allow_blank=True, max_length=50)
+    external_id = serializers.CharField(max_length=100)
+
+
+class CashFlowRecordBulkPatchSerializer(serializers.Serializer):
+    """
+    Изменение, применяемое ко всем записям фильтра (bulk_update).
+
+    Справочники передаются id; при смене категории или типа операции
+    нужно указать подкатегорию - родители проверяются по снимку справочников.
+    """
+    created_date = serializers.DateField(required=False)
+    status = serializers.IntegerField(required=False, allow_null=True)
+    transaction_type = serializers.IntegerField(required=False)
+    category = serializers.IntegerField(required=False)
+    subcategory = serializers.IntegerField(required=False)
+    comment = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError('Укажите хотя бы одно изменяемое поле')
+        return data
@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .balance import BALANCE_SIGNS, rebuild_balances
+from .models import Status, TransactionType, Category, Subcategory, CashFlowRecord
+from .rollup import RECORD_KEY_FIELDS, collect_deltas, apply_deltas
+from .taxonomy import reset_taxonomy_index
+from .versions import RECORDS, TAXONOMY, bump_version
+
+TAXONOMY_MODELS = (Status, TransactionType, Category, Subcategory)
+
+
+@receiver(pre_save, sender=CashFlowRecord)
+def remember_previous_rollup_key(sender, instance, raw=False, using=None, **kwargs):
+    """
+    Запоминаем состояние записи в БД до изменения.
+
+    Нужна для вычитания старых значений из дневного агрегата при обновлении.
+    """
+    if raw:
+        return
+    instance._rollup_previous = None
+    if instance.pk:
+        instance._rollup_previous = (
+            sender.objects.using(using)
+            .filter(pk=instance.pk)
+            .values(*RECORD_KEY_FIELDS, 'amount')
+            .first()
+        )
+
+
+@receiver(post_save, sender=CashFlowRecord)
+def update_rollup_on_save(sender, instance, raw=False, using=None, **kwargs):
+    """Обновление дневного агрегата и версии записей после создания или изменения записи"""
+    if raw:
+        return
+    deltas = collect_deltas([instance])
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous:
+        collect_deltas([previous], sign=-1, deltas=deltas)
+    instance._rollup_previous = None
+    apply_deltas(deltas, using=using)
+    bump_version(RECORDS, using=using)
+
+
+@receiver(post_delete, sender=CashFlowRecord)
+def update_rollup_on_delete(sender, instance, using=None, **kwargs):
+    """Вычитание удаленной записи из дневного агрегата, новая версия записей"""
+    apply_deltas(collect_deltas([instance], sign=-1), using=using)
+    bump_version(RECORDS, using=using)
+
+
+def bump_taxonomy_version(sender, using=None, raw=False, **kwargs):
+    """
+    Новая версия справочников при любом изменении статусов, типов, категорий,
+    подкатегорий. Индекс справочников своего процесса сбрасывается сразу
+    и после фиксации транзакции (его могли перечитать до фиксации).
+    """
+    if not raw:
+        bump_version(TAXONOMY, using=using)
+        reset_taxonomy_index(using)
+        transaction.on_commit(lambda: reset_taxonomy_index(using), using=using)
+
+
+for taxonomy_model in TAXONOMY_MODELS:
+    post_save.connect(bump_taxonomy_version, sender=taxonomy_model)
+    post_delete.connect(bump_taxonomy_version, sender=taxonomy_model)
+
+
+@receiver(pre_save, sender=TransactionType)
+def remember_previous_type_name(sender, instance, raw=False, using=None, **kwargs):
+    """Запоминаем название типа в БД до изменения - от него зависит знак в остатках"""
+    instance._previous_name = None
+    if not raw and instance.pk:
+        instance._previous_name = (
+            sender.objects.using(using).filter(pk=instance.pk).values_list('name', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=TransactionType)
+def rebuild_balances_on_type_save(sender, instance, created=False, raw=False, using=None, **kwargs):
+    """
+    Пересборка остатков, если тип переименован в Пополнение/Списание или из них
+    (или создан с таким названием). Регистрируется после bump_taxonomy_version:
+    знаки берутся из уже обновленного снимка справочников.
+    """
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_previous_name', None)
+    if previous != instance.name and (previous in BALANCE_SIGNS or instance.name in BALANCE_SIGNS):
+        rebuild_balances(using=using)
+
+
+@receiver(post_delete, sender=TransactionType)
+def rebuild_balances_on_type_delete(sender, instance, using=None, **kwargs):
+    """Пересборка остатков после удаления типа, входившего в остаток"""
+    if instance.name in BALANCE_SIGNS:
+        rebuild_balances(using=using)
@@ -0,0 +1,242 @@
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+
+from .bulk import BULK_DEFAULT_CHUNK_SIZE, insert_records
+from .models import Status, TransactionType, Category, Subcategory, CashFlowRecord
+
+# Поля записи, которые можно сопоставить столбцам выписки
+IMPORT_FIELDS = ('created_date', 'status', 'transaction_type', 'category', 'subcategory', 'amount', 'comment')
+
+# Ограничение поля CashFlowRecord.amount (max_digits=12, decimal_places=2)
+MAX_AMOUNT = Decimal('9999999999.99')
+
+
+class ImportMappingError(ValueError):
+    """Ошибка настройки импорта или заголовка файла"""
+
+
+class ImportMapping:
+    """
+    Настройка импорта выписки (JSON-файл).
+
+    Пример::
+
+        {
+            "delimiter": ";",
+            "encoding": "cp1251",
+            "date_format": "%d.%m.%Y",
+            "decimal_comma": true,
+            "columns": {"created_date": "Дата", "amount": "Сумма", "comment": "Назначение платежа",
+                        "category": "Статья", "subcategory": "Подстатья"},
+            "defaults": {"status": "Бизнес"},
+            "sign_types": {"positive": "Пополнение", "negative": "Списание"}
+        }
+
+    columns - поле записи -> столбец файла, defaults - значения для полей без
+    столбца или с пустым значением. Справочники задаются названиями. Если тип
+    операции не указан, а задан sign_types, он определяется по знаку суммы.
+    """
+
+    def __init__(self, columns, defaults=None, delimiter=',', encoding='utf-8-sig',
+                 date_format='%Y-%m-%d', decimal_comma=False, sign_types=None):
+        unknown = (set(columns) | set(defaults or {})) - set(IMPORT_FIELDS)
+        if unknown:
+            raise ImportMappingError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+        if 'amount' not in columns:
+            raise ImportMappingError('Не указан столбец суммы (columns.amount)')
+
+        self.columns = dict(columns)
+        self.defaults = dict(defaults or {})
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.date_format = date_format
+        self.decimal_comma = decimal_comma
+        self.sign_types = sign_types or {}
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding='utf-8') as file:
+                config = json.load(file)
+            return cls(**config)
+        except (OSError, ValueError, TypeError) as exc:
+            raise ImportMappingError(f'Некорректная настройка импорта {path}: {exc}')
+
+    def check_header(self, fieldnames):
+        missing = set(self.columns.values()) - set(fieldnames or ())
+        if missing:
+            raise ImportMappingError(f'В файле нет столбцов: {", ".join(sorted(missing))}')
+
+    def value(self, row, field):
+        column = self.columns.get(field)
+        value = (row.get(column) or '').strip() if column else ''
+        return value or self.defaults.get(field) or ''
+
+    def parse_amount(self, value):
+        value = value.replace(' ', '').replace('\xa0', '')
+        if self.decimal_comma:
+            value = value.replace('.', '').replace(',', '.')
+        return Decimal(value)
+
+
+def normalize_name(name):
+    """Название для сопоставления: без лишних пробелов и регистра"""
+    return ' '.join(str(name).split()).casefold()
+
+
+class NameResolver:
+    """
+    Карты названий справочников в id, загружаемые в память один раз
+    (по одному запросу на справочник).
+    """
+
+    def __init__(self, using=None):
+        self.statuses = {
+            normalize_name(name): pk for pk, name in Status.objects.using(using).values_list('id', 'name')
+        }
+        self.transaction_types = {
+            normalize_name(name): pk for pk, name in TransactionType.objects.using(using).values_list('id', 'name')
+        }
+        self.categories = {
+            (type_id, normalize_name(name)): pk
+            for pk, type_id, name in Category.objects.using(using).values_list('id', 'transaction_type_id', 'name')
+        }
+        self.subcategories = {
+            (category_id, normalize_name(name)): pk
+            for pk, category_id, name in Subcategory.objects.using(using).values_list('id', 'category_id', 'name')
+        }
+
+    def resolve(self, transaction_type, category, subcategory, status=''):
+        """Названия -> {поле: id}; возвращает (id, ошибки)"""
+        ids = {'status': None}
+        errors = {}
+
+        if status:
+            ids['status'] = self.statuses.get(normalize_name(status))
+            if ids['status'] is None:
+                errors['status'] = f'Статус «{status}» не найден'
+
+        ids['transaction_type'] = self.transaction_types.get(normalize_name(transaction_type))
+        if ids['transaction_type'] is None:
+            errors['transaction_type'] = f'Тип операции «{transaction_type}» не найден'
+            return ids, errors
+
+        ids['category'] = self.categories.get((ids['transaction_type'], normalize_name(category)))
+        if ids['category'] is None:
+            errors['category'] = f'Категория «{category}» не найдена для типа «{transaction_type}»'
+            return ids, errors
+
+        ids['subcategory'] = self.subcategories.get((ids['category'], normalize_name(subcategory)))
+        if ids['subcategory'] is None:
+            errors['subcategory'] = f'Подкатегория «{subcategory}» не найдена в категории «{category}»'
+        return ids, errors
+
+
+def convert_row(row, mapping, resolver, today=None):
+    """
+    Строка выписки -> поля CashFlowRecord (id справочников, дата, сумма).
+
+    Справочники сопоставляются по картам NameResolver, поэтому тип, категория
+    и подкатегория согласованы по построению и сериализатор не нужен.
+    Возвращает (данные, ошибки по полям).
+    """
+    errors = {}
+    data = {'comment': mapping.value(row, 'comment') or None, 'created_date': today or timezone.localdate()}
+
+    try:
+        amount = mapping.parse_amount(mapping.value(row, 'amount'))
+    except InvalidOperation:
+        amount = None
+    # NaN не сравнивается со знаком (InvalidOperation), бесконечность не сумма
+    if amount is None or not amount.is_finite():
+        errors['amount'] = 'Некорректная сумма'
+        amount = None
+
+    transaction_type = mapping.value(row, 'transaction_type')
+    if amount is not None and mapping.sign_types:
+        if not transaction_type:
+            transaction_type = mapping.sign_types.get('negative' if amount < 0 else 'positive', '')
+        amount = abs(amount)
+    if amount is not None:
+        if amount <= 0 or amount > MAX_AMOUNT or amount != amount.quantize(Decimal('0.01')):
+            errors['amount'] = 'Сумма должна быть положительным числом с точностью до копеек'
+        data['amount'] = amount
+
+    created_date = mapping.value(row, 'created_date')
+    if created_date:
+        try:
+            data['created_date'] = datetime.strptime(created_date, mapping.date_format).date()
+        except ValueError:
+            errors['created_date'] = f'Ожидается дата в формате {mapping.date_format}'
+
+    if not transaction_type and errors:
+        # Тип по знаку суммы не определить - достаточно ошибки суммы
+        return data, errors
+
+    ids, name_errors = resolver.resolve(
+        transaction_type, mapping.value(row, 'category'),
+        mapping.value(row, 'subcategory'), mapping.value(row, 'status')
+    )
+    data.update({f'{field}_id': value for field, value in ids.items()})
+    errors.update(name_errors)
+    return data, errors
+
+
+def import_statement(file, mapping, chunk_size=BULK_DEFAULT_CHUNK_SIZE, dry_run=False,
+                     start_row=1, progress=None, on_error=None):
+    """
+    Потоковый импорт выписки из открытого CSV-файла.
+
+    Файл читается построчно, в памяти - только текущая пачка из chunk_size
+    строк. Каждая пачка вставляется в своей транзакции вместе с дневными
+    агрегатами (insert_records). Строки с ошибками пропускаются
+    и передаются в on_error(номер строки, ошибки). Номера строк - порядковые
+    номера строк данных (без заголовка) начиная с 1; start_row - номер
+    первой обрабатываемой строки (продолжение прерванного импорта).
+
+    Возвращает статистику: rows, created (при dry_run - прошедшие проверку),
+    errors, last_row. После каждой пачки вызывается progress(статистика):
+    все строки до last_row включительно уже записаны или отклонены.
+    """
+    reader = csv.DictReader(file, delimiter=mapping.delimiter)
+    mapping.check_header(reader.fieldnames)
+
+    resolver = NameResolver()
+    today = timezone.localdate()
+    stats = {'rows': 0, 'created': 0, 'errors': 0, 'last_row': start_row - 1}
+    chunk = []
+    reported = [None]
+
+    def report(number, errors):
+        stats['errors'] += 1
+        if on_error:
+            on_error(number, errors)
+
+    def flush():
+        if chunk and not dry_run:
+            insert_records([CashFlowRecord(**data) for data in chunk], chunk_size=len(chunk))
+        stats['created'] += len(chunk)
+        chunk.clear()
+        if progress and reported[0] != stats['last_row']:
+            reported[0] = stats['last_row']
+            progress(stats)
+
+    for number, row in enumerate(reader, start=1):
+        if number < start_row:
+            continue
+        data, errors = convert_row(row, mapping, resolver, today)
+        if errors:
+            report(number, errors)
+        else:
+            chunk.append(data)
+        stats['rows'] += 1
+        stats['last_row'] = number
+        if len(chunk) >= chunk_size:
+            flush()
+
+    flush()
+    return stats
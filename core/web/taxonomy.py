@@ -0,0 +1,149 @@
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Status, TransactionType, Category, Subcategory
+from .versions import TAXONOMY, get_version
+
+# Индекс справочников процесса по алиасу БД: (снимок, версия TAXONOMY, время сверки версии)
+_indexes = {}
+
+
+class TaxonomySnapshot:
+    """
+    Снимок справочников в памяти для проверки записей без запросов к БД.
+
+    Хранит множество id статусов, названия типов операций по id, а также карты
+    родителей: категория -> тип операции, подкатегория -> категория.
+    """
+
+    def __init__(self, status_ids, transaction_type_names, category_types, subcategory_categories):
+        self.status_ids = set(status_ids)
+        self.transaction_type_names = dict(transaction_type_names)
+        self.transaction_type_ids = set(self.transaction_type_names)
+        self.category_types = dict(category_types)
+        self.subcategory_categories = dict(subcategory_categories)
+
+    @classmethod
+    def load(cls, using=None):
+        """Загрузка снимка: по одному запросу на справочник"""
+        return cls(
+            Status.objects.using(using).values_list('id', flat=True),
+            TransactionType.objects.using(using).values_list('id', 'name'),
+            Category.objects.using(using).values_list('id', 'transaction_type_id'),
+            Subcategory.objects.using(using).values_list('id', 'category_id'),
+        )
+
+    def check(self, transaction_type_id, category_id, subcategory_id, status_id=None):
+        """
+        Проверка существования и согласованности тип -> категория -> подкатегория.
+
+        Возвращает словарь ошибок по полям (пустой, если ошибок нет).
+        Сообщения совпадают с CashFlowRecord.clean().
+        """
+        errors = {}
+
+        if status_id is not None and status_id not in self.status_ids:
+            errors['status'] = 'Статус не найден'
+
+        if transaction_type_id not in self.transaction_type_ids:
+            errors['transaction_type'] = 'Тип операции не найден'
+
+        if category_id not in self.category_types:
+            errors['category'] = 'Категория не найдена'
+        elif self.category_types[category_id] != transaction_type_id:
+            errors['category'] = 'Выбранная категория не принадлежит выбранному типу операции'
+
+        if subcategory_id not in self.subcategory_categories:
+            errors['subcategory'] = 'Подкатегория не найдена'
+        elif self.subcategory_categories[subcategory_id] != category_id:
+            errors['subcategory'] = 'Выбранная подкатегория не принадлежит выбранной категории'
+
+        return errors
+
+    def check_hierarchy(self, transaction_type_id=None, category_id=None, subcategory_id=None):
+        """
+        Согласованность переданных пар тип -> категория и категория -> подкатегория.
+
+        Пропущенные (None) значения не проверяются - как при частичном изменении.
+        """
+        errors = {}
+        if transaction_type_id is not None and category_id is not None:
+            if self.category_types.get(category_id) != transaction_type_id:
+                errors['category'] = 'Выбранная категория не принадлежит выбранному типу операции'
+        if category_id is not None and subcategory_id is not None:
+            if self.subcategory_categories.get(subcategory_id) != category_id:
+                errors['subcategory'] = 'Выбранная подкатегория не принадлежит выбранной категории'
+        return errors
+
+
+def taxonomy_index(using=None, verify=False):
+    """
+    Снимок справочников в памяти процесса, общий для проверок записей.
+
+    Версия справочников (TAXONOMY) сверяется не чаще раза в
+    CASHFLOW_TAXONOMY_CHECK_INTERVAL секунд или сразу при verify=True;
+    снимок перезагружается, только если справочники изменились, в том числе
+    в другом процессе. В своем процессе индекс сбрасывается сигналами.
+    """
+    alias = using or DEFAULT_DB_ALIAS
+    cached = _indexes.get(alias)
+    now = time.monotonic()
+    if cached and not verify and now - cached[2] < settings.CASHFLOW_TAXONOMY_CHECK_INTERVAL:
+        return cached[0]
+
+    version = get_version(TAXONOMY, using)[0]
+    if cached and cached[1] == version:
+        snapshot = cached[0]
+    else:
+        snapshot = TaxonomySnapshot.load(using)
+    _indexes[alias] = (snapshot, version, now)
+    return snapshot
+
+
+def reset_taxonomy_index(using=None):
+    _indexes.pop(using or DEFAULT_DB_ALIAS, None)
+
+
+def check_hierarchy(transaction_type_id=None, category_id=None, subcategory_id=None, using=None):
+    """
+    Проверка согласованности справочников записи по индексу процесса.
+
+    Проверка идет перед записью, поэтому версия справочников сверяется
+    каждый раз (один запрос): справочник, измененный в другом процессе,
+    не даст ни ложной ошибки, ни пропуска несогласованной записи.
+    Снимок перезагружается только при смене версии.
+    """
+    return taxonomy_index(using, verify=True).check_hierarchy(transaction_type_id, category_id, subcategory_id)
+
+
+def build_taxonomy_tree(using=None):
+    """
+    Дерево справочников тип операции -> категория -> подкатегория и список статусов.
+
+    Строится тремя запросами (плюс статусы) без N+1.
+    """
+    subcategories = {}
+    for sub in Subcategory.objects.using(using).order_by('name').values('id', 'name', 'category_id'):
+        subcategories.setdefault(sub['category_id'], []).append({'id': sub['id'], 'name': sub['name']})
+
+    categories = {}
+    for cat in Category.objects.using(using).order_by('name').values('id', 'name', 'transaction_type_id'):
+        categories.setdefault(cat['transaction_type_id'], []).append({
+            'id': cat['id'],
+            'name': cat['name'],
+            'subcategories': subcategories.get(cat['id'], []),
+        })
+
+    return {
+        'statuses': list(Status.objects.using(using).values('id', 'name')),
+        'transaction_types': [
+            {
+                'id': transaction_type['id'],
+                'name': transaction_type['name'],
+                'categories': categories.get(transaction_type['id'], []),
+            }
+            for transaction_type in TransactionType.objects.using(using).values('id', 'name')
+        ],
+    }
@@ -1,11 +1,14 @@
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
-from datetime import date
+from datetime import date, datetime
+from unittest import mock
 from decimal import Decimal
 
-from ..models import Status, TransactionType, Category, Subcategory, CashFlowRecord
+from ..balance import verify_balances
+from ..models import Status, TransactionType, Category, Subcategory, CashFlowRecord, CashFlowDailyRollup
 
 
 class APITests(APITestCase):
@@ -146,4 +149,537 @@ class APITests(APITestCase):
         self.assertIn('balance', response.data)
         self.assertEqual(response.data['total_income'], '1000.00')
         self.assertEqual(response.data['total_expense'], '300.00')
-        self.assertEqual(response.data['balance'], '700.00')
\ No newline at end of file
+        self.assertEqual(response.data['balance'], '700.00')
+
+    def test_analytics_follow_record_changes(self):
+        """Тест аналитики после изменения и удаления записей (дневные агрегаты)"""
+        record = CashFlowRecord.objects.create(
+            created_date=date(2025, 3, 10),
+            status=self.status,
+            transaction_type=self.transaction_type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=Decimal('1000.00')
+        )
+        CashFlowRecord.objects.create(
+            created_date=date(2025, 4, 5),
+            status=self.status,
+            transaction_type=self.transaction_type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=Decimal('200.00')
+        )
+
+        # Изменение через API
+        url = reverse('cashflowrecord-detail', args=[record.id])
+        response = self.client.patch(url, {'amount': '400.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('cashflowrecord-summary'), {
+            'date_from': '2025-03-01', 'date_to': '2025-04-30'
+        })
+        self.assertEqual(response.data['total_income'], '600.00')
+
+        response = self.client.get(reverse('cashflowrecord-by-category'))
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['total_amount'], Decimal('600.00'))
+        self.assertEqual(response.data[0]['record_count'], 2)
+
+        self.client.delete(url)
+        response = self.client.get(reverse('cashflowrecord-monthly-report'))
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['period'], '04/2025')
+        self.assertEqual(response.data[0]['income'], 200.0)
+
+    def test_cursor_pagination(self):
+        """Тест курсорной пагинации списка записей"""
+        for i in range(25):
+            CashFlowRecord.objects.create(
+                created_date=date(2025, 1, 1 + i % 5),
+                status=self.status,
+                transaction_type=self.transaction_type,
+                category=self.category,
+                subcategory=self.subcategory,
+                amount=Decimal(f'{100 + i}.00')
+            )
+
+        url = reverse('cashflowrecord-list')
+        response = self.client.get(url, {'cursor': '', 'ordering': 'amount'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        first_page = [item['amount'] for item in response.data['results']]
+        self.assertEqual(first_page[0], '100.00')
+        self.assertEqual(len(first_page), 20)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['amount'] for item in response.data['results']][0], '120.00')
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([item['amount'] for item in response.data['results']], first_page)
+
+        # Обход по дате с фильтром: без повторов и пропусков
+        ids = []
+        params = {'cursor': '', 'date_from': '2025-01-02'}
+        next_url = url
+        while next_url:
+            response = self.client.get(next_url, params)
+            ids.extend(item['id'] for item in response.data['results'])
+            next_url, params = response.data['next'], None
+        self.assertEqual(len(ids), 20)
+        self.assertEqual(len(set(ids)), 20)
+
+    def test_cursor_pagination_errors(self):
+        """Тест курсорной пагинации с неподдерживаемой сортировкой и поврежденным курсором"""
+        url = reverse('cashflowrecord-list')
+        response = self.client.get(url, {'cursor': '', 'ordering': 'comment'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_streaming(self):
+        """Тест потоковой выгрузки записей в CSV, NDJSON и gzip"""
+        import gzip
+        import json
+
+        for day, amount in ((1, '100.00'), (2, '200.00')):
+            CashFlowRecord.objects.create(
+                created_date=date(2025, 1, day),
+                status=self.status,
+                transaction_type=self.transaction_type,
+                category=self.category,
+                subcategory=self.subcategory,
+                amount=Decimal(amount),
+                comment='Выгрузка'
+            )
+
+        url = reverse('cashflowrecord-export')
+        response = self.client.get(url, {'date_from': '2025-01-02'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('id,created_date'))
+        self.assertIn('200.00', lines[1])
+
+        response = self.client.get(url, {'export_format': 'ndjson', 'compress': 'gzip'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+        items = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items[0]['category_name'], 'Зарплата')
+        self.assertEqual(items[0]['status'], self.status.id)
+
+        response = self.client.get(url, {'export_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create(self):
+        """Тест массового создания записей: атомарный и частичный режимы"""
+        url = reverse('cashflowrecord-bulk-create')
+        other_category = Category.objects.create(transaction_type=self.transaction_type, name="Премия")
+        rows = [
+            dict(self.record_data, amount='10.00'),
+            dict(self.record_data, category=other_category.id),  # подкатегория не из категории
+            dict(self.record_data, amount='-5'),
+            dict(self.record_data, amount='30.00', status=None),
+        ]
+
+        response = self.client.post(url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('subcategory', response.data['errors'][0]['errors'])
+        self.assertEqual(CashFlowRecord.objects.count(), 0)
+
+        response = self.client.post(url + '?mode=partial&chunk_size=1', rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(CashFlowRecord.objects.count(), 2)
+
+        # Агрегаты обновлены вместе со вставкой
+        response = self.client.get(reverse('cashflowrecord-summary'))
+        self.assertEqual(response.data['total_income'], '40.00')
+
+    def test_bulk_create_ndjson(self):
+        """Тест массового создания записей из NDJSON"""
+        import json
+
+        body = '\n'.join(json.dumps(dict(self.record_data, amount=str(i + 1))) for i in range(3))
+        response = self.client.post(
+            reverse('cashflowrecord-bulk-create'), body, content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'created': 3, 'errors': []})
+
+    def test_bulk_upsert(self):
+        """Тест синхронизации по внешнему идентификатору: вставка, изменение, повтор без изменений"""
+        url = reverse('cashflowrecord-bulk-upsert') + '?source=erp'
+        rows = [
+            dict(self.record_data, external_id='A-1', amount='100.00'),
+            dict(self.record_data, external_id='A-2', amount='200.00'),
+        ]
+        response = self.client.post(url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data, {'inserted': 2, 'updated': 0, 'unchanged': 0, 'archived': 0, 'errors': []}
+        )
+        self.assertEqual(set(CashFlowRecord.objects.values_list('source', flat=True)), {'erp'})
+
+        # Пересекающееся окно: одна запись изменена, одна прежняя, одна новая
+        rows = [
+            dict(self.record_data, external_id='A-1', amount='150.00'),
+            dict(self.record_data, external_id='A-2', amount='200.00'),
+            dict(self.record_data, external_id='A-3', amount='50.00'),
+        ]
+        response = self.client.post(url + '&chunk_size=2', rows, format='json')
+        self.assertEqual(
+            response.data, {'inserted': 1, 'updated': 1, 'unchanged': 1, 'archived': 0, 'errors': []}
+        )
+        self.assertEqual(CashFlowRecord.objects.count(), 3)
+        self.assertEqual(CashFlowRecord.objects.get(external_id='A-1').amount, Decimal('150.00'))
+
+        # Тот же идентификатор другого источника - отдельная запись
+        response = self.client.post(
+            reverse('cashflowrecord-bulk-upsert'),
+            [dict(self.record_data, external_id='A-1', source='bank')], format='json'
+        )
+        self.assertEqual(response.data['inserted'], 1)
+
+        # Агрегаты учитывают старые и новые суммы
+        response = self.client.get(reverse('cashflowrecord-summary'))
+        self.assertEqual(response.data['total_income'], '1400.00')
+
+        # Без external_id строка не принимается
+        response = self.client.post(url, [self.record_data], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('external_id', response.data['errors'][0]['errors'])
+
+    def test_bulk_upsert_without_date(self):
+        """Тест синхронизации строки без даты: повтор на следующий день не меняет запись"""
+        url = reverse('cashflowrecord-bulk-upsert') + '?source=erp'
+        row = {key: value for key, value in self.record_data.items() if key != 'created_date'}
+        row['external_id'] = 'B-1'
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2025, 3, 1)):
+            response = self.client.post(url, [row], format='json')
+        self.assertEqual(response.data['inserted'], 1)
+
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2025, 3, 2)):
+            response = self.client.post(url, [row], format='json')
+        self.assertEqual(response.data['unchanged'], 1)
+        self.assertEqual(CashFlowRecord.objects.get(external_id='B-1').created_date, date(2025, 3, 1))
+
+        # Явно переданная дата обновляет запись
+        response = self.client.post(url, [dict(row, created_date='2025-03-05')], format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(CashFlowRecord.objects.get(external_id='B-1').created_date, date(2025, 3, 5))
+
+    def test_bulk_update_by_filter(self):
+        """Тест изменения записей по фильтру: проверка справочников, dry_run, агрегаты"""
+        other_subcategory = Subcategory.objects.create(category=self.category, name="Премия")
+        other_type = TransactionType.objects.create(name="Списание")
+        for amount in ('100.00', '200.00'):
+            CashFlowRecord.objects.create(
+                created_date=date(2025, 1, 10), transaction_type=self.transaction_type,
+                category=self.category, subcategory=self.subcategory, amount=Decimal(amount)
+            )
+        url = reverse('cashflowrecord-bulk-update')
+        filter_query = f'?subcategory={self.subcategory.id}&date_from=2025-01-01'
+
+        response = self.client.post(url + filter_query + '&dry_run=true', {'subcategory': other_subcategory.id})
+        self.assertEqual(response.data, {'matched': 2, 'amount': Decimal('300.00'), 'dry_run': True})
+        self.assertEqual(CashFlowRecord.objects.filter(subcategory=other_subcategory).count(), 0)
+
+        response = self.client.post(
+            url + filter_query + '&chunk_size=1', {'subcategory': other_subcategory.id, 'status': self.status.id}
+        )
+        self.assertEqual(response.data, {'updated': 2, 'dry_run': False})
+        self.assertEqual(
+            CashFlowRecord.objects.filter(subcategory=other_subcategory, status=self.status).count(), 2
+        )
+        self.assertEqual(
+            list(CashFlowDailyRollup.objects.values_list('subcategory', 'status', 'amount')),
+            [(other_subcategory.id, self.status.id, Decimal('300.00'))]
+        )
+        self.assertEqual(verify_balances(), [])
+
+        # Несогласованные справочники и запрос без фильтра отклоняются
+        response = self.client.post(url + filter_query, {'transaction_type': other_type.id})
+        self.assertIn('subcategory', response.data)
+        response = self.client.post(
+            url + filter_query, {'transaction_type': other_type.id, 'subcategory': self.subcategory.id}
+        )
+        self.assertIn('category', response.data)
+        response = self.client.post(url, {'comment': 'Все'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete_by_filter(self):
+        """Тест удаления записей по фильтру с откатом агрегатов"""
+        for created_date in (date(2025, 1, 10), date(2025, 2, 10), date(2025, 3, 10)):
+            CashFlowRecord.objects.create(
+                created_date=created_date, transaction_type=self.transaction_type,
+                category=self.category, subcategory=self.subcategory, amount=Decimal('100.00')
+            )
+        url = reverse('cashflowrecord-bulk-delete') + '?date_to=2025-02-28'
+
+        response = self.client.post(url + '&dry_run=true')
+        self.assertEqual(response.data['matched'], 2)
+        self.assertEqual(CashFlowRecord.objects.count(), 3)
+
+        response = self.client.post(url + '&chunk_size=1')
+        self.assertEqual(response.data, {'deleted': 2, 'dry_run': False})
+        self.assertEqual(CashFlowRecord.objects.get().created_date, date(2025, 3, 10))
+        response = self.client.get(
+            reverse('cashflowrecord-summary'), {'date_from': '2025-01-01', 'date_to': '2025-12-31'}
+        )
+        self.assertEqual(response.data['total_income'], '100.00')
+
+    def test_conditional_get(self):
+        """Тест ETag/Last-Modified и ответа 304 для списка и аналитики"""
+        CashFlowRecord.objects.create(
+            created_date=date.today(),
+            status=self.status,
+            transaction_type=self.transaction_type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=Decimal('1000.00')
+        )
+
+        for name in ('cashflowrecord-list', 'cashflowrecord-summary', 'cashflowrecord-monthly-report'):
+            url = reverse(name)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response['ETag']
+            self.assertIn('Last-Modified', response)
+
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Изменение записи (даже только комментария) дает новую версию
+        url = reverse('cashflowrecord-list')
+        etag = self.client.get(url)['ETag']
+        record = CashFlowRecord.objects.get()
+        record.comment = 'Новый комментарий'
+        record.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Массовая загрузка тоже меняет версию
+        etag = response['ETag']
+        self.client.post(reverse('cashflowrecord-bulk-create'), [self.record_data], format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_conditional_get_default_period(self):
+        """Тест ETag сводки без дат: с наступлением нового месяца ответ не считается прежним"""
+        self.client.login(username='testuser', password='12345')
+        urls = [reverse('cashflowrecord-summary'), reverse('async-record-summary')]
+        with mock.patch('web.reports.datetime') as clock:
+            clock.now.return_value = datetime(2030, 1, 31, 12)
+            etags = [self.client.get(url)['ETag'] for url in urls]
+            for url, etag in zip(urls, etags):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            clock.now.return_value = datetime(2030, 2, 1, 12)
+            for url, etag in zip(urls, etags):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.json()['period_start'], '2030-02-01')
+
+    def test_pivot(self):
+        """Тест сводной таблицы: строки, матрица, меры по записям и ошибки параметров"""
+        expense_type = TransactionType.objects.create(name="Списание")
+        expense_category = Category.objects.create(transaction_type=expense_type, name="Маркетинг")
+        expense_subcategory = Subcategory.objects.create(category=expense_category, name="Avito")
+        for created_date, amount in ((date(2025, 1, 10), '100.00'), (date(2025, 1, 20), '300.00'),
+                                     (date(2025, 2, 5), '50.00')):
+            CashFlowRecord.objects.create(
+                created_date=created_date,
+                transaction_type=self.transaction_type,
+                category=self.category,
+                subcategory=self.subcategory,
+                amount=Decimal(amount)
+            )
+        CashFlowRecord.objects.create(
+            created_date=date(2025, 1, 15),
+            transaction_type=expense_type,
+            category=expense_category,
+            subcategory=expense_subcategory,
+            amount=Decimal('70.00')
+        )
+        url = reverse('cashflowrecord-pivot')
+
+        # Версии данных (ETag) и один запрос агрегации
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'group_by': 'month,transaction_type', 'measures': 'sum,count,avg'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['source'], 'rollup')
+        rows = [(row['period'], row['transaction_type_name'], row['sum'], row['count'], row['avg'])
+                for row in response.data['rows']]
+        self.assertIn((date(2025, 1, 1), 'Пополнение', Decimal('400.00'), 2, Decimal('200.00')), rows)
+        self.assertIn((date(2025, 2, 1), 'Пополнение', Decimal('50.00'), 1, Decimal('50.00')), rows)
+        self.assertEqual(len(rows), 3)
+
+        # Матрица: месяцы x типы операций, ячейки - условные агрегаты
+        response = self.client.get(url, {'group_by': 'month', 'columns': 'transaction_type', 'measures': 'sum'})
+        self.assertEqual(len(response.data['columns']['values']), 2)
+        january = response.data['rows'][0]
+        self.assertEqual(january['cells'][str(self.transaction_type.id)]['sum'], Decimal('400.00'))
+        self.assertEqual(january['cells'][str(expense_type.id)]['sum'], Decimal('70.00'))
+
+        # min/max считаются по записям, фильтры применяются
+        response = self.client.get(url, {
+            'group_by': 'category', 'measures': 'min,max', 'transaction_type': self.transaction_type.id
+        })
+        self.assertEqual(response.data['source'], 'records')
+        self.assertEqual(response.data['rows'], [{
+            'category': self.category.id, 'category_name': 'Зарплата',
+            'min': Decimal('50.00'), 'max': Decimal('300.00')
+        }])
+
+        # Без group_by - итог по всем записям
+        response = self.client.get(url, {'measures': 'count'})
+        self.assertEqual(response.data['rows'], [{'count': 4}])
+
+        for params in ({'group_by': 'month,year'}, {'group_by': 'amount'}, {'measures': 'median'},
+                       {'group_by': 'category', 'columns': 'category'}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_timeseries(self):
+        """Тест рядов по интервалам с заполнением пропусков нулями"""
+        expense_type = TransactionType.objects.create(name="Списание")
+        expense_category = Category.objects.create(transaction_type=expense_type, name="Маркетинг")
+        expense_subcategory = Subcategory.objects.create(category=expense_category, name="Avito")
+        CashFlowRecord.objects.create(
+            created_date=date(2025, 1, 10),
+            transaction_type=self.transaction_type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=Decimal('100.00')
+        )
+        CashFlowRecord.objects.create(
+            created_date=date(2025, 3, 5),
+            transaction_type=expense_type,
+            category=expense_category,
+            subcategory=expense_subcategory,
+            amount=Decimal('40.00')
+        )
+        url = reverse('cashflowrecord-timeseries')
+
+        response = self.client.get(url, {'bucket': 'month', 'date_from': '2025-01-15', 'date_to': '2025-04-30'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['dates'], [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1), date(2025, 4, 1)])
+        # Запись от 10.01 вне периода, февраль и апрель - нули
+        self.assertEqual(response.data['income'], [0, 0, 0, 0])
+        self.assertEqual(response.data['expense'], [0, 0, Decimal('40.00'), 0])
+        self.assertEqual(response.data['net'], [0, 0, Decimal('-40.00'), 0])
+
+        response = self.client.get(url, {
+            'bucket': 'day', 'date_from': '2025-01-09', 'date_to': '2025-01-11',
+            'transaction_type': self.transaction_type.id
+        })
+        self.assertEqual(response.data['income'], [0, Decimal('100.00'), 0])
+
+        response = self.client.get(url, {'bucket': 'week', 'date_from': '2025-01-08', 'date_to': '2025-01-14'})
+        self.assertEqual(response.data['dates'], [date(2025, 1, 6), date(2025, 1, 13)])
+        self.assertEqual(response.data['income'], [Decimal('100.00'), 0])
+
+        response = self.client.get(url, {'bucket': 'month'})
+        self.assertEqual(len(response.data['dates']), 12)
+
+        for params in ({'bucket': 'hour'}, {'date_from': '2025-13-01'},
+                       {'date_from': '2025-02-01', 'date_to': '2025-01-01'},
+                       {'bucket': 'day', 'date_from': '2000-01-01', 'date_to': '2025-01-01'}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Без date_to ряд заканчивается сегодня: на следующий день прежний ETag не подходит
+        with mock.patch('web.timeseries.timezone.localdate', return_value=date(2030, 1, 31)):
+            etag = self.client.get(url, {'bucket': 'day'})['ETag']
+            response = self.client.get(url, {'bucket': 'day'}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        with mock.patch('web.timeseries.timezone.localdate', return_value=date(2030, 2, 1)):
+            response = self.client.get(url, {'bucket': 'day'}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['dates'][-1], date(2030, 2, 1))
+
+    def test_balance(self):
+        """Тест остатка на дату и кривой остатков"""
+        CashFlowRecord.objects.create(
+            created_date=date(2025, 1, 10),
+            status=self.status,
+            transaction_type=self.transaction_type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=Decimal('100.00')
+        )
+        url = reverse('cashflowrecord-balance')
+
+        response = self.client.get(url, {'date': '2025-01-31'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['balance'], Decimal('100.00'))
+
+        response = self.client.get(url, {'date': '2025-01-31', 'status': self.status.id})
+        self.assertEqual(response.data['balance'], Decimal('100.00'))
+
+        response = self.client.get(url, {'bucket': 'day', 'date_from': '2025-01-09', 'date_to': '2025-01-11'})
+        self.assertEqual(response.data['balance'], [0, Decimal('100.00'), Decimal('100.00')])
+
+        for params in ({'date': '2025-02-30'}, {'status': 'x'}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_async_read_endpoints(self):
+        """Тест асинхронных представлений: тот же ответ, что у синхронного API"""
+        record = CashFlowRecord.objects.create(
+            created_date=date.today(),
+            status=self.status,
+            transaction_type=self.transaction_type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=Decimal('1000.00'),
+            comment='Тестовая запись'
+        )
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(reverse('async-record-list')).status_code, status.HTTP_403_FORBIDDEN)
+
+        # Токен (TokenAuthentication) принимается так же, как синхронным API
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(self.client.get(reverse('async-record-list')).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse('cashflowrecord-list')).status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}x')
+        self.assertEqual(self.client.get(reverse('async-record-list')).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials()
+        self.client.login(username='testuser', password='12345')
+
+        pairs = (
+            ('cashflowrecord-list', 'async-record-list', {}),
+            ('cashflowrecord-summary', 'async-record-summary', {}),
+            ('cashflowrecord-by-category', 'async-record-by-category', {}),
+            ('cashflowrecord-monthly-report', 'async-record-monthly-report', {}),
+            ('cashflowrecord-timeseries', 'async-record-timeseries', {'bucket': 'week'}),
+        )
+        for sync_name, async_name, params in pairs:
+            sync_response = self.client.get(reverse(sync_name), params, HTTP_ACCEPT='application/json')
+            async_response = self.client.get(reverse(async_name), params)
+            self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+            self.assertEqual(async_response.json(), sync_response.json())
+
+        response = self.client.get(reverse('async-record-detail', args=[record.pk]))
+        self.assertEqual(response.json()['comment'], 'Тестовая запись')
+        self.assertEqual(self.client.get(reverse('async-record-detail', args=[record.pk + 1])).status_code, 404)
+
+        etag = self.client.get(reverse('async-record-summary'))['ETag']
+        response = self.client.get(reverse('async-record-summary'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.assertEqual(self.client.get(reverse('async-record-list'), {'page': '5'}).status_code, 404)
+        for params in ({'search': 'запись'}, {'cursor': 'abc'}):
+            self.assertEqual(self.client.get(reverse('async-record-list'), params).status_code, 400)
+        self.assertEqual(self.client.get(reverse('async-record-timeseries'), {'bucket': 'x'}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('async-record-list')).status_code, 405)
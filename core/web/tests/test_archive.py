@@ -0,0 +1,145 @@
+from io import StringIO
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..archive import archive_records, reaches_archive, records_model
+from ..balance import verify_balances
+from ..models import (
+    TransactionType, Category, Subcategory, CashFlowRecord, ArchivedCashFlowRecord,
+    CashFlowRecordWithArchive, CashFlowArchiveBatch
+)
+from ..pagination import CountStrategyPaginator, RollupEstimateCount
+from ..rollup import verify_rollup
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        """Создаем записи за 2024 и 2025 годы"""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.transaction_type = TransactionType.objects.create(name="Пополнение")
+        self.category = Category.objects.create(transaction_type=self.transaction_type, name="Зарплата")
+        self.subcategory = Subcategory.objects.create(category=self.category, name="Аванс")
+        for created_date, amount, comment in (
+            (date(2024, 3, 1), '100.00', 'Старый аванс'),
+            (date(2024, 7, 1), '200.00', None),
+            (date(2025, 2, 1), '300.00', 'Новый аванс'),
+        ):
+            CashFlowRecord.objects.create(
+                created_date=created_date,
+                transaction_type=self.transaction_type,
+                category=self.category,
+                subcategory=self.subcategory,
+                amount=Decimal(amount),
+                comment=comment
+            )
+
+    def archive(self):
+        call_command('archive_records', before='2025-01-01', chunk_size=1, stdout=StringIO())
+
+    def list_count(self, params=None):
+        return self.client.get(reverse('cashflowrecord-list'), params or {}).data['count']
+
+    def test_archive_command(self):
+        """Перенос в архив с сохранением id; агрегаты и остатки не меняются"""
+        monthly_report = self.client.get(reverse('cashflowrecord-monthly-report')).data
+        old_ids = set(CashFlowRecord.objects.filter(created_date__year=2024).values_list('pk', flat=True))
+
+        self.archive()
+
+        self.assertEqual(CashFlowRecord.objects.count(), 1)
+        self.assertEqual(set(ArchivedCashFlowRecord.objects.values_list('pk', flat=True)), old_ids)
+        batch = CashFlowArchiveBatch.objects.get()
+        self.assertEqual((batch.cutoff, batch.records_count), (date(2025, 1, 1), 2))
+
+        self.assertEqual(self.client.get(reverse('cashflowrecord-monthly-report')).data, monthly_report)
+        self.assertEqual(verify_rollup(), [])
+        self.assertEqual(verify_balances(), [])
+
+        # Пересборка агрегатов учитывает архив
+        call_command('rebuild_rollup', stdout=StringIO())
+        self.assertEqual(self.client.get(reverse('cashflowrecord-monthly-report')).data, monthly_report)
+
+        # Повторный запуск ничего не переносит
+        self.archive()
+        self.assertEqual(CashFlowArchiveBatch.objects.count(), 1)
+
+    def test_archive_interrupted(self):
+        """Прерванная архивация: журнал и граница архива учитывают уже перенесенные пачки"""
+        def progress(moved):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            archive_records(date(2025, 1, 1), chunk_size=1, progress=progress)
+        batch = CashFlowArchiveBatch.objects.get()
+        self.assertEqual((batch.cutoff, batch.records_count), (date(2025, 1, 1), 1))
+        self.assertEqual(ArchivedCashFlowRecord.objects.count(), 1)
+        self.assertEqual(self.list_count({'date_from': '2024-01-01'}), 3)
+
+        self.assertEqual(archive_records(date(2025, 1, 1), chunk_size=1), 1)
+        self.assertEqual(list(CashFlowArchiveBatch.objects.values_list('records_count', flat=True)), [1, 1])
+
+    def test_upsert_archived(self):
+        """Синхронизация не изменяет и не дублирует записи, перенесенные в архив"""
+        CashFlowRecord.objects.filter(created_date=date(2024, 3, 1)).update(source='erp', external_id='A-1')
+        self.archive()
+        self.assertEqual(ArchivedCashFlowRecord.objects.get(external_id='A-1').source, 'erp')
+
+        # Список с архивом отдает внешний идентификатор архивной записи
+        response = self.client.get(reverse('cashflowrecord-list'), {'created_date': '2024-03-01'})
+        self.assertEqual(
+            [(item['source'], item['external_id']) for item in response.data['results']], [('erp', 'A-1')]
+        )
+
+        row = {
+            'created_date': '2024-03-01', 'transaction_type': self.transaction_type.pk,
+            'category': self.category.pk, 'subcategory': self.subcategory.pk,
+            'amount': '999.00', 'external_id': 'A-1'
+        }
+        response = self.client.post(reverse('cashflowrecord-bulk-upsert') + '?source=erp', [row], format='json')
+        self.assertEqual((response.data['archived'], response.data['inserted']), (1, 0))
+        self.assertEqual(CashFlowRecord.objects.count(), 1)
+
+    def test_list_reaches_archive(self):
+        """Список читает архив, только если фильтр по дате заходит в архивный период"""
+        self.archive()
+
+        self.assertEqual(self.list_count(), 1)
+        self.assertEqual(self.list_count({'date_from': '2025-01-15'}), 1)
+        self.assertEqual(self.list_count({'date_from': '2024-06-01'}), 2)
+        self.assertEqual(self.list_count({'date_to': '2025-12-31'}), 3)
+        self.assertEqual(self.list_count({'created_date': '2024-03-01'}), 1)
+        self.assertEqual(self.list_count({'date_to': '2025-12-31', 'search': 'аванс'}), 2)
+
+        response = self.client.get(reverse('cashflowrecord-export'), {'date_from': '2024-01-01'})
+        self.assertEqual(b''.join(response.streaming_content).decode().count('\n'), 4)
+
+        # HTML-список отмечает архивные записи
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('cash_flow:index'), {'date_to': '2024-12-31'})
+        self.assertContains(response, '>Архив<', count=2)
+
+    def test_records_model(self):
+        """Выбор модели списка по фильтру дат"""
+        self.assertFalse(reaches_archive({'date_from': '2020-01-01'}, None))
+        self.assertIs(records_model({'date_from': '2020-01-01'}), CashFlowRecord)
+
+        self.archive()
+        self.assertIs(records_model({}), CashFlowRecord)
+        self.assertIs(records_model({'date_from': 'bad'}), CashFlowRecord)
+        self.assertIs(records_model({'date_from': '2025-01-01'}), CashFlowRecord)
+        self.assertIs(records_model({'date_from': '2024-12-31'}), CashFlowRecordWithArchive)
+
+        # Оценка количества по агрегатам не учитывает архивные записи
+        paginator = CountStrategyPaginator(
+            CashFlowRecord.objects.all(), 50, params={}, count_strategy=RollupEstimateCount(threshold=0)
+        )
+        self.assertEqual((paginator.count, paginator.count_is_estimate), (1, True))
@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..balance import verify_balances
+from ..benchmarks import compare_reports
+from ..models import Subcategory, CashFlowRecord
+from ..rollup import verify_rollup
+
+
+class BenchmarkTests(TestCase):
+    def generate(self, records=300):
+        call_command(
+            'generate_cashflow_data', records=records, days=60, extra_categories=2,
+            subcategories=2, chunk_size=100, seed=1, stdout=StringIO()
+        )
+
+    def test_generate_cashflow_data(self):
+        """Генерация создает записи и согласованные агрегаты/остатки"""
+        self.generate()
+        self.assertEqual(CashFlowRecord.objects.count(), 300)
+        self.assertEqual(verify_rollup(), [])
+        self.assertEqual(verify_balances(), [])
+
+        # Повторный запуск не дублирует справочники
+        subcategories = Subcategory.objects.count()
+        self.generate(records=10)
+        self.assertEqual(Subcategory.objects.count(), subcategories)
+        self.assertEqual(CashFlowRecord.objects.count(), 310)
+
+        # --clear сразу пересобирает агрегаты: они согласованы, даже если генерация прервалась
+        with mock.patch(
+            'web.management.commands.generate_cashflow_data.generate_records', side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            call_command('generate_cashflow_data', records=10, clear=True, stdout=StringIO())
+        self.assertFalse(CashFlowRecord.objects.exists())
+        self.assertEqual(verify_rollup(), [])
+        self.assertEqual(verify_balances(), [])
+
+    def test_run_benchmarks(self):
+        """Отчет замеров содержит все сценарии, запись на замере откатывается"""
+        self.generate(records=50)
+        user = User.objects.create_user(username='bench', password='testpass123')
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command('run_benchmarks', user='bench', iterations=1, warmup=0, output=output)
+            with open(output, encoding='utf-8') as file:
+                report = json.load(file)
+
+            self.assertEqual(report['records'], 50)
+            self.assertEqual(CashFlowRecord.objects.count(), 50)
+            for result in report['results']:
+                self.assertIn(result['status'], (200, 201), result['name'])
+                self.assertGreater(result['queries'], 0)
+
+            # Базовый отчет с меньшим количеством запросов - регрессия
+            for result in report['results']:
+                result['queries'] -= 1
+
+            baseline = os.path.join(directory, 'baseline.json')
+            with open(baseline, 'w', encoding='utf-8') as file:
+                json.dump(report, file)
+            with self.assertRaises(CommandError):
+                call_command(
+                    'run_benchmarks', user=user.username, iterations=1, warmup=0, scenario=['summary'],
+                    baseline=baseline, fail_on_regression=True, stdout=StringIO(), stderr=StringIO()
+                )
+
+    def test_compare_reports(self):
+        """Регрессия по времени и по количеству запросов"""
+        baseline = {'results': [{'name': 'summary', 'median_ms': 10.0, 'queries': 3}]}
+        report = {'results': [{'name': 'summary', 'median_ms': 20.0, 'queries': 4}]}
+        self.assertEqual(len(compare_reports(report, baseline)), 2)
+        self.assertEqual(compare_reports(baseline, baseline), [])
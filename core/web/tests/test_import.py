@@ -0,0 +1,141 @@
+import json
+import os
+import re
+import tempfile
+from io import StringIO
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..bulk import insert_records
+from ..models import Status, TransactionType, Category, Subcategory, CashFlowRecord
+from ..rollup import verify_rollup
+
+STATEMENT = (
+    'Дата;Сумма;Назначение платежа;Статья;Подстатья\n'
+    '01.02.2025;-1 500,00;Оплата рекламы;Маркетинг;Avito\n'
+    '02.02.2025;25 000,50;Зарплата за январь;зарплата;  аванс\n'
+    '03.02.2025;abc;Ошибка суммы;Маркетинг;Avito\n'
+    '04.02.2025;-300,00;Неизвестная статья;Аренда;Офис\n'
+    '05.02.2025;-200,00;;Маркетинг;Avito\n'
+)
+
+MAPPING = {
+    'delimiter': ';',
+    'date_format': '%d.%m.%Y',
+    'decimal_comma': True,
+    'columns': {
+        'created_date': 'Дата',
+        'amount': 'Сумма',
+        'comment': 'Назначение платежа',
+        'category': 'Статья',
+        'subcategory': 'Подстатья',
+    },
+    'defaults': {'status': 'Бизнес'},
+    'sign_types': {'positive': 'Пополнение', 'negative': 'Списание'},
+}
+
+
+class ImportStatementTests(TestCase):
+    def setUp(self):
+        """Создаем справочники и файлы выписки и настройки"""
+        self.status = Status.objects.create(name="Бизнес")
+        expense = TransactionType.objects.create(name="Списание")
+        income = TransactionType.objects.create(name="Пополнение")
+        self.marketing = Category.objects.create(transaction_type=expense, name="Маркетинг")
+        self.avito = Subcategory.objects.create(category=self.marketing, name="Avito")
+        salary = Category.objects.create(transaction_type=income, name="Зарплата")
+        self.advance = Subcategory.objects.create(category=salary, name="Аванс")
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.statement = self.write('statement.csv', STATEMENT)
+        self.mapping = self.write('mapping.json', json.dumps(MAPPING, ensure_ascii=False))
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def run_import(self, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'import_statement', self.statement, mapping=self.mapping, stdout=stdout, stderr=stderr, **options
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import(self):
+        """Импорт с сопоставлением названий, знаком суммы и пропуском ошибочных строк"""
+        stdout, stderr = self.run_import(chunk_size=2)
+
+        self.assertEqual(CashFlowRecord.objects.count(), 3)
+        expense = CashFlowRecord.objects.get(comment='Оплата рекламы')
+        self.assertEqual(expense.created_date, date(2025, 2, 1))
+        self.assertEqual(expense.amount, Decimal('1500.00'))
+        self.assertEqual((expense.category, expense.subcategory, expense.status), (self.marketing, self.avito, self.status))
+        income = CashFlowRecord.objects.get(subcategory=self.advance)
+        self.assertEqual(income.amount, Decimal('25000.50'))
+        self.assertEqual(verify_rollup(), [])
+
+        self.assertIn('Строка 3', stderr)
+        self.assertIn('Категория «Аренда» не найдена', stderr)
+        self.assertIn('Записано записей: 3, строк с ошибками: 2, последняя строка: 5', stdout)
+
+    def test_non_finite_amounts(self):
+        """NaN и бесконечность в сумме - ошибка строки, а не падение импорта"""
+        self.statement = self.write('special.csv', (
+            'Дата;Сумма;Назначение платежа;Статья;Подстатья\n'
+            '01.02.2025;NaN;;Маркетинг;Avito\n'
+            '02.02.2025;-sNaN;;Маркетинг;Avito\n'
+            '03.02.2025;-Infinity;;Маркетинг;Avito\n'
+            '04.02.2025;-100,00;;Маркетинг;Avito\n'
+        ))
+        stdout, stderr = self.run_import()
+        self.assertEqual(stderr.count('Некорректная сумма'), 3)
+        self.assertIn('Записано записей: 1, строк с ошибками: 3', stdout)
+
+    def test_dry_run_and_resume(self):
+        """Проверка без записи и продолжение с заданной строки"""
+        stdout, _ = self.run_import(dry_run=True)
+        self.assertIn('Проверено записей: 3', stdout)
+        self.assertFalse(CashFlowRecord.objects.exists())
+
+        errors_file = os.path.join(self.directory.name, 'errors.csv')
+        self.run_import(resume_from=4, errors_file=errors_file)
+        self.assertEqual(list(CashFlowRecord.objects.values_list('amount', flat=True)), [Decimal('200.00')])
+        with open(errors_file, encoding='utf-8') as file:
+            self.assertEqual(len(file.readlines()), 2)
+
+    def test_interrupt_and_resume(self):
+        """Продолжение с выведенной строки после прерывания не дублирует записи"""
+        calls = []
+
+        def insert_once(records, **kwargs):
+            if calls:
+                raise KeyboardInterrupt
+            calls.append(len(records))
+            return insert_records(records, **kwargs)
+
+        stdout = StringIO()
+        with mock.patch('web.statement_import.insert_records', side_effect=insert_once), \
+                self.assertRaises(KeyboardInterrupt):
+            call_command('import_statement', self.statement, mapping=self.mapping, chunk_size=1, stdout=stdout)
+        resume_from = int(re.findall(r'--resume-from (\d+)', stdout.getvalue())[-1])
+        self.assertEqual(resume_from, 2)
+
+        self.run_import(resume_from=resume_from, chunk_size=1)
+        self.assertEqual(CashFlowRecord.objects.count(), 3)
+        self.assertEqual(CashFlowRecord.objects.filter(comment='Оплата рекламы').count(), 1)
+        self.assertEqual(verify_rollup(), [])
+
+    def test_invalid_mapping(self):
+        """Столбец из настройки отсутствует в файле"""
+        self.mapping = self.write('bad.json', json.dumps({'columns': {'amount': 'Amount'}}))
+        with self.assertRaises(CommandError):
+            self.run_import()
+        self.assertFalse(CashFlowRecord.objects.exists())
@@ -0,0 +1,123 @@
+import os
+import tempfile
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..index_advisor import QueryShapeCollector, explain, index_columns, query_shape, save_captured
+from ..models import CapturedQuery
+
+
+class IndexAdvisorTests(TestCase):
+    def generate(self, records=200):
+        call_command(
+            'generate_cashflow_data', records=records, days=60, extra_categories=2,
+            subcategories=2, chunk_size=100, seed=1, stdout=StringIO()
+        )
+
+    def test_index_columns(self):
+        """Равенство, затем сортировка; условия JOIN и первичный ключ (rowid) не входят в индекс"""
+        sql = (
+            'SELECT "web_cashflowrecord"."id", "web_cashflowrecord"."amount" FROM "web_cashflowrecord" '
+            'INNER JOIN "web_status" ON ("web_cashflowrecord"."status_id" = "web_status"."id") '
+            'WHERE ("web_cashflowrecord"."transaction_type_id" = %s AND "web_cashflowrecord"."category_id" IN (%s, %s)) '
+            'ORDER BY "web_cashflowrecord"."created_date" DESC, "web_cashflowrecord"."id" DESC LIMIT 20'
+        )
+        self.assertEqual(
+            index_columns(sql, 'web_cashflowrecord'),
+            (('transaction_type_id', 'category_id', 'created_date', 'amount', 'status_id'), True)
+        )
+        self.assertEqual(query_shape(sql.replace('IN (%s, %s)', 'IN (%s)')), query_shape(sql))
+
+    @override_settings(
+        CASHFLOW_QUERY_CAPTURE_ENABLED=True,
+        CASHFLOW_QUERY_CAPTURE_SAMPLE_RATE=1.0,
+        CASHFLOW_QUERY_CAPTURE_VIEWS=['CashFlowRecordListView']
+    )
+    def test_capture_middleware(self):
+        """Формы запросов выбранных представлений накапливаются, остальные не снимаются"""
+        self.generate(records=20)
+        self.client.force_login(User.objects.create_user(username='testuser', password='testpass123'))
+
+        self.client.get(reverse('cashflowrecord-summary'))
+        self.assertFalse(CapturedQuery.objects.exists())
+
+        self.client.get(reverse('cash_flow:index'))
+        shapes = CapturedQuery.objects.count()
+        self.assertGreater(shapes, 0)
+        self.assertEqual(set(CapturedQuery.objects.values_list('view_name', flat=True)), {'cash_flow:index'})
+
+        self.client.get(reverse('cash_flow:index'), {'page': 2})
+        self.assertEqual(CapturedQuery.objects.count(), shapes)
+        self.assertTrue(CapturedQuery.objects.filter(calls=2).exists())
+
+    @override_settings(
+        CASHFLOW_QUERY_CAPTURE_ENABLED=True,
+        CASHFLOW_QUERY_CAPTURE_SAMPLE_RATE=1.0,
+        CASHFLOW_QUERY_CAPTURE_VIEWS=['record_list']
+    )
+    async def test_capture_middleware_async(self):
+        """Асинхронное представление: снимаются запросы ORM из потока sync_to_async"""
+        user = await User.objects.acreate(username='testuser')
+        await sync_to_async(self.async_client.force_login)(user)
+        response = await self.async_client.get(reverse('async-record-list'))
+        self.assertEqual(response.status_code, 200)
+        view_names = {name async for name in CapturedQuery.objects.values_list('view_name', flat=True)}
+        self.assertEqual(view_names, {'async-record-list'})
+
+    def test_capture_in_lists(self):
+        """Списки IN разной длины - одна форма; сохраненные текст и параметры согласованы"""
+        sql = 'SELECT "web_cashflowrecord"."id" FROM "web_cashflowrecord" WHERE "web_cashflowrecord"."status_id" IN ({})'
+        for params in ([1], [1, 2, 3], [1, 2]):
+            collector = QueryShapeCollector('cashflowrecord-list')
+            collector.add(sql.format(', '.join(['%s'] * len(params))), params, 1.0)
+            save_captured(collector)
+
+        shape = CapturedQuery.objects.get()
+        self.assertEqual(shape.calls, 3)
+        self.assertEqual(shape.params, [1, 2])
+        self.assertEqual(shape.sql.count('%s'), len(shape.params))
+        self.assertTrue(explain(shape.sql, shape.params))
+
+    def test_advise_indexes_replay(self):
+        """Прогон сценариев: сортировка во временном B-дереве, замер и миграция для индекса"""
+        self.generate()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, '0099_advised.py')
+            output = StringIO()
+            call_command(
+                'advise_indexes', replay=True, scenario=['records_list_filtered'], min_rows=1,
+                measure=True, migration=True, migration_path=path, stdout=output
+            )
+            with open(path, encoding='utf-8') as file:
+                migration = file.read()
+
+        output = output.getvalue()
+        self.assertIn('USE TEMP B-TREE FOR ORDER BY', output)
+        self.assertIn("models.Index(fields=['transaction_type', 'created_date'])", output)
+        self.assertIn('индекс используется', output)
+        self.assertIn("model_name='cashflowrecord'", migration)
+        self.assertIn("fields=['transaction_type', 'created_date']", migration)
+
+    def test_advise_indexes_captured(self):
+        """Без снятых форм - ошибка; снятые формы за окно анализируются и очищаются с --clear"""
+        with self.assertRaises(CommandError):
+            call_command('advise_indexes', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('advise_indexes', window='1y', stdout=StringIO())
+
+        CapturedQuery.objects.create(
+            fingerprint='x', view_name='cashflowrecord-list', calls=3, total_ms=30,
+            sql='SELECT "web_cashflowrecord"."id" FROM "web_cashflowrecord" '
+                'WHERE "web_cashflowrecord"."amount" > %s',
+            params=['100.00']
+        )
+        output = StringIO()
+        call_command('advise_indexes', window='1h', clear=True, stdout=output)
+        self.assertIn('Форм запросов: 1', output.getvalue())
+        self.assertFalse(CapturedQuery.objects.exists())
@@ -0,0 +1,112 @@
+from io import StringIO
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..balance import verify_balances
+from ..merge import MergeError, merge_dictionary
+from ..models import (
+    Status, TransactionType, Category, Subcategory, CashFlowRecord, ArchivedCashFlowRecord, CashFlowDailyRollup
+)
+from ..rollup import verify_rollup
+
+
+class MergeTests(TestCase):
+    def setUp(self):
+        """Создаем две категории с одноименной и уникальной подкатегориями"""
+        self.status = Status.objects.create(name="Бизнес")
+        self.income = TransactionType.objects.create(name="Пополнение")
+        self.expense = TransactionType.objects.create(name="Списание")
+        self.category = Category.objects.create(transaction_type=self.income, name="Зарплата")
+        self.duplicate = Category.objects.create(transaction_type=self.expense, name="Зарплата (дубль)")
+        self.advance = Subcategory.objects.create(category=self.category, name="Аванс")
+        self.duplicate_advance = Subcategory.objects.create(category=self.duplicate, name="Аванс")
+        self.bonus = Subcategory.objects.create(category=self.duplicate, name="Премия")
+
+        for created_date, subcategory, amount in (
+            (date(2024, 5, 1), self.duplicate_advance, '100.00'),
+            (date(2025, 1, 10), self.duplicate_advance, '200.00'),
+            (date(2025, 1, 10), self.bonus, '300.00'),
+            (date(2025, 1, 10), self.advance, '50.00'),
+        ):
+            CashFlowRecord.objects.create(
+                created_date=created_date,
+                status=self.status,
+                transaction_type=subcategory.category.transaction_type,
+                category=subcategory.category,
+                subcategory=subcategory,
+                amount=Decimal(amount)
+            )
+        call_command('archive_records', before='2025-01-01', stdout=StringIO())
+
+    def test_merge_categories(self):
+        """Записи и архив переводятся на категорию, подкатегории переносятся или объединяются"""
+        result = merge_dictionary(self.duplicate, self.category, chunk_size=1)
+
+        self.assertEqual(result, {'records': 2, 'archived_records': 1, 'moved': 1, 'merged': 1})
+        self.assertFalse(Category.objects.filter(pk=self.duplicate.pk).exists())
+        self.assertFalse(Subcategory.objects.filter(pk=self.duplicate_advance.pk).exists())
+        self.bonus.refresh_from_db()
+        self.assertEqual(self.bonus.category, self.category)
+
+        # Тип операции приведен к типу категории
+        self.assertEqual(
+            set(CashFlowRecord.objects.values_list('transaction_type', 'category')),
+            {(self.income.pk, self.category.pk)}
+        )
+        archived = ArchivedCashFlowRecord.objects.get()
+        self.assertEqual((archived.category_id, archived.subcategory_id), (self.category.pk, self.advance.pk))
+
+        self.assertEqual(CashFlowRecord.objects.filter(subcategory=self.advance).count(), 2)
+        self.assertEqual(verify_rollup(), [])
+        self.assertEqual(verify_balances(), [])
+        self.assertFalse(CashFlowDailyRollup.objects.filter(transaction_type=self.expense).exists())
+
+    def test_merge_errors(self):
+        """Нельзя объединить справочник с собой или со справочником другого вида"""
+        with self.assertRaises(MergeError):
+            merge_dictionary(self.category, self.category)
+        with self.assertRaises(MergeError):
+            merge_dictionary(self.advance, self.category)
+
+    def test_merge_api(self):
+        """Действие merge API для статуса"""
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='testuser', password='12345'))
+        other = Status.objects.create(name="Личное")
+
+        url = reverse('status-merge', args=[self.status.pk])
+        response = client.post(url, {'target': 0}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = client.post(url, {'target': other.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['records'], response.data['archived_records']), (3, 1))
+        self.assertEqual(set(CashFlowRecord.objects.values_list('status', flat=True)), {other.pk})
+        self.assertEqual(verify_balances(), [])
+
+    def test_merge_admin_action(self):
+        """Действие админки: страница выбора основного элемента, затем объединение"""
+        User.objects.create_superuser(username='admin', password='12345')
+        self.client.login(username='admin', password='12345')
+        url = reverse('admin:web_subcategory_changelist')
+        data = {
+            'action': 'merge_selected',
+            helpers.ACTION_CHECKBOX_NAME: [self.advance.pk, self.bonus.pk],
+        }
+
+        response = self.client.post(url, data)
+        self.assertContains(response, 'name="target"', count=2)
+        self.assertTrue(Subcategory.objects.filter(pk=self.bonus.pk).exists())
+
+        response = self.client.post(url, dict(data, target=self.advance.pk))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Subcategory.objects.filter(pk=self.bonus.pk).exists())
+        self.assertEqual(CashFlowRecord.objects.filter(subcategory=self.advance).count(), 2)
+        self.assertEqual(verify_rollup(), [])
@@ -0,0 +1,95 @@
+from datetime import date
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import REGISTRY, Histogram, MetricsRegistry
+from ..models import TransactionType, Category, Subcategory, CashFlowRecord
+
+
+@override_settings(CASHFLOW_METRICS_ENABLED=True, CASHFLOW_METRICS_TOKEN='secret')
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        """Создаем тестовые данные"""
+        REGISTRY.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
+
+        transaction_type = TransactionType.objects.create(name="Списание")
+        category = Category.objects.create(transaction_type=transaction_type, name="Маркетинг")
+        subcategory = Subcategory.objects.create(category=category, name="Avito")
+        CashFlowRecord.objects.create(
+            created_date=date(2025, 1, 1),
+            transaction_type=transaction_type,
+            category=category,
+            subcategory=subcategory,
+            amount=Decimal('100.00')
+        )
+
+    def server_timing(self, response):
+        return dict(
+            part.split(';', 1)[0:2] for part in response['Server-Timing'].split(', ')
+        )
+
+    def test_server_timing_header(self):
+        """Заголовок Server-Timing с SQL, представлением и рендерингом"""
+        response = self.client.get(reverse('cash_flow:index'))
+        self.assertEqual(response.status_code, 200)
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'sql', 'view', 'render', 'total'})
+        self.assertNotIn('desc="0 queries"', timing['sql'])
+
+        response = self.client.get(reverse('cashflowrecord-summary'))
+        self.assertIn('Server-Timing', response)
+
+    async def test_server_timing_async(self):
+        """Асинхронное представление: замер без перевода цепочки в поток, SQL из sync_to_async учтен"""
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(reverse('async-record-summary'))
+        self.assertEqual(response.status_code, 200)
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'sql', 'view', 'render', 'total'})
+        self.assertNotIn('desc="0 queries"', timing['sql'])
+
+    def test_metrics_endpoint(self):
+        """Гистограммы по имени URL в формате Prometheus"""
+        self.client.get(reverse('cash_flow:index'))
+        self.client.get(reverse('cashflowrecord-summary'))
+
+        # Обычному пользователю метрики недоступны, по токену - доступны
+        response = self.client.get(reverse('cash_flow:metrics'))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('cash_flow:metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+        text = response.content.decode()
+        self.assertIn(
+            'cashflow_http_requests_total{view="cash_flow:index",method="GET",status="200"} 1', text
+        )
+        self.assertIn(
+            'cashflow_http_request_duration_seconds_count{view="cashflowrecord-summary",method="GET"} 1', text
+        )
+        self.assertIn('cashflow_http_request_queries_bucket{view="cash_flow:index",le="+Inf"} 1', text)
+
+    @override_settings(CASHFLOW_METRICS_ENABLED=False)
+    def test_disabled(self):
+        """Выключенный замер: нет заголовка и эндпоинта"""
+        response = self.client.get(reverse('cash_flow:index'))
+        self.assertNotIn('Server-Timing', response)
+        response = self.client.get(reverse('cash_flow:metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 404)
+
+    def test_histogram(self):
+        """Накопленные корзины гистограммы и экранирование меток"""
+        histogram = Histogram((1, 5))
+        for value in (0.5, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.samples()), [('1', 1), ('5', 2), ('+Inf', 3)])
+
+        registry = MetricsRegistry()
+        registry.observe('a"b', 'GET', 200, 0.1, 0.05, 2)
+        self.assertIn('view="a\\"b"', registry.render())
@@ -5,6 +5,8 @@ from datetime import date, datetime
 from decimal import Decimal
 
 from ..models import Status, TransactionType, Category, Subcategory, CashFlowRecord
+from ..taxonomy import check_hierarchy, taxonomy_index
+from ..versions import TAXONOMY, bump_version
 
 
 class ModelTests(TestCase):
@@ -150,4 +152,57 @@ class ModelTests(TestCase):
         )
 
         self.assertIn("01.01.2025", str(record))
-        self.assertIn("1000.00", str(record))
\ No newline at end of file
+        self.assertIn("1000.00", str(record))
+
+    def test_hierarchy_check_queries(self):
+        """Проверка согласованности в clean() по индексу справочников: только сверка версии"""
+        record = CashFlowRecord(
+            created_date=date.today(),
+            status=self.status,
+            transaction_type=self.transaction_type_income,
+            category=self.category_expense,
+            subcategory=self.subcategory_income,
+            amount=Decimal('100.00')
+        )
+        taxonomy_index()
+
+        # Один запрос сверки версии справочников, без перезагрузки индекса
+        with self.assertNumQueries(1):
+            with self.assertRaises(ValidationError) as context:
+                record.clean()
+        self.assertEqual(set(context.exception.error_dict), {'category', 'subcategory'})
+
+        record.category = self.category_income
+        with self.assertNumQueries(1):
+            record.clean()
+
+    def test_hierarchy_index_invalidation(self):
+        """Индекс сбрасывается при изменении справочника и подхватывает изменения другого процесса"""
+        taxonomy_index()
+        self.subcategory_income.category = self.category_expense
+        self.subcategory_income.save()
+        self.assertEqual(check_hierarchy(None, self.category_expense.pk, self.subcategory_income.pk), {})
+
+        # Изменение без сигналов (как в другом процессе): индекс сверяет версию при проверке
+        Category.objects.filter(pk=self.category_income.pk).update(transaction_type=self.transaction_type_expense)
+        bump_version(TAXONOMY)
+        self.assertEqual(check_hierarchy(self.transaction_type_expense.pk, self.category_income.pk), {})
+        self.assertIn('category', check_hierarchy(self.transaction_type_income.pk, self.category_income.pk))
+
+        # Запись, согласованная по старому индексу, не принимается,
+        # хотя интервал сверки версии еще не истек
+        subcategory = Subcategory.objects.create(category=self.category_income, name="Аренда")
+        record = CashFlowRecord(
+            created_date=date.today(),
+            transaction_type=self.transaction_type_expense,
+            category=self.category_income,
+            subcategory=subcategory,
+            amount=Decimal('100.00')
+        )
+        with self.settings(CASHFLOW_TAXONOMY_CHECK_INTERVAL=3600):
+            record.clean()
+            Category.objects.filter(pk=self.category_income.pk).update(transaction_type=self.transaction_type_income)
+            bump_version(TAXONOMY)
+            with self.assertRaises(ValidationError) as context:
+                record.clean()
+        self.assertEqual(set(context.exception.error_dict), {'category'})
@@ -0,0 +1,84 @@
+import marshal
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import RequestProfile
+from ..profiling import make_profile_token
+
+
+@override_settings(CASHFLOW_PROFILING_ENABLED=True)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        """Создаем сотрудника и обычного пользователя"""
+        self.staff = User.objects.create_superuser(username='admin', password='testpass123')
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
+
+    def test_token_trigger(self):
+        """Профиль по токену сотрудника (заголовок и параметр), чужой токен игнорируется"""
+        token = make_profile_token(self.staff)
+        response = self.client.get(reverse('cash_flow:index'), HTTP_X_PROFILE_TOKEN=token)
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profile.pk))
+        self.assertEqual(profile.trigger, RequestProfile.TRIGGER_TOKEN)
+        self.assertEqual(profile.view_name, 'cash_flow:index')
+        self.assertEqual(profile.user, self.staff)
+        self.assertEqual(profile.status_code, 200)
+        self.assertIn('function calls', profile.stats)
+        self.assertTrue(marshal.loads(bytes(profile.profile_data)))
+
+        self.client.get(reverse('cashflowrecord-summary'), {'_profile': token, 'date_from': '2025-01-01'})
+        self.assertEqual(RequestProfile.objects.count(), 2)
+        # Токен в параметрах не сохраняется в профиле (его видят все сотрудники в админке)
+        self.assertEqual(
+            RequestProfile.objects.latest('pk').path, reverse('cashflowrecord-summary') + '?date_from=2025-01-01'
+        )
+
+        # Неверный токен и токен не сотрудника
+        self.client.get(reverse('cash_flow:index'), HTTP_X_PROFILE_TOKEN=token + 'x')
+        self.client.get(reverse('cash_flow:index'), HTTP_X_PROFILE_TOKEN=make_profile_token(self.user))
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+    @override_settings(
+        CASHFLOW_PROFILING_SAMPLE_RATE=1.0,
+        CASHFLOW_PROFILING_VIEWS=['CashFlowRecordListView', 'CashFlowRecordViewSet.monthly_report'],
+        CASHFLOW_PROFILING_MAX_PROFILES=2
+    )
+    def test_sampling(self):
+        """Выборочное профилирование только выбранных представлений, хранится не больше лимита"""
+        self.client.get(reverse('cashflowrecord-summary'))
+        self.assertFalse(RequestProfile.objects.exists())
+
+        self.client.get(reverse('cashflowrecord-monthly-report'))
+        self.client.get(reverse('cash_flow:index'))
+        self.client.get(reverse('cash_flow:index'))
+        self.assertEqual(RequestProfile.objects.count(), 2)
+        self.assertEqual(
+            set(RequestProfile.objects.values_list('trigger', flat=True)), {RequestProfile.TRIGGER_SAMPLE}
+        )
+
+    def test_admin(self):
+        """Список профилей с токеном и скачивание файла pstats"""
+        self.client.force_login(self.staff)
+        self.client.get(reverse('cash_flow:index'), HTTP_X_PROFILE_TOKEN=make_profile_token(self.staff))
+        profile = RequestProfile.objects.get()
+
+        response = self.client.get(reverse('admin:web_requestprofile_changelist'))
+        self.assertContains(response, 'Токен профилирования')
+
+        response = self.client.get(reverse('admin:web_requestprofile_change', args=[profile.pk]))
+        self.assertContains(response, 'function calls')
+
+        response = self.client.get(reverse('admin:web_requestprofile_download', args=[profile.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, bytes(profile.profile_data))
+
+    @override_settings(CASHFLOW_PROFILING_ENABLED=False)
+    def test_disabled(self):
+        """Выключенное профилирование игнорирует токен"""
+        self.client.get(reverse('cash_flow:index'), HTTP_X_PROFILE_TOKEN=make_profile_token(self.staff))
+        self.assertFalse(RequestProfile.objects.exists())
@@ -0,0 +1,176 @@
+from io import StringIO
+from datetime import date
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..balance import balance_on, balance_curve, verify_balances
+from ..models import (
+    Status, TransactionType, Category, Subcategory, CashFlowRecord, CashFlowDailyRollup, CashFlowDailyBalance
+)
+from ..rollup import verify_rollup
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        """Создаем тестовые данные"""
+        self.status = Status.objects.create(name="Бизнес")
+        self.transaction_type = TransactionType.objects.create(name="Пополнение")
+        self.category = Category.objects.create(
+            transaction_type=self.transaction_type,
+            name="Зарплата"
+        )
+        self.subcategory = Subcategory.objects.create(
+            category=self.category,
+            name="Аванс"
+        )
+
+    def create_record(self, amount, created_date=date(2025, 1, 1), status=None):
+        return CashFlowRecord.objects.create(
+            created_date=created_date,
+            status=status,
+            transaction_type=self.transaction_type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=Decimal(amount)
+        )
+
+    def test_rollup_on_create(self):
+        """Тест пополнения агрегата при создании записей"""
+        self.create_record('100.00', status=self.status)
+        self.create_record('50.00', status=self.status)
+
+        rollup = CashFlowDailyRollup.objects.get()
+        self.assertEqual(rollup.day, date(2025, 1, 1))
+        self.assertEqual(rollup.amount, Decimal('150.00'))
+        self.assertEqual(rollup.records_count, 2)
+
+    def test_rollup_on_update_moves_between_keys(self):
+        """Тест переноса суммы между днями при изменении даты записи"""
+        record = self.create_record('100.00')
+        record.created_date = date(2025, 2, 1)
+        record.amount = Decimal('70.00')
+        record.save()
+
+        rollup = CashFlowDailyRollup.objects.get()
+        self.assertEqual(rollup.day, date(2025, 2, 1))
+        self.assertEqual(rollup.amount, Decimal('70.00'))
+        self.assertEqual(rollup.records_count, 1)
+        self.assertEqual(verify_rollup(), [])
+
+    def test_rollup_on_delete(self):
+        """Тест вычитания записи из агрегата при удалении (в т.ч. через queryset)"""
+        first = self.create_record('100.00')
+        self.create_record('30.00')
+
+        first.delete()
+        self.assertEqual(CashFlowDailyRollup.objects.get().amount, Decimal('30.00'))
+
+        CashFlowRecord.objects.all().delete()
+        self.assertFalse(CashFlowDailyRollup.objects.exists())
+
+    def test_rebuild_command(self):
+        """Тест команды пересборки и сверки агрегатов"""
+        self.create_record('100.00', status=self.status)
+        self.create_record('200.00', created_date=date(2025, 1, 2))
+        CashFlowDailyRollup.objects.all().delete()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollup', '--verify-only', stdout=StringIO(), stderr=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_rollup', stdout=out)
+        self.assertIn('Пересобрано строк агрегата: 2', out.getvalue())
+        self.assertEqual(verify_rollup(), [])
+
+
+class BalanceTests(TestCase):
+    def setUp(self):
+        """Создаем справочники пополнений и списаний"""
+        self.status = Status.objects.create(name="Бизнес")
+        self.income = TransactionType.objects.create(name="Пополнение")
+        self.expense = TransactionType.objects.create(name="Списание")
+        self.income_category = Category.objects.create(transaction_type=self.income, name="Зарплата")
+        self.expense_category = Category.objects.create(transaction_type=self.expense, name="Маркетинг")
+        self.income_subcategory = Subcategory.objects.create(category=self.income_category, name="Аванс")
+        self.expense_subcategory = Subcategory.objects.create(category=self.expense_category, name="Avito")
+
+    def create_record(self, amount, created_date, expense=False, status=None):
+        return CashFlowRecord.objects.create(
+            created_date=created_date,
+            status=status,
+            transaction_type=self.expense if expense else self.income,
+            category=self.expense_category if expense else self.income_category,
+            subcategory=self.expense_subcategory if expense else self.income_subcategory,
+            amount=Decimal(amount)
+        )
+
+    def test_balance_follows_back_dated_changes(self):
+        """Тест остатков при вставке, изменении и удалении записей задним числом"""
+        self.create_record('1000.00', date(2025, 1, 10))
+        self.create_record('300.00', date(2025, 1, 20), expense=True, status=self.status)
+        self.assertEqual(balance_on(date(2025, 1, 15)), Decimal('1000.00'))
+        self.assertEqual(balance_on(date(2025, 2, 1)), Decimal('700.00'))
+        self.assertEqual(balance_on(date(2025, 1, 1)), Decimal('0'))
+
+        # Вставка задним числом сдвигает остатки всех последующих дней
+        back_dated = self.create_record('50.00', date(2025, 1, 5), expense=True)
+        self.assertEqual(balance_on(date(2025, 1, 5)), Decimal('-50.00'))
+        self.assertEqual(balance_on(date(2025, 2, 1)), Decimal('650.00'))
+
+        back_dated.created_date = date(2025, 1, 25)
+        back_dated.status = self.status
+        back_dated.save()
+        self.assertEqual(balance_on(date(2025, 1, 5)), Decimal('0'))
+        self.assertEqual(balance_on(date(2025, 1, 20)), Decimal('700.00'))
+        self.assertEqual(balance_on(date(2025, 2, 1), status_id=self.status.id, is_total=False), Decimal('-350.00'))
+        self.assertEqual(balance_on(date(2025, 2, 1), status_id=None, is_total=False), Decimal('1000.00'))
+
+        back_dated.delete()
+        self.assertEqual(balance_on(date(2025, 2, 1)), Decimal('700.00'))
+        self.assertFalse(CashFlowDailyBalance.objects.filter(day=date(2025, 1, 25)).exists())
+
+        self.assertEqual(
+            balance_curve([date(2025, 1, 1), date(2025, 1, 15), date(2025, 2, 1)], date(2025, 2, 10)),
+            [Decimal('1000.00'), Decimal('700.00'), Decimal('700.00')]
+        )
+        self.assertEqual(verify_balances(), [])
+
+    def test_rebuild_balances(self):
+        """Тест пересборки остатков командой rebuild_rollup"""
+        self.create_record('1000.00', date(2025, 1, 10))
+        self.create_record('300.00', date(2025, 1, 20), expense=True)
+        CashFlowDailyBalance.objects.update(balance=0)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollup', '--verify-only', stdout=StringIO(), stderr=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_rollup', stdout=out)
+        self.assertIn('Пересобрано строк остатков: 4', out.getvalue())
+        self.assertEqual(verify_balances(), [])
+        self.assertEqual(balance_on(date(2025, 1, 31)), Decimal('700.00'))
+
+    def test_balance_follows_type_rename(self):
+        """Тест пересборки остатков при переименовании типа и знаков из снимка без запроса типов"""
+        self.create_record('1000.00', date(2025, 1, 10))
+        self.create_record('300.00', date(2025, 1, 20), expense=True)
+
+        self.expense.name = 'Перевод'
+        self.expense.save()
+        self.assertEqual(balance_on(date(2025, 1, 31)), Decimal('1000.00'))
+        self.assertEqual(verify_balances(), [])
+
+        self.expense.name = 'Списание'
+        self.expense.save()
+        self.assertEqual(balance_on(date(2025, 1, 31)), Decimal('700.00'))
+        self.assertEqual(verify_balances(), [])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.create_record('50.00', date(2025, 1, 25), expense=True)
+        self.assertFalse([query for query in queries if 'web_transactiontype' in query['sql']])
+        self.assertEqual(balance_on(date(2025, 1, 31)), Decimal('650.00'))
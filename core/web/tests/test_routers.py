@@ -0,0 +1,93 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+
+from .. import routers
+from ..models import TransactionType, Category, Subcategory, CashFlowRecord
+from ..routers import PRIMARY_COOKIE, ReplicaRouter, replica_lag, replica_view, use_replica, release_replica
+
+
+class ReplicaRouterTests(TestCase):
+    @override_settings(CASHFLOW_READ_REPLICA='replica')
+    def test_router(self):
+        """Чтения моделей приложения - на реплику только в помеченном запросе, запись - в основную"""
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(CashFlowRecord))
+
+        token = use_replica()
+        try:
+            self.assertEqual(router.db_for_read(CashFlowRecord), 'replica')
+            self.assertIsNone(router.db_for_read(User))
+            self.assertEqual(router.db_for_write(CashFlowRecord), 'default')
+        finally:
+            release_replica(token)
+        self.assertIsNone(router.db_for_read(CashFlowRecord))
+
+        self.assertFalse(router.allow_migrate('replica', 'web'))
+        self.assertTrue(router.allow_migrate('default', 'web'))
+
+    def test_replica_view(self):
+        """Реплика - для аналитики, выгрузки и HTML-списка, но не для списка API"""
+        def view(name, method='GET'):
+            return replica_view(resolve(reverse(name)).func, method)
+
+        self.assertTrue(view('cashflowrecord-summary'))
+        self.assertTrue(view('cashflowrecord-export'))
+        self.assertTrue(view('cash_flow:index'))
+        self.assertFalse(view('cashflowrecord-list'))
+        self.assertFalse(view('cashflowrecord-list', 'POST'))
+        self.assertFalse(view('cash_flow:dictionary_manage'))
+
+
+# Реплика - та же база (алиас default): проверяется выбор запросов, а не данные
+@override_settings(CASHFLOW_READ_REPLICA='default', CASHFLOW_REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingMiddlewareTests(TestCase):
+    def setUp(self):
+        """Создаем тестовые данные"""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
+        self.transaction_type = TransactionType.objects.create(name="Списание")
+        self.category = Category.objects.create(transaction_type=self.transaction_type, name="Маркетинг")
+        self.subcategory = Subcategory.objects.create(category=self.category, name="Avito")
+        # Результат проверки отставания не переносится между тестами
+        routers._freshness['checked'] = None
+
+    @mock.patch('web.middleware.use_replica', wraps=use_replica)
+    def test_routing(self, use_replica_mock):
+        """Аналитика читает с реплики, после записи клиент читает из основной базы"""
+        self.assertEqual(replica_lag(), 0)
+
+        self.client.get(reverse('cashflowrecord-list'))
+        self.assertEqual(use_replica_mock.call_count, 0)
+        self.client.get(reverse('cashflowrecord-summary'))
+        self.assertEqual(use_replica_mock.call_count, 1)
+
+        response = self.client.post(reverse('cashflowrecord-list'), {
+            'created_date': date(2025, 1, 1).isoformat(),
+            'transaction_type': self.transaction_type.pk,
+            'category': self.category.pk,
+            'subcategory': self.subcategory.pk,
+            'amount': '100.00',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.cookies[PRIMARY_COOKIE]['max-age'], 10)
+
+        self.client.get(reverse('cashflowrecord-summary'))
+        self.assertEqual(use_replica_mock.call_count, 1)
+
+        del self.client.cookies[PRIMARY_COOKIE]
+        self.client.get(reverse('cash_flow:index'))
+        self.assertEqual(use_replica_mock.call_count, 2)
+
+    @mock.patch('web.routers.replica_lag', return_value=float('inf'))
+    @mock.patch('web.middleware.use_replica', wraps=use_replica)
+    def test_stale_replica(self, use_replica_mock, replica_lag_mock):
+        """Отстающая реплика не используется"""
+        with override_settings(CASHFLOW_REPLICA_CHECK_INTERVAL=0):
+            response = self.client.get(reverse('cashflowrecord-summary'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica_lag_mock.called)
+        self.assertFalse(use_replica_mock.called)
@@ -0,0 +1,114 @@
+from io import StringIO
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..models import TransactionType, Category, Subcategory, CashFlowRecord
+from ..search import fts_available, search_records
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        """Создаем тестовые данные"""
+        self.transaction_type = TransactionType.objects.create(name="Списание")
+        self.category = Category.objects.create(
+            transaction_type=self.transaction_type,
+            name="Маркетинг"
+        )
+        self.subcategory = Subcategory.objects.create(
+            category=self.category,
+            name="Avito"
+        )
+
+    def create_record(self, comment, amount='100.00'):
+        return CashFlowRecord.objects.create(
+            created_date=date(2025, 1, 1),
+            transaction_type=self.transaction_type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=Decimal(amount),
+            comment=comment
+        )
+
+    def search(self, text):
+        queryset, ranked = search_records(CashFlowRecord.objects.all(), text)
+        return set(queryset.values_list('comment', flat=True))
+
+    def test_index_follows_record_changes(self):
+        """Тест синхронизации индекса при создании, изменении, удалении и bulk_create"""
+        self.assertTrue(fts_available())
+        record = self.create_record('Оплата рекламы')
+        self.assertEqual(self.search('реклам'), {'Оплата рекламы'})
+
+        record.comment = 'Оплата хостинга'
+        record.save()
+        self.assertEqual(self.search('реклам'), set())
+        self.assertEqual(self.search('хост'), {'Оплата хостинга'})
+
+        CashFlowRecord.objects.bulk_create([CashFlowRecord(
+            created_date=date(2025, 1, 2),
+            transaction_type=self.transaction_type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=Decimal('10.00'),
+            comment='Баннер'
+        )])
+        self.assertEqual(self.search('банн'), {'Баннер'})
+
+        self.category.name = 'Продвижение'
+        self.category.save()
+        self.assertEqual(self.search('продвиж'), {'Оплата хостинга', 'Баннер'})
+
+        record.delete()
+        self.assertEqual(self.search('хостинга'), set())
+
+    def test_search_terms(self):
+        """Тест поиска: все слова обязательны, регистр и знаки препинания не важны"""
+        self.create_record('Оплата рекламы')
+        self.create_record('Оплата хостинга')
+        self.assertEqual(self.search('ОПЛАТА, рекл'), {'Оплата рекламы'})
+        self.assertEqual(self.search('avi опл'), {'Оплата рекламы', 'Оплата хостинга'})
+        self.assertEqual(self.search('"*'), {'Оплата рекламы', 'Оплата хостинга'})
+
+    def test_fallback_without_fts(self):
+        """Тест поиска icontains, если индекс FTS5 недоступен"""
+        self.create_record('Оплата рекламы')
+        with mock.patch('web.search.fts_available', return_value=False):
+            queryset, ranked = search_records(CashFlowRecord.objects.all(), 'рекл Avito')
+            self.assertFalse(ranked)
+            self.assertEqual(queryset.count(), 1)
+
+    def test_rebuild_command(self):
+        """Тест команды пересборки индекса"""
+        self.create_record('Оплата рекламы')
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Проиндексировано записей: 1', out.getvalue())
+        self.assertEqual(self.search('реклам'), {'Оплата рекламы'})
+
+    def test_api_and_list_search(self):
+        """Тест поиска в API (с сортировкой по релевантности) и в HTML-списке"""
+        self.create_record('Реклама в соцсетях')
+        self.create_record('Реклама реклама реклама')
+        self.create_record('Хостинг')
+        user = User.objects.create_user(username='testuser', password='12345')
+
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.get(reverse('cashflowrecord-list'), {'search': 'реклам'})
+        self.assertEqual(response.status_code, 200)
+        comments = [item['comment'] for item in response.data['results']]
+        self.assertEqual(comments, ['Реклама реклама реклама', 'Реклама в соцсетях'])
+
+        response = client.get(reverse('cashflowrecord-list'), {'search': 'реклам', 'ordering': 'amount'})
+        self.assertEqual(response.data['count'], 2)
+
+        self.client.login(username='testuser', password='12345')
+        response = self.client.get(reverse('cash_flow:index'), {'q': 'хост'})
+        self.assertEqual([record.comment for record in response.context['records']], ['Хостинг'])
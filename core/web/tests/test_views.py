@@ -1,10 +1,13 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
 from django.urls import reverse
 from django.contrib.auth.models import User
 from datetime import date, timedelta
 from decimal import Decimal
 
 from ..models import Status, TransactionType, Category, Subcategory, CashFlowRecord
+from ..pagination import CachedCount, CountStrategyPaginator
 
 
 class ViewTests(TestCase):
@@ -165,4 +168,174 @@ class ViewTests(TestCase):
         self.assertJSONEqual(
             str(response.content, encoding='utf8'),
             expected_data
-        )
\ No newline at end of file
+        )
+
+    def test_index_view_cursor_mode(self):
+        """Тест главной страницы в курсорном режиме пагинации"""
+        response = self.client.get(reverse('cash_flow:index'), {'cursor': '', 'ordering': 'amount'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['keyset_mode'])
+        records = list(response.context['records'])
+        self.assertEqual(records, [self.old_record, self.record])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_ajax_taxonomy_snapshot(self):
+        """Тест снимка справочников: дерево, ETag, 304 и смена версии"""
+        url = reverse('cash_flow:ajax_taxonomy')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        category = data['transaction_types'][0]['categories'][0]
+        self.assertEqual(category['id'], self.category.id)
+        self.assertEqual(category['subcategories'], [{'id': self.subcategory.id, 'name': self.subcategory.name}])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Изменение справочника увеличивает версию
+        Subcategory.objects.create(category=self.category, name="Премия")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['version'], data['version'] + 1)
+
+    def test_dictionary_list_counts_search_and_pagination(self):
+        """Тест списка справочника: количество записей без N+1, поиск и пагинация"""
+        for i in range(60):
+            Subcategory.objects.create(category=self.category, name=f"Подкатегория {i:02d}")
+
+        url = reverse('cash_flow:subcategory_list')
+        with self.assertNumQueries(4):  # сессия, пользователь, COUNT для пагинации, страница
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_paginated'])
+        self.assertEqual(len(response.context['items']), 50)
+
+        response = self.client.get(url, {'q': 'Аванс'})
+        items = list(response.context['items'])
+        self.assertEqual(items, [self.subcategory])
+        self.assertEqual(items[0].records_count, 2)
+
+    def test_dictionary_manage_counts(self):
+        """Тест количества записей на странице управления справочниками"""
+        response = self.client.get(reverse('cash_flow:dictionary_manage'))
+        self.assertEqual(response.context['statuses'][0].records_count, 2)
+        self.assertEqual(response.context['subcategories_total'], 1)
+
+    def test_admin_changelist_performance_mode(self):
+        """Админка записей: поиск числа по точной сумме, фильтр по месяцу, счетчики справочников"""
+        User.objects.create_superuser(username='admin', password='12345')
+        self.client.login(username='admin', password='12345')
+        url = reverse('admin:web_cashflowrecord_changelist')
+
+        # По умолчанию - обычная админка (режим читается при каждом запросе)
+        response = self.client.get(url)
+        self.assertEqual(response.context['cl'].date_hierarchy, 'created_date')
+
+        self.record.comment = 'Счет 500 от поставщика'
+        self.record.save()
+        with self.settings(CASHFLOW_ADMIN_PERFORMANCE_MODE=True):
+            response = self.client.get(url, {'q': '500'})
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(response.context['cl'].date_hierarchy)
+            self.assertEqual(set(response.context['cl'].result_list), {self.old_record, self.record})
+
+            response = self.client.get(url, {'q': '500.00'})
+            self.assertEqual(list(response.context['cl'].result_list), [self.old_record])
+
+            response = self.client.get(url, {'transaction_type__id__exact': self.transaction_type.pk})
+            self.assertEqual(response.context['cl'].result_count, 2)
+
+        response = self.client.get(url, {'q': 'поставщика'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.record])
+
+        month = self.old_record.created_date.strftime('%Y-%m')
+        with self.settings(CASHFLOW_ADMIN_PERFORMANCE_MODE=True):
+            response = self.client.get(url, {'month': month})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.old_record, response.context['cl'].result_list)
+
+        response = self.client.get(reverse('admin:web_category_changelist'))
+        self.assertEqual(response.status_code, 200)
+        category = response.context['cl'].result_list[0]
+        self.assertEqual(category.records_count, 2)
+        self.assertEqual(category.subcategories_total, 1)
+
+
+class FixedCount:
+    """Стратегия подсчета с заданным результатом"""
+
+    def __init__(self, count, is_estimate):
+        self.result = (count, is_estimate)
+
+    def count(self, queryset, params=None):
+        return self.result
+
+
+@override_settings(CASHFLOW_COUNT_STRATEGY='web.pagination.RollupEstimateCount', CASHFLOW_COUNT_ESTIMATE_THRESHOLD=10)
+class CountStrategyTests(TestCase):
+    def setUp(self):
+        """Создаем 45 записей (три страницы HTML-списка)"""
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='testuser', password='12345'))
+        self.status = Status.objects.create(name="Бизнес")
+        transaction_type = TransactionType.objects.create(name="Пополнение")
+        category = Category.objects.create(transaction_type=transaction_type, name="Зарплата")
+        subcategory = Subcategory.objects.create(category=category, name="Аванс")
+        for day in range(45):
+            CashFlowRecord.objects.create(
+                created_date=date(2025, 1, 1) + timedelta(days=day % 10),
+                status=self.status,
+                transaction_type=transaction_type,
+                category=category,
+                subcategory=subcategory,
+                amount=Decimal('100.00'),
+                comment=f"Запись {day}"
+            )
+
+    def test_estimated_count_in_list(self):
+        """Оценка по агрегатам выше порога - с пометкой "~", поиск - точный подсчет"""
+        url = reverse('cash_flow:index')
+        response = self.client.get(url, {'status': self.status.pk, 'page': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['page_obj'].paginator.count_is_estimate)
+        self.assertContains(response, 'Страница 3 из ~3')
+        self.assertEqual(len(response.context['records']), 5)
+
+        response = self.client.get(url, {'q': 'Запись'})
+        self.assertFalse(response.context['page_obj'].paginator.count_is_estimate)
+        self.assertContains(response, 'Страница 1 из 3')
+
+        response = self.client.get(reverse('cashflowrecord-list'), {'date_from': '2025-01-01'})
+        self.assertEqual((response.data['count'], response.data['count_is_estimate']), (45, True))
+        response = self.client.get(reverse('cashflowrecord-list'), {'date_from': '2025-01-10'})
+        self.assertEqual(response.data['count'], 4)
+        self.assertNotIn('count_is_estimate', response.data)
+
+    def test_cached_count(self):
+        """Точное количество кэшируется до изменения версии записей"""
+        queryset = CashFlowRecord.objects.filter(status=self.status)
+        strategy = CachedCount()
+        self.assertEqual(strategy.count(queryset), (45, False))
+        with self.assertNumQueries(1):
+            self.assertEqual(strategy.count(queryset), (45, False))
+
+        CashFlowRecord.objects.filter(comment="Запись 0").get().delete()
+        self.assertEqual(strategy.count(queryset), (44, False))
+
+    def test_estimate_pages(self):
+        """При заниженной оценке следующие страницы доступны, пустая страница - ошибка"""
+        queryset = CashFlowRecord.objects.order_by('pk')
+        paginator = CountStrategyPaginator(queryset, 20, count_strategy=FixedCount(20, True))
+        self.assertEqual(paginator.num_pages, 1)
+        self.assertTrue(paginator.page(1).has_next())
+        page = paginator.page(3)
+        self.assertEqual((len(page), page.has_next()), (5, False))
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
+
+        paginator = CountStrategyPaginator(queryset, 20, count_strategy=FixedCount(45, False))
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
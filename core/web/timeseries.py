@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .pivot import PIVOT_PERIODS
+
+TIMESERIES_BUCKETS = ('day', 'week', 'month', 'quarter', 'year')
+
+# Период по умолчанию (количество интервалов до date_to), если date_from не указан
+DEFAULT_BUCKET_SPAN = {'day': 30, 'week': 12, 'month': 12, 'quarter': 8, 'year': 5}
+
+MAX_TIMESERIES_POINTS = 1000
+
+
+def bucket_start(day, bucket):
+    """Начало интервала, в который попадает дата (как TruncWeek/TruncMonth/... в БД)"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    if bucket == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    if bucket == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(day, bucket):
+    """Начало следующего интервала"""
+    if bucket == 'day':
+        return day + timedelta(days=1)
+    if bucket == 'week':
+        return day + timedelta(days=7)
+    months = {'month': 1, 'quarter': 3, 'year': 12}[bucket]
+    month_index = day.month - 1 + months
+    return day.replace(year=day.year + month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def shift_buckets(day, bucket, count):
+    """Начало интервала, отстоящего на count интервалов назад"""
+    start = bucket_start(day, bucket)
+    if bucket in ('day', 'week'):
+        return start - timedelta(days=count * (7 if bucket == 'week' else 1))
+    months = {'month': 1, 'quarter': 3, 'year': 12}[bucket] * count
+    month_index = start.year * 12 + start.month - 1 - months
+    return start.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def parse_timeseries_params(params):
+    """
+    Разбор bucket, date_from, date_to.
+
+    Возвращает (bucket, date_from, date_to). Без date_to - сегодня, без date_from -
+    DEFAULT_BUCKET_SPAN интервалов до date_to.
+    """
+    bucket = params.get('bucket') or 'day'
+    if bucket not in TIMESERIES_BUCKETS:
+        raise ValidationError({'bucket': f'Допустимые интервалы: {", ".join(TIMESERIES_BUCKETS)}'})
+
+    dates = {}
+    for param in ('date_from', 'date_to'):
+        value = params.get(param)
+        if value:
+            try:
+                dates[param] = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                raise ValidationError({param: 'Ожидается дата в формате ГГГГ-ММ-ДД'})
+
+    date_to = dates.get('date_to') or timezone.localdate()
+    date_from = dates.get('date_from') or shift_buckets(date_to, bucket, DEFAULT_BUCKET_SPAN[bucket] - 1)
+    if date_from > date_to:
+        raise ValidationError({'date_from': 'Дата начала позже даты окончания'})
+    return bucket, date_from, date_to
+
+
+def timeseries_etag_suffix(request):
+    """Период ряда для ETag: без date_to он отсчитывается от текущего дня"""
+    bucket, date_from, date_to = parse_timeseries_params(request.GET)
+    return f'{date_from}-{date_to}'
+
+
+def bucket_dates(bucket, date_from, date_to):
+    """Начала интервалов периода (не больше MAX_TIMESERIES_POINTS)"""
+    dates = []
+    current = bucket_start(date_from, bucket)
+    while current <= date_to:
+        dates.append(current)
+        if len(dates) > MAX_TIMESERIES_POINTS:
+            raise ValidationError({
+                'bucket': f'Слишком много точек (больше {MAX_TIMESERIES_POINTS}), увеличьте интервал или сократите период'
+            })
+        current = next_bucket(current, bucket)
+    return dates
+
+
+def timeseries_rows(queryset, bucket):
+    """
+    Запрос сумм пополнений и списаний по интервалам (bucket, income, expense).
+
+    Группировка и суммы по типам операций считаются в БД одним запросом.
+    """
+    trunc = PIVOT_PERIODS[bucket]
+    return (
+        queryset.order_by()
+        .annotate(bucket=trunc('day') if trunc else F('day'))
+        .values('bucket')
+        .annotate(
+            income=Sum('amount', filter=Q(transaction_type__name='Пополнение')),
+            expense=Sum('amount', filter=Q(transaction_type__name='Списание')),
+        )
+        .values_list('bucket', 'income', 'expense')
+    )
+
+
+def fill_timeseries(rows, bucket, date_from, date_to, dates):
+    """Параллельные массивы рядов с нулями на месте пропусков (один проход по интервалам)"""
+    totals = {day: (income or 0, expense or 0) for day, income, expense in rows}
+
+    income = []
+    expense = []
+    for day in dates:
+        day_income, day_expense = totals.get(day, (0, 0))
+        income.append(day_income)
+        expense.append(day_expense)
+
+    return {
+        'bucket': bucket,
+        'date_from': date_from,
+        'date_to': date_to,
+        'dates': dates,
+        'income': income,
+        'expense': expense,
+        'net': [day_income - day_expense for day_income, day_expense in zip(income, expense)],
+    }
+
+
+def build_timeseries(queryset, bucket, date_from, date_to):
+    """
+    Ряды доходов, расходов и сальдо по интервалам с нулями на месте пропусков.
+
+    queryset - дневные агрегаты с уже примененными фильтрами (включая период).
+    Ответ - параллельные массивы одинаковой длины.
+    """
+    dates = bucket_dates(bucket, date_from, date_to)
+    return fill_timeseries(timeseries_rows(queryset, bucket), bucket, date_from, date_to, dates)
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from ..views import async_api_views
 from ..views.api_views import (
     StatusViewSet, TransactionTypeViewSet, CategoryViewSet,
     SubcategoryViewSet, CashFlowRecordViewSet
@@ -14,8 +15,19 @@ router.register(r'categories', CategoryViewSet)
 router.register(r'subcategories', SubcategoryViewSet)
 router.register(r'records', CashFlowRecordViewSet)
 
+# Асинхронные представления только для чтения (при запуске под ASGI)
+async_urlpatterns = [
+    path('records/', async_api_views.record_list, name='async-record-list'),
+    path('records/<int:pk>/', async_api_views.record_detail, name='async-record-detail'),
+    path('records/summary/', async_api_views.summary, name='async-record-summary'),
+    path('records/by_category/', async_api_views.by_category, name='async-record-by-category'),
+    path('records/monthly_report/', async_api_views.monthly_report, name='async-record-monthly-report'),
+    path('records/timeseries/', async_api_views.timeseries, name='async-record-timeseries'),
+]
+
 # URL-паттерны API
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/', include(async_urlpatterns)),
     path('auth/', include('rest_framework.urls')),  # Для браузерного API (аутентификация)
 ]
@@ -27,6 +27,10 @@ urlpatterns = [
     # AJAX endpoints
     path('ajax/load-categories/', views.load_categories, name='ajax_load_categories'),
     path('ajax/load-subcategories/', views.load_subcategories, name='ajax_load_subcategories'),
+    path('ajax/taxonomy/', views.taxonomy_snapshot, name='ajax_taxonomy'),
+
+    # Метрики Prometheus
+    path('metrics/', views.metrics, name='metrics'),
 
     # Status URLs
     path('statuses/', StatusListView.as_view(), name='status_list'),
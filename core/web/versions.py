@@ -0,0 +1,149 @@
+from functools import wraps
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import DataVersion
+
+
+# Области данных со счетчиком версий
+TAXONOMY = 'taxonomy'
+RECORDS = 'records'
+
+
+def get_version(name, using=None):
+    """
+    Текущая версия области данных.
+
+    Возвращает (версия, время изменения). Для области, которая еще
+    не менялась, - (0, None).
+    """
+    row = (
+        DataVersion.objects.using(using)
+        .filter(name=name)
+        .values_list('version', 'updated_at')
+        .first()
+    )
+    return row or (0, None)
+
+
+def bump_version(name, using=None):
+    """Увеличение версии области данных (в текущей транзакции)"""
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        updated = DataVersion.objects.using(using).filter(name=name).update(
+            version=F('version') + 1,
+            updated_at=now
+        )
+        if not updated:
+            DataVersion.objects.using(using).create(name=name, version=1, updated_at=now)
+
+
+def _etag_from_rows(names, rows, suffix=''):
+    """ETag и Last-Modified по строкам {область: (версия, время изменения)}"""
+    versions = [rows.get(name, (0, None)) for name in names]
+    tag = '-'.join([*names, *(str(version) for version, updated_at in versions)])
+    if suffix:
+        tag = f'{tag}-{suffix}'
+    modified = [updated_at for version, updated_at in versions if updated_at]
+    last_modified = int(max(modified).timestamp()) if modified else None
+    return f'"{tag}"', last_modified
+
+
+def _versions_queryset(names, using=None):
+    return DataVersion.objects.using(using).filter(name__in=names).values_list('name', 'version', 'updated_at')
+
+
+def versions_etag(names, suffix='', using=None):
+    """
+    Строгий ETag и Last-Modified (timestamp) по версиям нескольких областей данных.
+
+    suffix различает представления одного URL (например, формат ответа).
+    """
+    rows = {name: (version, updated_at) for name, version, updated_at in _versions_queryset(names, using)}
+    return _etag_from_rows(names, rows, suffix)
+
+
+def versions_key(names, using=None):
+    """
+    Версии областей со временем изменения одной строкой - для ключей кэша
+    производных данных (время различает версии с одним номером после отката).
+    """
+    rows = {name: (version, updated_at) for name, version, updated_at in _versions_queryset(names, using)}
+    parts = []
+    for name in names:
+        version, updated_at = rows.get(name, (0, None))
+        parts.append(f'{name}:{version}:{updated_at.timestamp() if updated_at else 0}')
+    return '-'.join(parts)
+
+
+async def aversions_etag(names, suffix='', using=None):
+    """Асинхронный вариант versions_etag"""
+    rows = {name: (version, updated_at) async for name, version, updated_at in _versions_queryset(names, using)}
+    return _etag_from_rows(names, rows, suffix)
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Клиент обязан сверять версию при каждом запросе (дешевый 304)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _join_suffix(*parts):
+    return '-'.join(part for part in parts if part)
+
+
+def condition_on_versions(*names, suffix=None):
+    """
+    Условный GET для метода ViewSet по версиям областей данных.
+
+    Если If-None-Match/If-Modified-Since совпадают с текущими версиями,
+    возвращается 304 без вызова обработчика (без запросов агрегации
+    и сериализации). Версии читаются до построения ответа: изменение
+    во время обработки приведет лишь к лишней полной выдаче при следующем запросе.
+
+    suffix(request) - часть ETag, от которой ответ зависит помимо версий
+    и URL (например, период по умолчанию от текущей даты).
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_method(self, request, *args, **kwargs)
+
+            renderer = getattr(request, 'accepted_renderer', None)
+            etag, last_modified = versions_etag(names, suffix=_join_suffix(
+                getattr(renderer, 'format', ''), suffix(request) if suffix else ''
+            ))
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return _set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def async_condition_on_versions(*names, suffix=None):
+    """Условный GET для асинхронного представления-функции (см. condition_on_versions)"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag, last_modified = await aversions_etag(
+                names, suffix=_join_suffix('async', suffix(request) if suffix else '')
+            )
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return _set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
@@ -1,21 +1,71 @@
-from django.db.models.functions import ExtractMonth, ExtractYear
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.http import StreamingHttpResponse
+from rest_framework.parsers import JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Sum, Q, Count
-from datetime import datetime, timedelta
-from ..models import Status, TransactionType, Category, Subcategory, CashFlowRecord
+from datetime import datetime
+from ..models import Status, TransactionType, Category, Subcategory, CashFlowRecord, CashFlowDailyRollup
+from ..filters import CashFlowRecordSearchFilter, CashFlowRecordOrderingFilter, filter_records_by_params
+from ..archive import records_model
+from ..bulk import (
+    BULK_DEFAULT_CHUNK_SIZE, BULK_MAX_CHUNK_SIZE, validate_bulk_rows, insert_records, upsert_records,
+    validate_bulk_patch, update_records, delete_records
+)
+from ..merge import MergeError, merge_dictionary
+from ..export import EXPORT_FORMATS, export_rows, iter_csv, iter_ndjson, iter_gzip
+from ..pagination import CashFlowRecordPagination
+from ..parsers import NDJSONParser
+from ..pivot import PivotSpec, build_pivot
+from ..reports import (
+    income_expense_sums, summary_period, summary_etag_suffix, summary_data,
+    category_totals, monthly_totals, format_monthly_report
+)
+from ..timeseries import parse_timeseries_params, timeseries_etag_suffix, build_timeseries, bucket_dates
+from ..balance import balance_on, balance_curve
+from ..taxonomy import TaxonomySnapshot
+from ..versions import RECORDS, TAXONOMY, condition_on_versions
 from ..serializers import (
     StatusSerializer, TransactionTypeSerializer, CategorySerializer,
     SubcategorySerializer, CashFlowRecordSerializer, CashFlowRecordCreateSerializer,
-    CashFlowRecordSummarySerializer
+    CashFlowRecordSummarySerializer, CashFlowRecordUpsertRowSerializer, CashFlowRecordBulkPatchSerializer
+)
+
+
+# Параметры фильтра, один из которых обязателен для изменения и удаления по фильтру
+BULK_FILTER_PARAMS = (
+    'status', 'transaction_type', 'category', 'subcategory', 'created_date', 'date_from', 'date_to', 'search'
 )
 
 
-class StatusViewSet(viewsets.ModelViewSet):
+class MergeActionMixin:
+    """Действие merge: объединение справочника с другим (см. merge_dictionary)"""
+
+    @action(detail=True, methods=['post'])
+    def merge(self, request, pk=None):
+        """
+        Перевод всех записей на справочник target и удаление текущего.
+
+        Дочерние справочники переносятся к target, одноименные - объединяются.
+        """
+        source = self.get_object()
+        try:
+            target = self.get_queryset().get(pk=request.data.get('target'))
+        except (ValueError, TypeError, source.DoesNotExist):
+            return Response({'target': 'Справочник не найден'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = merge_dictionary(source, target)
+        except MergeError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+
+class StatusViewSet(MergeActionMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления статусами операций.
 
@@ -30,7 +80,7 @@ class StatusViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name']
 
 
-class TransactionTypeViewSet(viewsets.ModelViewSet):
+class TransactionTypeViewSet(MergeActionMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления типами транзакций.
 
@@ -45,7 +95,7 @@ class TransactionTypeViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name']
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(MergeActionMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления категориями операций.
 
@@ -61,7 +111,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'transaction_type__name']
 
 
-class SubcategoryViewSet(viewsets.ModelViewSet):
+class SubcategoryViewSet(MergeActionMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления подкатегориями операций.
 
@@ -83,16 +133,31 @@ class CashFlowRecordViewSet(viewsets.ModelViewSet):
 
     Предоставляет полный CRUD для записей CashFlowRecord.
     Включает дополнительные действия для аналитики и отчетности.
+    Список поддерживает курсорную пагинацию (параметр cursor) и полнотекстовый
+    поиск (параметр search) с сортировкой по релевантности.
+    Список, summary и monthly_report поддерживают условный GET (304).
+    Список и выгрузка читают архив, только если фильтр по дате заходит
+    в архивный период; аналитика учитывает архив через дневные агрегаты.
     """
     queryset = CashFlowRecord.objects.all()
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    pagination_class = CashFlowRecordPagination
+    filter_backends = [DjangoFilterBackend, CashFlowRecordSearchFilter, CashFlowRecordOrderingFilter]
     filterset_fields = [
         'status', 'transaction_type', 'category', 'subcategory', 'created_date'
     ]
     search_fields = ['comment', 'category__name', 'subcategory__name']
     ordering_fields = ['created_date', 'amount']
     ordering = ['-created_date']
+    # Действия, читающие с реплики (см. ReplicaRoutingMiddleware)
+    replica_actions = ('summary', 'by_category', 'monthly_report', 'pivot', 'timeseries', 'balance', 'export')
+    # Действия, читающие записи вместе с архивом (см. records_model)
+    archive_actions = ('list', 'export')
+
+    @condition_on_versions(RECORDS, TAXONOMY)
+    def list(self, request, *args, **kwargs):
+        """Список записей с ETag/Last-Modified по версиям записей и справочников"""
+        return super().list(request, *args, **kwargs)
 
     def get_serializer_class(self):
         """
@@ -109,7 +174,10 @@ class CashFlowRecordViewSet(viewsets.ModelViewSet):
         """
         Оптимизация queryset с select_related и фильтрация по датам.
         """
-        queryset = super().get_queryset()
+        if self.action in self.archive_actions:
+            queryset = records_model(self.request.query_params).objects.all()
+        else:
+            queryset = super().get_queryset()
 
         # Фильтрация по дате (период)
         date_from = self.request.query_params.get('date_from')
@@ -133,107 +201,309 @@ class CashFlowRecordViewSet(viewsets.ModelViewSet):
             'status', 'transaction_type', 'category', 'subcategory'
         )
 
+    def filter_by_params(self, queryset, date_field):
+        """Фильтры записей по параметрам запроса (см. filter_records_by_params)"""
+        return filter_records_by_params(queryset, self.request.query_params, date_field)
+
+    def get_rollup_queryset(self):
+        """Дневные агрегаты (CashFlowDailyRollup) с фильтрами записей"""
+        return self.filter_by_params(CashFlowDailyRollup.objects.all(), 'day')
+
     @action(detail=False, methods=['get'])
+    @condition_on_versions(RECORDS, TAXONOMY, suffix=summary_etag_suffix)
     def summary(self, request):
-        """Сводная статистика по доходам и расходам"""
-        queryset = self.get_queryset()
-
-        # Параметры периода
-        date_from = request.query_params.get('date_from')
-        date_to = request.query_params.get('date_to')
-
-        # Если период не указан, используем текущий месяц
-        if not date_from or not date_to:
-            today = datetime.now().date()
-            date_from = today.replace(day=1)  # Первое число текущего месяца
-            next_month = today.replace(day=28) + timedelta(days=4)  # Переход к следующему месяцу
-            date_to = next_month - timedelta(days=next_month.day)  # Последний день текущего месяца
-
-        # Сумма пополнений (доходов)
-        income = queryset.filter(
-            transaction_type__name='Пополнение',
-            created_date__gte=date_from,
-            created_date__lte=date_to
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
-        # Сумма списаний (расходов)
-        expense = queryset.filter(
-            transaction_type__name='Списание',
-            created_date__gte=date_from,
-            created_date__lte=date_to
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
-        balance = income - expense
-
-        data = {
-            'total_income': income,
-            'total_expense': expense,
-            'balance': balance,
-            'period_start': date_from,
-            'period_end': date_to
-        }
-
-        serializer = CashFlowRecordSummarySerializer(data)
+        """Сводная статистика по доходам и расходам (по дневным агрегатам)"""
+        queryset = self.get_rollup_queryset()
+        date_from, date_to = summary_period(request.query_params)
+
+        # Пополнения (доходы) и списания (расходы) одним запросом
+        totals = queryset.filter(
+            day__gte=date_from,
+            day__lte=date_to
+        ).aggregate(**income_expense_sums())
+
+        serializer = CashFlowRecordSummarySerializer(summary_data(totals, date_from, date_to))
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def by_category(self, request):
-        """Статистика по категориям"""
-        queryset = self.get_queryset()
+        """Статистика по категориям (по дневным агрегатам)"""
+        return Response(category_totals(self.get_rollup_queryset()))
 
-        date_from = request.query_params.get('date_from')
-        date_to = request.query_params.get('date_to')
+    @action(detail=False, methods=['get'])
+    @condition_on_versions(RECORDS, TAXONOMY)
+    def monthly_report(self, request):
+        """Ежемесячный отчет (по дневным агрегатам)"""
+        return Response(format_monthly_report(monthly_totals(self.get_rollup_queryset())))
+
+    @action(detail=False, methods=['get'])
+    @condition_on_versions(RECORDS, TAXONOMY)
+    def pivot(self, request):
+        """
+        Сводная таблица по произвольным измерениям одним запросом.
 
-        # Фильтрация по периоду
-        if date_from and date_to:
+        Параметры:
+        - group_by: измерения строк через запятую - период (day, week, month,
+          quarter, year) и справочники (status, transaction_type, category, subcategory)
+        - measures: меры через запятую - sum, count, avg, min, max (по умолчанию sum)
+        - columns: справочник столбцов; ответ - матрица с ячейками по условной агрегации
+        - фильтры как у списка записей
+
+        sum/count/avg считаются по дневным агрегатам, min/max - по записям.
+        """
+        spec = PivotSpec.from_params(request.query_params)
+        if spec.uses_rollup:
+            queryset, date_field = self.get_rollup_queryset(), 'day'
+        else:
+            model = records_model(request.query_params)
+            queryset, date_field = self.filter_by_params(model.objects.all(), 'created_date'), 'created_date'
+        return Response(build_pivot(queryset, spec, date_field, request.query_params))
+
+    @action(detail=False, methods=['get'])
+    @condition_on_versions(RECORDS, TAXONOMY, suffix=timeseries_etag_suffix)
+    def timeseries(self, request):
+        """
+        Ряды доходов, расходов и сальдо по интервалам (по дневным агрегатам).
+
+        Параметры: bucket (day, week, month, quarter, year), date_from, date_to
+        и фильтры как у списка записей. Пустые интервалы заполняются нулями,
+        ответ - параллельные массивы dates, income, expense, net.
+        """
+        bucket, date_from, date_to = parse_timeseries_params(request.query_params)
+        queryset = self.get_rollup_queryset().filter(day__gte=date_from, day__lte=date_to)
+        return Response(build_timeseries(queryset, bucket, date_from, date_to))
+
+    @action(detail=False, methods=['get'])
+    @condition_on_versions(RECORDS, TAXONOMY, suffix=timeseries_etag_suffix)
+    def balance(self, request):
+        """
+        Остаток (пополнения минус списания нарастающим итогом).
+
+        С параметром date - остаток на конец дня, иначе - кривая остатков
+        на конец интервалов (bucket, date_from, date_to как у timeseries).
+        Параметр status - остаток по статусу, без него - по всем записям.
+        Считается по таблице остатков на день без суммирования записей.
+        """
+        status_id = request.query_params.get('status')
+        scope = {'status_id': None, 'is_total': True}
+        if status_id:
+            if not status_id.isdigit():
+                return Response({'status': 'Ожидается id статуса'}, status=status.HTTP_400_BAD_REQUEST)
+            scope = {'status_id': int(status_id), 'is_total': False}
+
+        day = request.query_params.get('date')
+        if day:
             try:
-                date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
-                date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
-                queryset = queryset.filter(created_date__range=[date_from, date_to])
+                day = datetime.strptime(day, '%Y-%m-%d').date()
             except ValueError:
-                pass
+                return Response({'date': 'Ожидается дата в формате ГГГГ-ММ-ДД'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'date': day, 'status': scope['status_id'], 'balance': balance_on(day, **scope)})
+
+        bucket, date_from, date_to = parse_timeseries_params(request.query_params)
+        dates = bucket_dates(bucket, date_from, date_to)
+        return Response({
+            'bucket': bucket,
+            'date_from': date_from,
+            'date_to': date_to,
+            'status': scope['status_id'],
+            'dates': dates,
+            'balance': balance_curve(dates, date_to, **scope),
+        })
 
-        # Группировка по категориям
-        result = queryset.values(
-            'category__id',
-            'category__name',
-            'transaction_type__name'
-        ).annotate(
-            total_amount=Sum('amount'),
-            record_count=Count('id')
-        ).order_by('transaction_type__name', '-total_amount')
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Потоковая выгрузка записей в CSV или NDJSON.
 
-        return Response(result)
+        Принимает те же фильтры, что и список записей.
+        Параметры: export_format=csv|ndjson (по умолчанию csv), compress=gzip.
+        Записи читаются чанками и отдаются по мере чтения, без пагинации.
+        """
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'export_format': f'Допустимые форматы: {", ".join(EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        content_type, extension = EXPORT_FORMATS[export_format]
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # База фиксируется сейчас: поток читается уже после выхода из представления
+        rows = export_rows(queryset.using(queryset.db))
+        stream = iter_csv(rows) if export_format == 'csv' else iter_ndjson(rows)
+        filename = f'records.{extension}'
+
+        if request.query_params.get('compress') == 'gzip':
+            stream = iter_gzip(stream)
+            content_type = 'application/gzip'
+            filename += '.gz'
+
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def get_bulk_params(self, request):
+        """
+        Общие параметры массовых операций: строки, режим и размер пачки.
 
-    @action(detail=False, methods=['get'])
-    def monthly_report(self, request):
-        """Ежемесячный отчет"""
-        queryset = self.get_queryset()
-
-        # Используем Django ORM функции для извлечения года и месяца
-        result = queryset.annotate(
-            year=ExtractYear('created_date'),
-            month=ExtractMonth('created_date')
-        ).values('year', 'month').annotate(
-            income=Sum('amount', filter=Q(transaction_type__name='Пополнение')),
-            expense=Sum('amount', filter=Q(transaction_type__name='Списание')),
-            record_count=Count('id')
-        ).order_by('-year', '-month')
-
-        # Обрабатываем результаты
-        formatted_result = []
-        for item in result:
-            formatted_item = {
-                'year': int(item['year']),
-                'month': int(item['month']),
-                'period': f"{item['month']:02d}/{item['year']}",  # Исправленный формат
-                'income': float(item['income'] or 0),
-                'expense': float(item['expense'] or 0),
-                'balance': float((item['income'] or 0) - (item['expense'] or 0)),
-                'record_count': item['record_count']
-            }
-            formatted_result.append(formatted_item)
-
-        return Response(formatted_result)
+        Возвращает (строки, режим, размер пачки, ответ с ошибкой или None).
+        """
+        rows = request.data
+        if not isinstance(rows, list):
+            return None, None, None, Response(
+                {'detail': 'Ожидается массив записей'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        mode = request.query_params.get('mode', 'atomic')
+        if mode not in ('atomic', 'partial'):
+            return None, None, None, Response(
+                {'mode': 'Допустимые значения: atomic, partial'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return rows, mode, self.get_chunk_size(request), None
+
+    def get_chunk_size(self, request):
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', BULK_DEFAULT_CHUNK_SIZE))
+        except ValueError:
+            chunk_size = BULK_DEFAULT_CHUNK_SIZE
+        return max(1, min(chunk_size, BULK_MAX_CHUNK_SIZE))
+
+    def get_bulk_filter_queryset(self, request):
+        """
+        Записи для изменения или удаления по фильтру - те же параметры, что у списка.
+
+        Без фильтра требуется all=true, чтобы случайно не затронуть все записи.
+        Архив не изменяется. Возвращает (queryset, ответ с ошибкой или None).
+        """
+        params = request.query_params
+        if not any(params.get(name) for name in BULK_FILTER_PARAMS) and params.get('all') != 'true':
+            return None, Response(
+                {'detail': 'Укажите фильтр записей или параметр all=true'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self.filter_queryset(self.get_queryset()), None
+
+    def bulk_preview(self, queryset):
+        """Количество и сумма записей фильтра (режим dry_run)"""
+        preview = queryset.order_by().aggregate(matched=Count('pk'), amount=Sum('amount'))
+        preview['amount'] = preview['amount'] or 0
+        return preview
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk_create(self, request):
+        """
+        Массовое создание записей из JSON-массива или NDJSON.
+
+        Согласованность тип -> категория -> подкатегория проверяется для всей
+        пачки по одному снимку справочников, вставка - через bulk_create.
+        Параметры:
+        - mode=atomic (по умолчанию): при любой ошибке ничего не сохраняется;
+        - mode=partial: сохраняются корректные строки, ошибки возвращаются по индексам;
+        - chunk_size: размер пачки вставки (по умолчанию 1000).
+        """
+        rows, mode, chunk_size, error = self.get_bulk_params(request)
+        if error:
+            return error
+
+        records, errors = validate_bulk_rows(rows, TaxonomySnapshot.load())
+
+        if errors and mode == 'atomic':
+            return Response(
+                {'created': 0, 'errors': errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if mode == 'atomic':
+            with transaction.atomic():
+                created = insert_records(records, chunk_size)
+        else:
+            created = insert_records(records, chunk_size)
+
+        return Response(
+            {'created': created, 'errors': errors},
+            status=status.HTTP_400_BAD_REQUEST if errors and not created else status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk_upsert(self, request):
+        """
+        Идемпотентная синхронизация записей по внешнему идентификатору.
+
+        Каждая строка содержит external_id и, при необходимости, source
+        (по умолчанию - параметр запроса source). Новые записи создаются,
+        измененные обновляются, совпадающие не трогаются, поэтому повторная
+        отправка пересекающегося окна не создает дубликатов.
+        Параметры mode и chunk_size - как у bulk_create.
+        """
+        rows, mode, chunk_size, error = self.get_bulk_params(request)
+        if error:
+            return error
+
+        records, errors = validate_bulk_rows(
+            rows, TaxonomySnapshot.load(), CashFlowRecordUpsertRowSerializer,
+            source=request.query_params.get('source', '')[:50], fill_date=False
+        )
+
+        if errors and mode == 'atomic':
+            return Response(
+                {'inserted': 0, 'updated': 0, 'unchanged': 0, 'archived': 0, 'errors': errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if mode == 'atomic':
+            with transaction.atomic():
+                result = upsert_records(records, chunk_size)
+        else:
+            result = upsert_records(records, chunk_size)
+
+        result['errors'] = errors
+        return Response(
+            result,
+            status=status.HTTP_400_BAD_REQUEST if errors and not records else status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['post'])
+    def bulk_update(self, request):
+        """
+        Изменение всех записей, подходящих под фильтр (параметры как у списка).
+
+        Тело - изменяемые поля: created_date, status, transaction_type,
+        category, subcategory, comment. Согласованность справочников
+        проверяется один раз, записи обновляются пачками chunk_size
+        запросами UPDATE. dry_run=true - только количество и сумма записей.
+        """
+        serializer = CashFlowRecordBulkPatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes, errors = validate_bulk_patch(serializer.validated_data, TaxonomySnapshot.load())
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset, error = self.get_bulk_filter_queryset(request)
+        if error:
+            return error
+
+        if request.query_params.get('dry_run') == 'true':
+            return Response(dict(self.bulk_preview(queryset), dry_run=True))
+
+        updated = update_records(queryset, changes, self.get_chunk_size(request))
+        return Response({'updated': updated, 'dry_run': False})
+
+    @action(detail=False, methods=['post'])
+    def bulk_delete(self, request):
+        """
+        Удаление всех записей, подходящих под фильтр (параметры как у списка),
+        пачками chunk_size запросами DELETE. dry_run=true - только количество
+        и сумма записей.
+        """
+        queryset, error = self.get_bulk_filter_queryset(request)
+        if error:
+            return error
 
+        if request.query_params.get('dry_run') == 'true':
+            return Response(dict(self.bulk_preview(queryset), dry_run=True))
 
+        deleted = delete_records(queryset, self.get_chunk_size(request))
+        return Response({'deleted': deleted, 'dry_run': False})
@@ -0,0 +1,178 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from ..archive import arecords_model
+from ..filters import filter_records_by_params
+from ..models import CashFlowRecord, CashFlowDailyRollup
+from ..pagination import KEYSET_ORDERINGS
+from ..reports import (
+    income_expense_sums, summary_period, summary_etag_suffix, summary_data,
+    category_totals, monthly_totals, format_monthly_report
+)
+from ..serializers import CashFlowRecordSerializer, CashFlowRecordSummarySerializer
+from ..timeseries import (
+    parse_timeseries_params, timeseries_etag_suffix, bucket_dates, timeseries_rows, fill_timeseries
+)
+from ..versions import RECORDS, TAXONOMY, async_condition_on_versions
+
+# Асинхронные представления только для чтения (ASGI).
+# Запросы выполняются через асинхронный интерфейс ORM (acount, aaggregate,
+# async for), поэтому медленный отчет не занимает поток воркера на время
+# ожидания БД. Ответы совпадают по формату с CashFlowRecordViewSet.
+
+
+def api_response(data, status=200):
+    """JSON-ответ с тем же кодированием Decimal/дат, что и у DRF"""
+    return JsonResponse(data, encoder=JSONEncoder, status=status, safe=False)
+
+
+def _is_authenticated(request):
+    """
+    Аутентификация классами DEFAULT_AUTHENTICATION_CLASSES (сессия, токен)
+    через Request DRF, как у синхронного API; пользователь попадает в request.user.
+    """
+    authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    return Request(request, authenticators=authenticators).user.is_authenticated
+
+
+def async_api_view(view):
+    """
+    Проверки для асинхронного представления API: только GET/HEAD
+    и аутентифицированный пользователь (как IsAuthenticated в DRF).
+
+    Сессия и токен загружаются синхронным ORM Django 4.2 -
+    через sync_to_async (один короткий запрос).
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        try:
+            authenticated = await sync_to_async(_is_authenticated)(request)
+        except AuthenticationFailed as exc:
+            return api_response({'detail': exc.detail}, status=403)
+        if not authenticated:
+            return api_response({'detail': 'Authentication credentials were not provided.'}, status=403)
+        try:
+            return await view(request, *args, **kwargs)
+        except ValidationError as exc:
+            return api_response(exc.detail, status=400)
+    return wrapper
+
+
+def records_queryset(params, model=CashFlowRecord):
+    return filter_records_by_params(
+        model.objects.select_related('status', 'transaction_type', 'category', 'subcategory'),
+        params
+    )
+
+
+def rollup_queryset(params):
+    return filter_records_by_params(CashFlowDailyRollup.objects.all(), params, 'day')
+
+
+# Параметры списка синхронного API, которых нет у асинхронного: поиск по индексу
+# FTS (проверка наличия индекса - синхронный запрос) и курсорная пагинация
+UNSUPPORTED_LIST_PARAMS = ('search', 'cursor')
+
+
+@async_api_view
+@async_condition_on_versions(RECORDS, TAXONOMY)
+async def record_list(request):
+    """
+    Список записей с постраничной пагинацией (page) и сортировкой ordering.
+
+    search и cursor не поддерживаются - ответ 400, а не список без них.
+    """
+    unsupported = [param for param in UNSUPPORTED_LIST_PARAMS if param in request.GET]
+    if unsupported:
+        return api_response(
+            {param: 'Параметр не поддерживается асинхронным API, используйте /api/records/' for param in unsupported},
+            status=400
+        )
+    queryset = records_queryset(request.GET, await arecords_model(request.GET))
+    ordering = request.GET.get('ordering')
+    if ordering in KEYSET_ORDERINGS:
+        direction = '-' if ordering.startswith('-') else ''
+        queryset = queryset.order_by(ordering, f'{direction}pk')
+    else:
+        queryset = queryset.order_by('-created_date', '-pk')
+
+    page_size = api_settings.PAGE_SIZE
+    page = request.GET.get('page', '1')
+    if not page.isdigit() or int(page) < 1:
+        return api_response({'detail': 'Invalid page.'}, status=404)
+    page = int(page)
+
+    count = await queryset.acount()
+    offset = (page - 1) * page_size
+    if offset and offset >= count:
+        return api_response({'detail': 'Invalid page.'}, status=404)
+    records = [record async for record in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_link = replace_query_param(url, 'page', page + 1) if offset + page_size < count else None
+    previous_link = None
+    if page > 1:
+        previous_link = remove_query_param(url, 'page') if page == 2 else replace_query_param(url, 'page', page - 1)
+
+    return api_response({
+        'count': count,
+        'next': next_link,
+        'previous': previous_link,
+        'results': CashFlowRecordSerializer(records, many=True).data,
+    })
+
+
+@async_api_view
+async def record_detail(request, pk):
+    """Одна запись ДДС"""
+    try:
+        record = await records_queryset({}).aget(pk=pk)
+    except CashFlowRecord.DoesNotExist:
+        return api_response({'detail': 'Not found.'}, status=404)
+    return api_response(CashFlowRecordSerializer(record).data)
+
+
+@async_api_view
+@async_condition_on_versions(RECORDS, TAXONOMY, suffix=summary_etag_suffix)
+async def summary(request):
+    """Сводная статистика по доходам и расходам (по дневным агрегатам)"""
+    date_from, date_to = summary_period(request.GET)
+    totals = await rollup_queryset(request.GET).filter(
+        day__gte=date_from,
+        day__lte=date_to
+    ).aaggregate(**income_expense_sums())
+    return api_response(CashFlowRecordSummarySerializer(summary_data(totals, date_from, date_to)).data)
+
+
+@async_api_view
+async def by_category(request):
+    """Статистика по категориям (по дневным агрегатам)"""
+    return api_response([row async for row in category_totals(rollup_queryset(request.GET))])
+
+
+@async_api_view
+@async_condition_on_versions(RECORDS, TAXONOMY)
+async def monthly_report(request):
+    """Ежемесячный отчет (по дневным агрегатам)"""
+    rows = [row async for row in monthly_totals(rollup_queryset(request.GET))]
+    return api_response(format_monthly_report(rows))
+
+
+@async_api_view
+@async_condition_on_versions(RECORDS, TAXONOMY, suffix=timeseries_etag_suffix)
+async def timeseries(request):
+    """Ряды доходов, расходов и сальдо по интервалам (см. CashFlowRecordViewSet.timeseries)"""
+    bucket, date_from, date_to = parse_timeseries_params(request.GET)
+    dates = bucket_dates(bucket, date_from, date_to)
+    queryset = rollup_queryset(request.GET).filter(day__gte=date_from, day__lte=date_to)
+    rows = [row async for row in timeseries_rows(queryset, bucket)]
+    return api_response(fill_timeseries(rows, bucket, date_from, date_to, dates))
@@ -5,10 +5,44 @@ from django.contrib import messages
 
 from ..models import Status, TransactionType, Category, Subcategory
 from ..forms import StatusForm, TransactionTypeForm, CategoryForm, SubcategoryForm
+from ..rollup import annotate_records_count
+
+
+class DictionaryListMixin:
+    """
+    Общая логика списков справочников.
+
+    Количество записей ДДС считается в том же запросе, что и список
+    (по дневным агрегатам), поддерживаются поиск по названию (параметр q)
+    и пагинация.
+    """
+    paginate_by = 50
+    list_select_related = ()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.list_select_related:
+            queryset = queryset.select_related(*self.list_select_related)
+
+        query = self.request.GET.get('q', '').strip()
+        if query:
+            queryset = queryset.filter(name__icontains=query)
+
+        return annotate_records_count(queryset)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.request.GET.get('q', '').strip()
+
+        # Параметры запроса без номера страницы - для ссылок пагинации
+        querystring = self.request.GET.copy()
+        querystring.pop('page', None)
+        context['pagination_querystring'] = querystring.urlencode()
+        return context
 
 
 # Status Views
-class StatusListView(LoginRequiredMixin, ListView):
+class StatusListView(LoginRequiredMixin, DictionaryListMixin, ListView):
     model = Status
     template_name = 'cash_flow/dictionary_list.html'
     context_object_name = 'items'
@@ -87,7 +121,7 @@ class StatusDeleteView(LoginRequiredMixin, DeleteView):
 
 
 # TransactionType Views
-class TransactionTypeListView(LoginRequiredMixin, ListView):
+class TransactionTypeListView(LoginRequiredMixin, DictionaryListMixin, ListView):
     model = TransactionType
     template_name = 'cash_flow/dictionary_list.html'
     context_object_name = 'items'
@@ -166,10 +200,11 @@ class TransactionTypeDeleteView(LoginRequiredMixin, DeleteView):
 
 
 # Category Views
-class CategoryListView(LoginRequiredMixin, ListView):
+class CategoryListView(LoginRequiredMixin, DictionaryListMixin, ListView):
     model = Category
     template_name = 'cash_flow/dictionary_list.html'
     context_object_name = 'items'
+    list_select_related = ('transaction_type',)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -249,10 +284,11 @@ class CategoryDeleteView(LoginRequiredMixin, DeleteView):
 
 
 # Subcategory Views
-class SubcategoryListView(LoginRequiredMixin, ListView):
+class SubcategoryListView(LoginRequiredMixin, DictionaryListMixin, ListView):
     model = Subcategory
     template_name = 'cash_flow/dictionary_list.html'
     context_object_name = 'items'
+    list_select_related = ('category__transaction_type',)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -1,73 +1,25 @@
-from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.contrib import messages
 from datetime import datetime, timedelta
 from ..models import CashFlowRecord, Status, TransactionType, Category, Subcategory
+from ..archive import records_model
 from ..forms import CashFlowRecordForm
-
-
-class StatusListView(LoginRequiredMixin, ListView):
-    """
-    Представление для отображения списка статусов.
-
-    Использует общий шаблон dictionary_list.html для справочников.
-    """
-    model = Status
-    template_name = 'cash_flow/dictionary_list.html'
-    context_object_name = 'items'
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['title'] = 'Статусы'
-        context['model_name'] = 'status'
-        return context
-
-
-class TransactionTypeListView(LoginRequiredMixin, ListView):
-    """
-    Представление для отображения списка типов операций.
-    """
-    model = TransactionType
-    template_name = 'cash_flow/dictionary_list.html'
-    context_object_name = 'items'
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['title'] = 'Типы операций'
-        context['model_name'] = 'transactiontype'
-        return context
-
-
-class CategoryListView(LoginRequiredMixin, ListView):
-    """
-    Представление для отображения списка категорий.
-    """
-    model = Category
-    template_name = 'cash_flow/dictionary_list.html'
-    context_object_name = 'items'
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['title'] = 'Категории'
-        context['model_name'] = 'category'
-        return context
-
-
-class SubcategoryListView(LoginRequiredMixin, ListView):
-    """
-    Представление для отображения списка подкатегорий.
-    """
-    model = Subcategory
-    template_name = 'cash_flow/dictionary_list.html'
-    context_object_name = 'items'
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['title'] = 'Подкатегории'
-        context['model_name'] = 'subcategory'
-        return context
+from ..metrics import REGISTRY, METRICS_CONTENT_TYPE
+from ..pagination import (
+    KEYSET_ORDERINGS, CountStrategyPaginator, InvalidCursor, get_keyset_ordering, keyset_paginate
+)
+from ..rollup import annotate_records_count
+from ..search import search_records
+from ..taxonomy import build_taxonomy_tree
+from ..versions import TAXONOMY, get_version
+# Списки справочников (маршруты dictionaries/...) используют общие представления
+from .dictionaries_views import StatusListView, TransactionTypeListView, CategoryListView, SubcategoryListView  # noqa: F401
 
 
 class CashFlowRecordListView(ListView):
@@ -75,11 +27,44 @@ class CashFlowRecordListView(ListView):
     Представление для отображения списка записей денежных потоков.
 
     Поддерживает пагинацию и фильтрацию по различным параметрам.
+    При наличии параметра cursor используется курсорная пагинация
+    без подсчета общего количества записей.
     """
     model = CashFlowRecord
     template_name = 'cash_flow/record_list.html'
     context_object_name = 'records'
     paginate_by = 20
+    # Чтение с реплики (см. ReplicaRoutingMiddleware)
+    read_replica = True
+
+    def get_ordering(self):
+        """Сортировка из параметра ordering (created_date/amount), иначе - по умолчанию модели"""
+        ordering = self.request.GET.get('ordering')
+        if ordering in KEYSET_ORDERINGS:
+            direction = '-' if ordering.startswith('-') else ''
+            return [ordering, f'{direction}pk']
+        return None
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        """Количество записей - по стратегии подсчета (CASHFLOW_COUNT_STRATEGY) с учетом фильтров"""
+        return CountStrategyPaginator(
+            queryset, per_page, orphans=orphans, allow_empty_first_page=allow_empty_first_page,
+            params=self.request.GET, **kwargs
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        """Постраничная пагинация либо курсорная при наличии параметра cursor"""
+        if 'cursor' not in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+
+        ordering = get_keyset_ordering(self.request.GET.get('ordering'))
+        if ordering is None:
+            raise Http404('Неподдерживаемая сортировка')
+        try:
+            page = keyset_paginate(queryset, ordering, self.request.GET.get('cursor'), page_size)
+        except InvalidCursor:
+            raise Http404('Некорректный курсор')
+        return None, page, page.object_list, True
 
     def get_queryset(self):
         """
@@ -88,7 +73,11 @@ class CashFlowRecordListView(ListView):
          Поддерживает фильтрацию по:
          - статусу, типу операции, категории, подкатегории
          - периоду (дата от/до)
+         - тексту (q) в комментарии, категории и подкатегории
+
+         Архивные записи показываются, только если период заходит в архив.
          """
+        self.queryset = records_model(self.request.GET).objects.all()
         queryset = super().get_queryset().select_related(
             'status', 'transaction_type', 'category', 'subcategory'
         )
@@ -117,6 +106,11 @@ class CashFlowRecordListView(ListView):
             date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
             queryset = queryset.filter(created_date__lte=date_to)
 
+        # Полнотекстовый поиск; без явной сортировки - по релевантности
+        queryset, ranked = search_records(queryset, self.request.GET.get('q'))
+        if ranked and not self.get_ordering():
+            queryset = queryset.order_by('search_rank', '-pk')
+
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -139,8 +133,17 @@ class CashFlowRecordListView(ListView):
             'subcategory': self.request.GET.get('subcategory', ''),
             'date_from': self.request.GET.get('date_from', ''),
             'date_to': self.request.GET.get('date_to', ''),
+            'ordering': self.request.GET.get('ordering', ''),
+            'q': self.request.GET.get('q', ''),
         }
 
+        # Параметры запроса без позиции страницы - для ссылок пагинации
+        querystring = self.request.GET.copy()
+        for key in ('page', 'cursor'):
+            querystring.pop(key, None)
+        context['keyset_mode'] = 'cursor' in self.request.GET
+        context['pagination_querystring'] = querystring.urlencode()
+
         return context
 
 
@@ -200,35 +203,88 @@ class DictionaryManageView(TemplateView):
     Представление для управления справочниками системы.
 
     Отображает все справочники на одной странице для удобного управления.
+    Для каждого справочника показываются первые preview_size элементов,
+    полные списки - на страницах справочников (с поиском и пагинацией).
     """
     template_name = 'cash_flow/dictionary_manage.html'
+    # Сколько элементов каждого справочника показывать на странице
+    preview_size = 10
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['statuses'] = Status.objects.all()
-        context['transaction_types'] = TransactionType.objects.all()
-        context['categories'] = Category.objects.all()
-        context['subcategories'] = Subcategory.objects.all()
+        for key, model in (
+            ('statuses', Status),
+            ('transaction_types', TransactionType),
+            ('categories', Category),
+            ('subcategories', Subcategory),
+        ):
+            # Количество записей - в том же запросе, что и элементы справочника
+            context[key] = annotate_records_count(model.objects.all())[:self.preview_size]
+            context[f'{key}_total'] = model.objects.count()
         return context
 
 
-def load_categories(request):
-    """AJAX загрузка категорий"""
+async def load_categories(request):
+    """AJAX загрузка категорий (асинхронный запрос к БД)"""
     transaction_type_id = request.GET.get('transaction_type_id')
     if transaction_type_id:
         categories = Category.objects.filter(transaction_type_id=transaction_type_id)
         # Возвращаем только имя категории, без типа операции
-        data = [{'id': cat.id, 'name': cat.name} for cat in categories]
+        data = [cat async for cat in categories.values('id', 'name')]
         return JsonResponse(data, safe=False)
     return JsonResponse([], safe=False)
 
 
-def load_subcategories(request):
-    """AJAX загрузка подкатегорий"""
+async def load_subcategories(request):
+    """AJAX загрузка подкатегорий (асинхронный запрос к БД)"""
     category_id = request.GET.get('category_id')
     if category_id:
         subcategories = Subcategory.objects.filter(category_id=category_id)
         # Возвращаем только имя подкатегории, без категории и типа операции
-        data = [{'id': sub.id, 'name': sub.name} for sub in subcategories]
+        data = [sub async for sub in subcategories.values('id', 'name')]
         return JsonResponse(data, safe=False)
-    return JsonResponse([], safe=False)
\ No newline at end of file
+    return JsonResponse([], safe=False)
+
+
+def taxonomy_snapshot(request):
+    """
+    Снимок всех справочников с версией для кеширования на клиенте.
+
+    ETag строится по версии справочников, которая увеличивается сигналами
+    при любом изменении. При совпадении If-None-Match возвращается 304
+    без построения дерева.
+    """
+    version, updated_at = get_version(TAXONOMY)
+    etag = f'"taxonomy-{version}"'
+    last_modified = int(updated_at.timestamp()) if updated_at else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        data = build_taxonomy_tree()
+        data['version'] = version
+        response = JsonResponse(data)
+
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Клиент хранит снимок у себя и каждый раз сверяет версию (дешевый 304)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def metrics(request):
+    """
+    Метрики запросов в текстовом формате Prometheus.
+
+    Доступны при CASHFLOW_METRICS_ENABLED персоналу или по токену
+    CASHFLOW_METRICS_TOKEN (Authorization: Bearer <токен>).
+    """
+    if not settings.CASHFLOW_METRICS_ENABLED:
+        raise Http404
+
+    token = settings.CASHFLOW_METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not (request.user.is_staff or (token and constant_time_compare(authorization, f'Bearer {token}'))):
+        return HttpResponse(status=403)
+
+    return HttpResponse(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)